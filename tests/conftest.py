@@ -0,0 +1,19 @@
+"""测试共用的夹具"""
+import json
+import os
+
+import pytest
+
+from vsm.bench import write_fake_binaries
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path, monkeypatch):
+    """把模拟的 ffmpeg/ffprobe 放在 PATH 最前面"""
+    if os.name != "posix":
+        pytest.skip("模拟程序以 shell 脚本的形式放在 PATH 中")
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps({"speed": 1000}), encoding='utf-8')
+    write_fake_binaries(bin_dir, config_path)
+    monkeypatch.setenv("PATH", os.pathsep.join([str(bin_dir), os.environ.get("PATH", "")]))
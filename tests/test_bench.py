@@ -0,0 +1,76 @@
+"""bench simulate：调度开销的测量，以及注入故障后的模拟批处理"""
+import os
+
+import pytest
+
+from vsm.bench import run_simulate, scheduling_gaps
+from vsm.cli import build_parser
+
+def event(media_id, tool, role, spawned, end, start=None):
+    return {"tool": tool, "id": media_id, "role": role, "spawned": spawned,
+            "start": spawned + 0.04 if start is None else start, "end": end, "startup_cpu": 0.04}
+
+def test_gaps_between_jobs_pair_each_start_with_earliest_exit():
+    events = [
+        event("a", "ffprobe", "probe", 0.0, 0.1),
+        event("b", "ffprobe", "probe", 0.0, 0.1),
+        event("c", "ffprobe", "probe", 0.0, 0.1),
+        event("a", "ffmpeg", "encode", 1.0, 2.0),
+        event("b", "ffmpeg", "encode", 1.0, 3.0),
+        # a 的槽位在 2.0 空出，c 在 2.005 被创建；a 的校验不占用槽位
+        event("c", "ffmpeg", "encode", 2.005, 4.0),
+        event("a", "ffmpeg", "decode", 2.01, 2.5),
+    ]
+    between, within = scheduling_gaps(events, 2)
+    assert between == [pytest.approx(0.005)]
+    assert within == []
+
+def test_gaps_within_job_include_non_encode_processes():
+    # 智能渲染：IDR 探测、切分、重编码一段，之后是校验
+    events = [
+        event("a", "ffmpeg", "decode", 1.0, 1.5),
+        event("a", "ffmpeg", "encode", 1.51, 2.0),
+        event("a", "ffmpeg", "encode", 2.02, 2.5),
+        event("a", "ffmpeg", "decode", 3.0, 3.2),
+    ]
+    between, within = scheduling_gaps(events, 1)
+    assert between == []
+    assert within == [pytest.approx(0.01), pytest.approx(0.02)]
+
+def test_gaps_skip_slots_freed_by_killed_process():
+    # 卡住的进程退出时刻未知，替换它的任务不计入
+    events = [
+        event("a", "ffmpeg", "encode", 1.0, None),
+        event("b", "ffmpeg", "encode", 9.0, 10.0),
+        event("c", "ffmpeg", "encode", 10.01, 11.0),
+    ]
+    between, _ = scheduling_gaps(events, 1)
+    assert between == [pytest.approx(0.01)]
+
+def simulate(*argv):
+    if os.name != "posix":
+        pytest.skip("模拟程序以 shell 脚本的形式放在 PATH 中")
+    return run_simulate(build_parser().parse_args(["bench", "simulate", *argv]))
+
+def test_simulated_batch_with_faults(capsys):
+    # 种子 5 下 12 个任务中有 NVENC 回退、崩溃、磁盘写满与丢帧各至少一个
+    code = simulate("--count", "12", "--seed", "5", "--fail-nvenc", "0.2", "--fail-crash", "0.1",
+                    "--fail-disk-full", "0.1", "--fail-corrupt", "0.1", "--", "--jobs", "3")
+    output = capsys.readouterr().out
+    assert code == 0, output
+    assert "错误" not in output
+    for fault in ("nvenc", "crash", "disk_full", "corrupt"):
+        assert f"{fault} " in output.split("注入故障: ")[1].split("；")[0]
+
+def test_simulated_hang_is_killed_by_timeout(capsys):
+    code = simulate("--count", "4", "--fail-nvenc", "0", "--fail-crash", "0", "--fail-disk-full", "0",
+                    "--fail-corrupt", "0", "--fail-hang", "0.5", "--", "--jobs", "2", "--timeout", "1")
+    output = capsys.readouterr().out
+    assert code == 0, output
+    assert "hang " in output
+
+def test_budget_exceeded_fails(capsys):
+    code = simulate("--count", "4", "--budget-ms", "0", "--", "--jobs", "1")
+    output = capsys.readouterr().out
+    assert code == 1
+    assert "超出上限" in output
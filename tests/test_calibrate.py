@@ -0,0 +1,76 @@
+"""按校准结果选择预设与所需倍速，以及批次开始前的补充校准"""
+import asyncio
+import logging
+import math
+import time
+from pathlib import Path
+
+import pytest
+
+from vsm import calibrate
+from vsm.calibrate import calibrate_missing, choose_preset, required_speed
+from vsm.media import DEFAULT_PRESETS
+
+SPEEDS = {"veryfast": 6.0, "fast": 3.0, "medium": 2.0, "slow": 1.0}
+
+def test_choose_preset_without_calibration():
+    assert choose_preset({}, "libx264", 1.0) == (DEFAULT_PRESETS["libx264"], None)
+
+@pytest.mark.parametrize("required, expected", [
+    (0.0, ("slow", 1.0)),
+    (1.5, ("medium", 2.0)),
+    (2.0, ("medium", 2.0)),
+    (5.0, ("veryfast", 6.0)),
+    (10.0, ("veryfast", 6.0)),  # 都达不到时选最快的已校准预设
+])
+def test_choose_preset_slowest_fast_enough(required, expected):
+    assert choose_preset(SPEEDS, "libx264", required) == expected
+
+def test_choose_preset_ignores_unknown_presets():
+    assert choose_preset({"p9": 100.0, "p4": 2.0}, "h264_nvenc", 1.0) == ("p4", 2.0)
+
+def test_required_speed_from_target():
+    assert required_speed(1.5, None, 2, 0.0) == 3.0
+    assert required_speed(1.5, None, 0, 0.0) == 1.5
+    assert required_speed(None, None, 4, 1000.0) == 0.0
+
+def test_required_speed_from_deadline():
+    required = required_speed(None, time.time() + 100, 2, 300.0)
+    assert required == pytest.approx(3.0, rel=0.01)
+    assert required_speed(5.0, time.time() + 100, 1, 300.0) == 5.0
+    assert math.isinf(required_speed(None, time.time() - 1, 1, 300.0))
+
+@pytest.fixture
+def fake_probe(monkeypatch):
+    """探测结果按文件名中的高度生成，记录每次探测与校准"""
+    calls = {"probe": [], "calibrate": []}
+
+    async def probe_job(video_path):
+        calls["probe"].append(video_path.name)
+        height = int(video_path.stem.split("_")[1])
+        return {"duration": 60.0, "frame_rate": 24.0, "width": height * 16 // 9, "height": height}
+
+    async def calibrate_video(video_path, encoder, presets, logger, sample_seconds, info=None):
+        assert info is not None  # 复用已有的探测结果
+        calls["calibrate"].append(video_path.name)
+        return f"{encoder}|{info['height']}p", {}
+
+    monkeypatch.setattr(calibrate, "probe_job", probe_job)
+    monkeypatch.setattr(calibrate, "calibrate_video", calibrate_video)
+    monkeypatch.setattr(calibrate, "load_calibration", lambda: {"libx264|1080p": {}})
+    return calls
+
+def pairs_of(*names):
+    return [(Path(name), []) for name in names]
+
+def test_calibrate_missing_probes_once_and_calibrates_each_new_resolution(fake_probe):
+    pairs = pairs_of("a_1080.mp4", "b_720.mp4", "c_720.mp4", "d_480.mp4")
+    infos = asyncio.run(calibrate_missing(pairs, ["libx264"], logging.getLogger("test")))
+    assert [info["height"] for info in infos] == [1080, 720, 720, 480]
+    assert sorted(fake_probe["probe"]) == ["a_1080.mp4", "b_720.mp4", "c_720.mp4", "d_480.mp4"]
+    assert fake_probe["calibrate"] == ["b_720.mp4", "d_480.mp4"]
+
+def test_calibrate_missing_skips_calibrated_batch(fake_probe):
+    infos = asyncio.run(calibrate_missing(pairs_of("a_1080.mp4", "b_1080.mp4"), ["libx264"], logging.getLogger("test")))
+    assert len(infos) == 2
+    assert fake_probe["calibrate"] == []
@@ -0,0 +1,69 @@
+"""按存储设备的并发与剩余空间准入"""
+from collections import namedtuple
+
+import pytest
+
+from vsm import devices
+from vsm.devices import DeviceAdmission
+
+GIB = 1 << 30
+DiskUsage = namedtuple("DiskUsage", "total used free")
+
+@pytest.fixture
+def free_space(monkeypatch):
+    """模拟各目录的剩余空间，值为 None 时查询失败"""
+    space = {}
+
+    def disk_usage(directory):
+        if space.get(directory) is None:
+            raise OSError("不可用")
+        return DiskUsage(0, 0, space[directory])
+
+    monkeypatch.setattr(devices.shutil, "disk_usage", disk_usage)
+    return space
+
+def test_unknown_device_is_admitted(free_space):
+    assert DeviceAdmission(1).check(None, "/any", 100 * GIB) == "admit"
+
+def test_device_jobs_limit(free_space):
+    free_space["/disk"] = 100 * GIB
+    admission = DeviceAdmission(2)
+    for _ in range(2):
+        assert admission.check(1, "/disk", GIB) == "admit"
+        admission.acquire(1, GIB)
+    assert admission.check(1, "/disk", GIB) == "wait"
+    assert admission.check(2, "/disk", GIB) == "admit"  # 其他设备不受影响
+    admission.release_slot(1)
+    assert admission.check(1, "/disk", GIB) == "admit"
+
+def test_unlimited_device_jobs(free_space):
+    free_space["/disk"] = 100 * GIB
+    admission = DeviceAdmission(0)
+    for _ in range(10):
+        admission.acquire(1, GIB)
+    assert admission.check(1, "/disk", GIB) == "admit"
+
+def test_space_reservation_waits_then_rejects(free_space):
+    free_space["/disk"] = 10 * GIB
+    admission = DeviceAdmission(0, reserve=GIB)
+    assert admission.check(1, "/disk", 8 * GIB) == "admit"
+    admission.acquire(1, 8 * GIB)
+    # 同设备有预留时等待其完成；预留释放后空间仍不足则拒绝
+    assert admission.check(1, "/disk", 8 * GIB) == "wait"
+    admission.release_slot(1)
+    admission.release_space(1, 8 * GIB)
+    free_space["/disk"] = 5 * GIB
+    admission.begin_round()
+    assert admission.check(1, "/disk", 8 * GIB) == "reject"
+
+def test_free_space_queried_once_per_round(free_space):
+    free_space["/disk"] = 10 * GIB
+    admission = DeviceAdmission(0, reserve=0)
+    assert admission.check(1, "/disk", 8 * GIB) == "admit"
+    free_space["/disk"] = 0
+    assert admission.check(1, "/disk", 8 * GIB) == "admit"  # 本轮沿用已查询的值
+    admission.begin_round()
+    assert admission.check(1, "/disk", 8 * GIB) == "reject"
+
+def test_unknown_free_space_is_admitted(free_space):
+    assert DeviceAdmission(1).check(1, "/missing", 100 * GIB) == "admit"
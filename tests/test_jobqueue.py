@@ -0,0 +1,119 @@
+"""共享任务队列的领取、租约回收与完成"""
+import json
+import logging
+import os
+import time
+
+import pytest
+
+from vsm.jobqueue import claim_job, complete_job, enqueue_jobs, init_job_queue, renew_lease, requeue_expired_jobs
+
+logger = logging.getLogger("vsm.test")
+LEASE_TIMEOUT = 60
+
+def make_pair(directory, stem="a"):
+    video_path, subtitle_path = directory / f"{stem}.mp4", directory / f"{stem}.srt"
+    video_path.write_bytes(b"video")
+    subtitle_path.write_text("1\n", encoding='utf-8')
+    return video_path, [subtitle_path]
+
+@pytest.fixture
+def queue(tmp_path):
+    queue_dir = init_job_queue(tmp_path / "queue")
+    enqueue_jobs(queue_dir, [make_pair(tmp_path)], logger)
+    return queue_dir
+
+def expire(path):
+    past = time.time() - 10 * LEASE_TIMEOUT
+    os.utime(path, (past, past))
+
+def names(queue_dir, state):
+    return [path.name for path in (queue_dir / state).glob("*.json")]
+
+def test_claim_writes_lease_and_counts_attempt(queue):
+    job = claim_job(queue, "w1")
+    assert job["worker"] == "w1" and job["attempts"] == 1
+    assert names(queue, "pending") == []
+    lease = json.loads((queue / "leases" / f"{job['id']}.json").read_text(encoding='utf-8'))
+    assert lease == {"id": job["id"], "worker": "w1"}
+    assert claim_job(queue, "w2") is None
+
+def test_fresh_lease_is_kept(queue):
+    job = claim_job(queue, "w1")
+    expire(queue / "claimed" / f"{job['id']}.json")  # 只看租约，不看任务文件的时间
+    assert requeue_expired_jobs(queue, logger, LEASE_TIMEOUT) == 0
+    assert names(queue, "claimed") == [f"{job['id']}.json"]
+
+def test_expired_lease_is_requeued(queue):
+    job = claim_job(queue, "w1")
+    expire(queue / "leases" / f"{job['id']}.json")
+    assert requeue_expired_jobs(queue, logger, LEASE_TIMEOUT) == 1
+    assert names(queue, "claimed") == [] and names(queue, "leases") == []
+    requeued = json.loads((queue / "pending" / f"{job['id']}.json").read_text(encoding='utf-8'))
+    assert "worker" not in requeued and requeued["attempts"] == 1
+    assert claim_job(queue, "w2")["attempts"] == 2
+
+def test_expired_lease_after_max_attempts_fails(queue):
+    job = claim_job(queue, "w1")
+    expire(queue / "leases" / f"{job['id']}.json")
+    assert requeue_expired_jobs(queue, logger, LEASE_TIMEOUT, max_attempts=1) == 0
+    failed = json.loads((queue / "failed" / f"{job['id']}.json").read_text(encoding='utf-8'))
+    assert "error" in failed and names(queue, "pending") == []
+
+def test_claimed_without_lease_uses_job_file_time(queue):
+    # 旧版本领取后、写入租约前失联
+    job_path = next((queue / "pending").glob("*.json"))
+    claimed_path = queue / "claimed" / job_path.name
+    os.rename(job_path, claimed_path)
+    assert requeue_expired_jobs(queue, logger, LEASE_TIMEOUT) == 0
+    expire(claimed_path)
+    assert requeue_expired_jobs(queue, logger, LEASE_TIMEOUT) == 1
+
+def test_orphan_lease_is_removed_after_timeout(queue):
+    # 创建租约后、移入 claimed 前失联：租约挡住领取，超时后被删除
+    lease_path = queue / "leases" / names(queue, "pending")[0]
+    lease_path.write_text(json.dumps({"worker": "gone"}), encoding='utf-8')
+    assert claim_job(queue, "w1") is None
+    requeue_expired_jobs(queue, logger, LEASE_TIMEOUT)
+    assert lease_path.exists()
+    expire(lease_path)
+    requeue_expired_jobs(queue, logger, LEASE_TIMEOUT)
+    assert claim_job(queue, "w1")["worker"] == "w1"
+
+def test_complete_job_moves_to_done(queue):
+    job = claim_job(queue, "w1")
+    complete_job(queue, job, True, logger)
+    assert names(queue, "done") == [f"{job['id']}.json"]
+    assert names(queue, "claimed") == [] and names(queue, "leases") == []
+
+def test_reclaimed_job_is_not_completed_by_previous_worker(queue):
+    job = claim_job(queue, "w1")
+    expire(queue / "leases" / f"{job['id']}.json")
+    requeue_expired_jobs(queue, logger, LEASE_TIMEOUT)
+    reclaimed = claim_job(queue, "w2")
+    with pytest.raises(FileNotFoundError):
+        renew_lease(queue, job["id"], "w1")
+    complete_job(queue, job, False, logger)
+    assert names(queue, "failed") == [] and names(queue, "claimed") == [f"{job['id']}.json"]
+    complete_job(queue, reclaimed, True, logger)
+    assert names(queue, "done") == [f"{job['id']}.json"]
+
+def test_enqueue_skips_pending_and_unchanged_finished(queue, tmp_path, caplog):
+    caplog.set_level(logging.INFO, logger="vsm.test")
+    pair = (tmp_path / "a.mp4", [tmp_path / "a.srt"])
+    assert enqueue_jobs(queue, [pair], logger) == 0  # 仍在 pending 中
+    job = claim_job(queue, "w1")
+    complete_job(queue, job, False, logger)
+    assert enqueue_jobs(queue, [pair], logger) == 0
+    assert names(queue, "failed") == [f"{job['id']}.json"]
+    assert "跳过" in caplog.text
+
+def test_enqueue_supersedes_finished_job_when_video_replaced(queue, tmp_path):
+    job = claim_job(queue, "w1")
+    complete_job(queue, job, True, logger)
+    video_path, _ = make_pair(tmp_path)
+    video_path.write_bytes(b"a different video")
+    assert enqueue_jobs(queue, [(video_path, [tmp_path / "a.srt"])], logger) == 1
+    assert names(queue, "done") == []
+    requeued = json.loads((queue / "pending" / f"{job['id']}.json").read_text(encoding='utf-8'))
+    assert requeued["size"] == len(b"a different video") and requeued["attempts"] == 0
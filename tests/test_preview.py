@@ -0,0 +1,21 @@
+"""预览截图时刻的选择"""
+from vsm.preview import pick_preview_points
+
+CUES = [(0.0, 1.0), (100.0, 101.0), (102.0, 103.0), (104.0, 105.0), (200.0, 201.0)]
+
+def test_empty():
+    assert pick_preview_points([], 3, 10.0) == []
+    assert pick_preview_points(CUES, 0, 10.0) == []
+
+def test_densest_window_first():
+    assert pick_preview_points(CUES, 1, 10.0) == [100.5]
+
+def test_points_are_spread_and_sorted():
+    # 窗口间隔至少为总跨度的 1/(2*count) = 50.25 秒，同一场景只取一处
+    assert pick_preview_points(CUES, 2, 10.0) == [0.5, 100.5]
+    assert pick_preview_points(CUES, 3, 10.0) == [0.5, 100.5, 200.5]
+
+def test_spacing_limits_count():
+    # 间隔 max(1, 201/20) 秒，相距 2 秒的字幕只取一条
+    assert pick_preview_points(CUES, 10, 1.0) == [0.5, 100.5, 200.5]
+    assert pick_preview_points(CUES, 100, 1.0) == [0.5, 100.5, 102.5, 104.5, 200.5]
@@ -0,0 +1,52 @@
+"""字幕时间轴校正"""
+import asyncio
+import logging
+
+import pytest
+
+from vsm.fakeffmpeg import read_media, write_media
+from vsm.merger import MergeOptions, embed_subtitles
+from vsm.retime import Retiming
+
+def test_identity():
+    retiming = Retiming.from_values()
+    assert retiming.is_identity
+    assert list(retiming.apply([0.0, 1.5])) == [0.0, 1.5]
+
+def test_offset_and_fps_conversion():
+    retiming = Retiming.from_values(offset=-2, fps="25:24")
+    assert list(retiming.apply([0.0, 24.0])) == pytest.approx([-2.0, 23.0])
+
+def test_single_anchor_shifts():
+    retiming = Retiming.from_values(anchors=["00:01:00=00:01:02.5"])
+    assert list(retiming.apply([0.0, 60.0, 120.0])) == pytest.approx([2.5, 62.5, 122.5])
+
+def test_anchors_interpolate_and_extrapolate():
+    retiming = Retiming.from_values(anchors=["10=10", "20=30", "30=40"])
+    # 锚点之间分段线性，范围之外沿首尾两段的斜率外推
+    assert list(retiming.apply([15.0, 25.0, 0.0, 40.0])) == pytest.approx([20.0, 35.0, -10.0, 50.0])
+
+def test_anchors_then_scale_then_offset():
+    retiming = Retiming.from_values(offset=1, stretch="2", anchors=["0=0", "10=20"])
+    assert list(retiming.apply([5.0])) == pytest.approx([21.0])
+
+def test_duplicate_anchor_rejected():
+    with pytest.raises(ValueError):
+        Retiming.from_values(anchors=["10=11", "10=12"])
+
+def test_vectorized_matches_scalar():
+    pytest.importorskip("numpy")
+    retiming = Retiming.from_values(offset=0.5, fps="23.976:25", anchors=["10=12", "100=99", "200=205"])
+    times = [0.0, 5.0, 10.0, 55.5, 100.0, 150.0, 200.0, 300.0]
+    assert list(retiming.apply(times)) == pytest.approx([retiming._apply_one(t) for t in times])
+
+def test_merge_retime_overrides_smart_render(tmp_path, fake_ffmpeg, caplog):
+    # 校正后的字幕只在内存中，智能渲染读取不到，改为完整重编码并记录
+    video_path, subtitle_path, output_path = tmp_path / "ep.mp4", tmp_path / "ep.srt", tmp_path / "Rep.mp4"
+    write_media(video_path, "ep", 20.0)
+    subtitle_path.write_text("1\n00:00:08,500 --> 00:00:09,000\n台词\n\n", encoding='utf-8')
+    options = MergeOptions(use_nvenc=False, smart_render=True, retime=Retiming.from_values(offset=1))
+    caplog.set_level(logging.INFO)
+    assert asyncio.run(embed_subtitles(video_path, [subtitle_path], [output_path], logging.getLogger("test"), options))
+    assert "忽略 --smart-render" in caplog.text
+    assert read_media(output_path)["encoder"] == "libx264"
@@ -0,0 +1,58 @@
+"""并行目录扫描与扫描索引"""
+import json
+import os
+
+import pytest
+
+from vsm import scan
+from vsm.scan import list_directory, scan_index_path, scan_tree
+
+OLD_NS = 1_000_000_000_000_000_000
+
+@pytest.fixture
+def tree(tmp_path, monkeypatch):
+    """root/season/{ep1.mp4, ep1.srt}；目录修改时间设为过去，避免被当作刚改动而每次重新列出"""
+    monkeypatch.setattr(scan, "SCAN_INDEX_DIR", tmp_path / "index")
+    root = tmp_path / "root"
+    season = root / "season"
+    season.mkdir(parents=True)
+    (season / "ep1.mp4").write_bytes(b"video")
+    (season / "ep1.srt").write_text("1\n", encoding='utf-8')
+    for path in (season, root):
+        os.utime(path, ns=(OLD_NS, OLD_NS))
+    return root
+
+def test_index_records_names_only(tree):
+    scan_tree(tree)
+    index = json.loads(scan_index_path(tree).read_text(encoding='utf-8'))
+    assert index["dirs"]["season"]["files"] == ["ep1.mp4", "ep1.srt"]
+    assert index["dirs"]["."]["subdirs"] == ["season"]
+
+def test_unchanged_directories_reuse_index(tree):
+    scan_tree(tree)
+    # 原地改写文件不改变目录的修改时间，目录沿用索引，文件名仍然正确
+    (tree / "season" / "ep1.mp4").write_bytes(b"re-encoded video")
+    snapshot = scan_tree(tree)
+    assert snapshot.changed == set()
+    assert list(snapshot.files(".mp4")) == [tree / "season" / "ep1.mp4"]
+
+def test_new_file_relists_directory(tree):
+    scan_tree(tree)
+    (tree / "season" / "ep2.mp4").write_bytes(b"video")
+    snapshot = scan_tree(tree)
+    assert snapshot.changed == {tree / "season"}
+    assert sorted(path.name for path in snapshot.files(".mp4")) == ["ep1.mp4", "ep2.mp4"]
+
+@pytest.mark.parametrize("record", [
+    {"subdirs": [], "files": {"ep1.mp4": [5, 0]}},
+    {"subdirs": [], "files": [["ep1.mp4", 5]]},
+    {"subdirs": None, "files": []},
+    ["not", "a", "record"],
+])
+def test_malformed_record_is_relisted(tree, record):
+    season = tree / "season"
+    if isinstance(record, dict):
+        record = dict(record, mtime_ns=OLD_NS)
+    _, subdirs, files, _, relisted = list_directory(season, record)
+    assert relisted
+    assert (subdirs, files) == ([], ["ep1.mp4", "ep1.srt"])
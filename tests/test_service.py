@@ -0,0 +1,57 @@
+"""服务接口拒绝跨站请求与未授权请求"""
+import os
+
+import pytest
+
+from vsm.service import MergeService, RequestError, allowed_hosts, load_token
+
+TOKEN = "secret"
+AUTH = {"host": "localhost:8765", "authorization": f"Bearer {TOKEN}"}
+JSON = {"content-type": "application/json"}
+
+@pytest.fixture
+def service():
+    return MergeService(None, None, TOKEN, allowed_hosts("127.0.0.1", 8765))
+
+def rejected(service, method, path, headers):
+    with pytest.raises(RequestError) as info:
+        service.check_request(method, path, headers)
+    return info.value.status
+
+def test_accepts_authorized_json(service):
+    service.check_request("POST", "/jobs", {**AUTH, "content-type": "application/json; charset=utf-8"})
+    service.check_request("GET", "/events", {**AUTH, "host": "127.0.0.1:8765"})
+
+def test_rejects_browser_requests(service):
+    assert rejected(service, "POST", "/jobs", {**AUTH, **JSON, "origin": "http://evil.example"}) == 403
+    assert rejected(service, "POST", "/jobs", {**AUTH, "content-type": "text/plain"}) == 415
+    assert rejected(service, "POST", "/jobs", AUTH) == 415
+
+def test_rejects_foreign_host(service):
+    # DNS 重绑定时 Host 是攻击者的域名
+    assert rejected(service, "GET", "/jobs", {**AUTH, "host": "evil.example:8765"}) == 403
+    assert rejected(service, "GET", "/jobs", {**AUTH, "host": "localhost:9999"}) == 403
+
+def test_requires_token_except_health(service):
+    assert rejected(service, "GET", "/jobs", {"host": "localhost:8765"}) == 401
+    assert rejected(service, "GET", "/jobs", {**AUTH, "authorization": "Bearer wrong"}) == 401
+    service.check_request("GET", "/health", {"host": "localhost:8765"})
+
+def test_unix_socket_still_rejects_origin():
+    service = MergeService(None, None)
+    service.check_request("GET", "/jobs", {})
+    assert rejected(service, "GET", "/jobs", {"origin": "null"}) == 403
+
+def test_wildcard_listen_skips_host_check():
+    assert allowed_hosts("0.0.0.0", 8765) is None
+    assert "[::1]:8765" in allowed_hosts("::1", 8765)
+
+@pytest.mark.skipif(os.name == "nt", reason="依赖 POSIX 权限位")
+def test_token_file_created_private_and_reused(tmp_path):
+    path = tmp_path / "service" / "token"
+    token = load_token(path)
+    assert path.stat().st_mode & 0o777 == 0o600
+    assert load_token(path) == token
+    path.chmod(0o644)
+    with pytest.raises(ValueError):
+        load_token(path)
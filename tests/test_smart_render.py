@@ -0,0 +1,67 @@
+"""智能渲染的分段计划、编码参数匹配与 IDR 帧探测"""
+import asyncio
+import logging
+
+import pytest
+
+from vsm.fakeffmpeg import GOP_SECONDS, read_media, write_media
+from vsm.media import get_idr_frame_times, matching_encoder_args
+from vsm.smart_render import SMART_RENDER_MARGIN, plan_smart_render, smart_render_subtitles
+
+KEYFRAMES = [0.0, 2.0, 4.0, 6.0, 8.0]
+
+def test_plan_marks_and_merges_gops():
+    # 字幕扩展余量后为 (4.1, 5.5)，只落在 [4, 6) 中
+    assert plan_smart_render(KEYFRAMES, [(4.6, 5.0)], 10.0) == [(0.0, 4.0, False), (4.0, 6.0, True), (6.0, 10.0, False)]
+
+def test_plan_cue_across_gop_boundary_dirties_both():
+    assert plan_smart_render(KEYFRAMES, [(3.0, 5.0)], 10.0) == [(0.0, 2.0, False), (2.0, 6.0, True), (6.0, 10.0, False)]
+
+def test_plan_margin_reaches_next_gop():
+    end = 6.0 - SMART_RENDER_MARGIN / 2
+    assert plan_smart_render(KEYFRAMES, [(5.0, end)], 10.0)[1] == (4.0, 8.0, True)
+
+def test_plan_without_cues_is_one_clean_segment():
+    assert plan_smart_render(KEYFRAMES, [], 10.0) == [(0.0, 10.0, False)]
+
+def test_plan_ignores_keyframes_past_duration():
+    assert plan_smart_render([0.0, 2.0, 12.0], [(0.5, 1.0)], 4.0) == [(0.0, 2.0, True), (2.0, 4.0, False)]
+
+def test_plan_without_keyframes():
+    assert plan_smart_render([], [(0.5, 1.0)], 4.0) == []
+
+STREAM = {"codec_name": "h264", "profile": "High", "level": 41, "refs": 4, "has_b_frames": 2}
+
+def test_matching_encoder_args():
+    assert matching_encoder_args(False, STREAM) == ["-profile:v", "high", "-level", "4.1", "-refs", "4", "-bf", "2"]
+    assert matching_encoder_args(True, dict(STREAM, profile="Constrained Baseline", has_b_frames=0))[:2] == \
+        ["-profile:v", "baseline"]
+
+@pytest.mark.parametrize("stream", [
+    dict(STREAM, profile="High 10"),  # NVENC 不支持 10 bit H.264
+    dict(STREAM, level=-99),
+    {key: value for key, value in STREAM.items() if key != "refs"},
+])
+def test_matching_encoder_args_unmatched(stream):
+    assert matching_encoder_args(True, stream) is None
+
+@pytest.mark.parametrize("start_time", [0.0, 1.4])
+def test_idr_frame_times_are_zero_based(tmp_path, fake_ffmpeg, start_time):
+    # 起始时间不为 0 时（常见于转封装的 TS/广播 MP4），IDR 时间与字幕、切分点同样从 0 开始
+    video_path = tmp_path / "video.mp4"
+    write_media(video_path, "video", 9.0, start_time=start_time)
+    keyframes = get_idr_frame_times(video_path)
+    assert keyframes == [index * GOP_SECONDS for index in range(5)]
+    assert plan_smart_render(keyframes, [(4.6, 5.0)], 9.0) == [(0.0, 4.0, False), (4.0, 6.0, True), (6.0, 9.0, False)]
+
+def test_smart_render_with_start_offset(tmp_path, fake_ffmpeg, caplog):
+    video_path, subtitle_path = tmp_path / "video.mp4", tmp_path / "video.srt"
+    write_media(video_path, "video", 20.0, start_time=1.4)
+    subtitle_path.write_text("1\n00:00:08,500 --> 00:00:09,000\n台词\n\n", encoding='utf-8')
+    with caplog.at_level(logging.INFO, logger="vsm.test"):
+        assert asyncio.run(smart_render_subtitles(
+            video_path, subtitle_path, tmp_path / "Rvideo.mp4", logging.getLogger("vsm.test"), False
+        ))
+    # 只有 [8, 10) 与字幕重叠
+    assert "重编码 1/3 段" in caplog.text
+    assert read_media(tmp_path / "Rvideo.mp4")["duration"] == pytest.approx(20.0)
@@ -0,0 +1,16 @@
+"""命令行冷启动：--help 不加载重模块，耗时在预算之内"""
+import os
+import sys
+
+from vsm.bench import loaded_heavy_modules, time_command
+
+# vsm --help 扣除解释器空启动后的耗时上限（毫秒），较慢的 CI 可用环境变量放宽
+STARTUP_BUDGET_MS = float(os.environ.get("VSM_STARTUP_BUDGET_MS", 100))
+
+def test_help_loads_no_heavy_modules():
+    assert loaded_heavy_modules() == []
+
+def test_help_within_budget():
+    baseline = time_command([sys.executable, "-c", "pass"], 5)
+    help_ms = time_command([sys.executable, "-m", "vsm", "--help"], 5)
+    assert help_ms - baseline <= STARTUP_BUDGET_MS
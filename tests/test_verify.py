@@ -0,0 +1,31 @@
+"""编码后的输出校验：时长、各类流数量与帧数"""
+import asyncio
+import json
+import logging
+
+import pytest
+
+from vsm.fakeffmpeg import read_media, write_media
+from vsm.verify import expected_streams, verify_output
+
+def test_expected_streams_keep_all_audio_and_soft_tracks():
+    assert expected_streams({"video": 1, "audio": 2}, 3) == {"video": 1, "audio": 2, "subtitle": 3}
+    assert expected_streams({"video": 1}, 0) == {"video": 1, "audio": 0, "subtitle": 0}
+
+def write_output(path, source, **changes):
+    output = dict(read_media(source), encoder="libx264", **changes)
+    path.write_text(json.dumps(output) + "\n", encoding='utf-8')
+
+@pytest.mark.parametrize("changes, subtitle_tracks, passed", [
+    ({"subtitles": 2}, 2, True),
+    ({}, 0, True),
+    ({"subtitles": 1}, 2, False),  # 少封装了一条软字幕
+    ({"subtitles": 2}, 0, False),  # 多出字幕轨
+    ({"subtitles": 2, "audio": False}, 2, False),  # 音轨丢失
+    ({"subtitles": 2, "frames": 100}, 2, False),
+])
+def test_verify_output_stream_counts(tmp_path, fake_ffmpeg, changes, subtitle_tracks, passed):
+    video_path, output_path = tmp_path / "ep.mp4", tmp_path / "Rep.mp4"
+    write_media(video_path, "ep", 60.0)
+    write_output(output_path, video_path, **changes)
+    assert asyncio.run(verify_output(video_path, output_path, logging.getLogger("test"), 0, subtitle_tracks)) is passed
@@ -0,0 +1,3 @@
+"""FFmpeg 字幕与 MP4 视频合并工具"""
+
+__version__ = "0.1.0"
@@ -0,0 +1,6 @@
+"""支持 python -m vsm"""
+import sys
+
+from .cli import main
+
+sys.exit(main())
@@ -0,0 +1,361 @@
+"""bench 子命令：性能检查，结果以退出码判定，可在 CI 中与 tests/ 下的单元测试一起运行"""
+import os
+import heapq
+import json
+import math
+import random
+import shlex
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# `vsm --help` 不应加载的重模块：它们只在 merge 子命令真正运行时才需要
+HEAVY_MODULES = ("asyncio", "concurrent.futures", "json", "hashlib", "vsm.merger", "vsm.supervisor")
+
+# 逐个测量导入耗时的子模块
+SUBMODULES = ("vsm.cli", "vsm.rename_srt", "vsm.rename_mp4", "vsm.merger")
+
+
+def python_env():
+    """子进程环境：确保在未安装的源码树中也能导入 vsm"""
+    env = dict(os.environ)
+    root = str(Path(__file__).resolve().parents[1])
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [root, env.get("PYTHONPATH")]))
+    return env
+
+
+def time_command(cmd, runs):
+    """运行命令 runs 次，返回耗时中位数（毫秒）"""
+    env = python_env()
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def loaded_heavy_modules():
+    """在全新解释器中解析 `--help` 前的全部导入，返回其中加载了的重模块"""
+    code = (
+        "import sys\n"
+        "from vsm.cli import build_parser\n"
+        "build_parser()\n"
+        f"print('\\n'.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], env=python_env(),
+                            capture_output=True, text=True, check=True)
+    return result.stdout.split()
+
+
+def run_startup(args):
+    runs = max(1, args.runs)
+    baseline = time_command([sys.executable, "-c", "pass"], runs)
+    help_ms = time_command([sys.executable, "-m", "vsm", "--help"], runs)
+    print(f"python 空启动: {baseline:.1f} ms")
+    print(f"vsm --help:    {help_ms:.1f} ms（扣除解释器启动 {help_ms - baseline:.1f} ms）")
+
+    for module in SUBMODULES:
+        module_ms = time_command([sys.executable, "-c", f"import {module}"], runs)
+        print(f"import {module}: {module_ms - baseline:.1f} ms")
+
+    failed = False
+    heavy = loaded_heavy_modules()
+    if heavy:
+        print(f"错误：vsm --help 加载了重模块: {', '.join(heavy)}")
+        failed = True
+    if args.budget_ms is not None and help_ms - baseline > args.budget_ms:
+        print(f"错误：冷启动耗时 {help_ms - baseline:.1f} ms 超出上限 {args.budget_ms:.1f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+def run_scan(args):
+    """对比逐目录 os.walk、并行扫描与沿用扫描索引的增量扫描遍历同一目录树的耗时"""
+    from .scan import SCAN_WORKERS, scan_tree
+
+    def sequential():
+        return sum(len(filenames) for _, _, filenames in os.walk(args.directory))
+
+    workers = args.workers or SCAN_WORKERS
+    runs = max(1, args.runs)
+    for name, func in (
+        ("os.walk", sequential),
+        (f"scan_tree 全部重新列出（{workers} 线程）", lambda: scan_tree(args.directory, workers, rescan=True)),
+        (f"scan_tree 沿用扫描索引（{workers} 线程）", lambda: scan_tree(args.directory, workers)),
+    ):
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - start) * 1000)
+        print(f"{name}: {statistics.median(samples):.1f} ms")
+    return 0
+
+def write_fake_binaries(bin_dir, config_path):
+    """在 bin_dir 中写出调用 fakeffmpeg 的 ffmpeg 与 ffprobe，放在 PATH 最前面即可替代真实程序"""
+    script = Path(__file__).resolve().with_name("fakeffmpeg.py")
+    for tool in ("ffmpeg", "ffprobe"):
+        path = bin_dir / tool
+        path.write_text(
+            "#!/bin/sh\n"
+            f"export VSM_FAKE_FFMPEG={shlex.quote(str(config_path))}\n"
+            f"exec {shlex.quote(sys.executable)} -S {shlex.quote(str(script))} {tool} \"$@\"\n",
+            encoding='utf-8'
+        )
+        path.chmod(0o755)
+
+
+def write_simulated_subtitle(path, duration, rng):
+    """每隔 30~60 秒一条 3 秒的字幕"""
+    cues, moment = [], rng.uniform(5, 30)
+    while moment + 3 < duration:
+        cues.append(moment)
+        moment += rng.uniform(30, 60)
+
+    def stamp(seconds):
+        return f"{int(seconds // 3600):02d}:{int(seconds % 3600 // 60):02d}:{int(seconds % 60):02d},{int(seconds % 1 * 1000):03d}"
+
+    path.write_text("".join(
+        f"{index}\n{stamp(start)} --> {stamp(start + 3)}\n台词 {index}\n\n" for index, start in enumerate(cues, 1)
+    ), encoding='utf-8')
+
+
+def peak_concurrency(intervals):
+    events = sorted([(start, 1) for start, _ in intervals] + [(end, -1) for _, end in intervals])
+    peak = current = 0
+    for _, delta in events:
+        current += delta
+        peak = max(peak, current)
+    return peak
+
+
+def check_simulation(videos, merge_options, expected, returncode, events, max_jobs):
+    """对照预期检查每个任务的文件状态、merge 的退出码和编码进程的并发，返回问题列表"""
+    from .fakeffmpeg import read_media
+    from .merger import output_targets
+
+    problems = []
+    for video_path, subtitle_paths, expect_success in expected:
+        media_id = video_path.stem
+        finals = [target.parent / target.name[1:] for target in output_targets(video_path, merge_options)]
+        if expect_success:
+            for target, final in zip(output_targets(video_path, merge_options), finals):
+                output = read_media(final)
+                if output is None or output["id"] != media_id or not output["encoder"]:
+                    problems.append(f"{media_id}: 缺少输出 {final.name}")
+                if target.exists():
+                    problems.append(f"{media_id}: 残留临时文件 {target.name}")
+            if video_path not in finals and video_path.exists():
+                problems.append(f"{media_id}: 原视频未删除")
+            if any(path.exists() for path in subtitle_paths):
+                problems.append(f"{media_id}: 字幕未删除")
+        else:
+            source = read_media(video_path)
+            if source is None or source["encoder"] is not None:
+                problems.append(f"{media_id}: 预期失败，但原视频已被替换或删除")
+            if not all(path.exists() for path in subtitle_paths):
+                problems.append(f"{media_id}: 预期失败，但字幕已被删除")
+            if video_path not in finals and any(final.exists() for final in finals):
+                problems.append(f"{media_id}: 预期失败，但留下了最终输出")
+
+    expected_code = 0 if all(expect_success for _, _, expect_success in expected) else 1
+    if returncode != expected_code:
+        problems.append(f"merge 退出码为 {returncode}，预期 {expected_code}")
+    leftovers = [path for path in videos.rglob(".smart_*")]
+    if leftovers:
+        problems.append(f"残留 {len(leftovers)} 个智能渲染临时目录")
+
+    encodes = [(event["start"], event["end"]) for event in events if event["role"] == "encode" and event["end"]]
+    peak = peak_concurrency(encodes)
+    if peak > max_jobs:
+        problems.append(f"同时编码的进程数达到 {peak}，超过上限 {max_jobs}")
+    by_id = {}
+    for event in events:
+        if event["role"] == "encode" and event["end"]:
+            by_id.setdefault(event["id"], []).append((event["start"], event["end"]))
+    overlapped = [media_id for media_id, intervals in by_id.items() if peak_concurrency(intervals) > 1]
+    if overlapped:
+        problems.append(f"{len(overlapped)} 个任务被同时编码多次，如 {overlapped[0]}")
+    return problems, peak
+
+
+def spawn_time(event):
+    """进程被创建的时刻；模拟程序取不到（非 Linux）时退回开始运行的时刻"""
+    return event["start"] if event.get("spawned") is None else event["spawned"]
+
+
+def scheduling_gaps(events, max_jobs):
+    """从事件日志直接测量调度开销，返回 (任务间间隔, 任务内间隔) 两个列表（秒）
+
+    每个任务占用编码槽位的时段为第一个 ffmpeg 进程（智能渲染的 IDR 探测或编码）被创建到最后一个编码进程退出，
+    此前的 ffprobe 是提交时的探测，此后的 ffmpeg 是编码后的校验，都不占用编码槽位。
+    任务间间隔：槽位占满后，新任务的第一个编码进程被创建时刻减去它所替换的槽位上一任务的退出时刻
+    （并发不超过 max_jobs，因此替换的是最早退出的那个）；卡住的进程退出时刻未知，不计。
+    任务内间隔：槽位时段内，同一任务的每个进程（含 IDR 探测等非编码进程）被创建时刻减去此前进程的最晚退出时刻。
+    """
+    by_id = {}
+    for event in events:
+        if event.get("id") is not None:
+            by_id.setdefault(event["id"], []).append(event)
+
+    slots, within = [], []
+    for job_events in by_id.values():
+        encodes = [event for event in job_events if event["role"] == "encode"]
+        if not encodes:
+            continue
+        begin = min(spawn_time(event) for event in job_events if event["tool"] == "ffmpeg")
+        end = None if any(event["end"] is None for event in encodes) else max(event["end"] for event in encodes)
+        slots.append((begin, math.inf if end is None else end))
+        last_end = None
+        for event in sorted(job_events, key=spawn_time):
+            spawned = spawn_time(event)
+            if spawned < begin or (end is not None and spawned > end):
+                continue
+            if last_end is not None:
+                within.append(spawned - last_end)
+            if event["end"] is None:
+                break
+            last_end = event["end"] if last_end is None else max(last_end, event["end"])
+
+    between, running = [], []
+    for begin, end in sorted(slots):
+        if len(running) >= max_jobs:
+            freed = heapq.heappop(running)
+            if freed != math.inf:
+                between.append(begin - freed)
+        heapq.heappush(running, end)
+    return between, within
+
+
+def run_simulate(args):
+    """用模拟的 ffmpeg/ffprobe 驱动完整的 merge 子命令处理大量任务，检查每个任务的结果并统计调度开销"""
+    from .cli import build_parser
+    from .fakeffmpeg import FAULTS, planned_fault, write_media
+    from .merger import MergeOptions
+
+    if os.name != "posix":
+        print("模拟运行需要 POSIX 系统（模拟程序以 shell 脚本的形式放在 PATH 中）")
+        return 1
+    merge_args = ["--device-jobs", "0", *(args.merge_args[1:] if args.merge_args[:1] == ["--"] else args.merge_args)]
+    merge_parsed = build_parser().parse_args(["merge", ".", *merge_args])
+    if args.fail_hang and merge_parsed.timeout is None:
+        print("错误：--fail-hang 需要在 merge 参数中指定 --timeout，否则卡住的任务不会结束")
+        return 2
+    if not 0 < args.min_duration <= args.max_duration:
+        print("错误：时长范围无效")
+        return 2
+
+    work_dir = Path(tempfile.mkdtemp(prefix="vsm_simulate_"))
+    keep = args.keep
+    try:
+        bin_dir, home_dir, videos = work_dir / "bin", work_dir / "home", work_dir / "videos"
+        for directory in (bin_dir, home_dir, videos):
+            directory.mkdir()
+        config = {
+            "speed": args.speed, "gpu": not args.no_gpu, "seed": args.seed, "log": str(work_dir / "events.jsonl"),
+            "faults": {name: getattr(args, f"fail_{name}") for name in FAULTS},
+        }
+        config_path = work_dir / "config.json"
+        config_path.write_text(json.dumps(config, indent=2), encoding='utf-8')
+        write_fake_binaries(bin_dir, config_path)
+
+        # 每 100 个视频一个目录，每 4 个视频中有 1 个另带日文字幕（封装为软字幕）
+        rng = random.Random(args.seed)
+        expected, faults = [], {}
+        for index in range(args.count):
+            directory = videos / f"season_{index // 100:02d}"
+            directory.mkdir(exist_ok=True)
+            media_id = f"ep_{index:05d}"
+            duration = round(rng.uniform(args.min_duration, args.max_duration), 3)
+            video_path = directory / f"{media_id}.mp4"
+            write_media(video_path, media_id, duration)
+            subtitle_paths = [directory / f"{media_id}.srt"]
+            if index % 4 == 0:
+                subtitle_paths.append(directory / f"{media_id}.ja.srt")
+            for path in subtitle_paths:
+                write_simulated_subtitle(path, duration, rng)
+            fault = planned_fault(config, media_id)
+            faults[fault] = faults.get(fault, 0) + 1
+            failed = fault in ("crash", "disk_full", "hang") or (fault == "corrupt" and not merge_parsed.no_verify)
+            expected.append((video_path, subtitle_paths, not failed))
+
+        env = python_env()
+        env["PATH"] = os.pathsep.join([str(bin_dir), env.get("PATH", "")])
+        env["HOME"] = str(home_dir)  # 吞吐量统计、扫描索引等写入临时目录，不影响本机的记录
+        cmd = [sys.executable, "-m", "vsm", "merge", str(videos), *merge_args]
+        print(f"模拟 {args.count} 个任务（{args.speed:g} 倍实时）: vsm merge {' '.join(merge_args)}")
+        launched, start = time.time(), time.perf_counter()
+        with open(work_dir / "merge.log", "wb") as log:
+            returncode = subprocess.run(cmd, env=env, stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT).returncode
+        wall = time.perf_counter() - start
+
+        events = []
+        if (work_dir / "events.jsonl").exists():
+            with open(work_dir / "events.jsonl", encoding='utf-8') as f:
+                events = [json.loads(line) for line in f if line.strip()]
+        max_jobs = max(1, merge_parsed.jobs)
+        if merge_parsed.device_jobs:
+            max_jobs = min(max_jobs, merge_parsed.device_jobs)
+        problems, peak = check_simulation(
+            videos, MergeOptions.from_args(merge_parsed, False), expected, returncode, events, max_jobs
+        )
+
+        tools = {tool: sum(1 for event in events if event["tool"] == tool) for tool in ("ffmpeg", "ffprobe")}
+        processes = tools["ffmpeg"] + tools["ffprobe"]
+        succeeded = sum(1 for _, _, expect_success in expected if expect_success)
+        injected = ", ".join(f"{name} {count}" for name, count in faults.items() if name) or "无"
+        print(f"注入故障: {injected}；预期成功 {succeeded}，失败 {args.count - succeeded}")
+        print(f"耗时 {wall:.2f} s，{args.count / wall:.1f} 个任务/秒，峰值同时编码 {peak}/{max_jobs}")
+
+        cpus = os.cpu_count() or 1
+        print(f"FFmpeg 进程 {tools['ffmpeg']} 个，FFprobe 进程 {tools['ffprobe']} 个（每个任务 {processes / args.count:.1f} 个）")
+        if events:
+            # 每次调用模拟程序都要启动一个解释器，吞吐量受它的 CPU 开销限制，与 vsm 的调度无关
+            startup_ms = statistics.mean(event["startup_cpu"] for event in events) * 1000
+            limit = cpus * 1000 / (processes / args.count * startup_ms)
+            print(f"模拟程序每次启动消耗 CPU {startup_ms:.1f} ms，仅进程启动就把吞吐量限制在约 "
+                  f"{limit:.1f} 个任务/秒（{cpus} 个 CPU）")
+        if any(event.get("spawned") is None for event in events):
+            print("无法取得进程创建时刻（需要 Linux 的 /proc），以下间隔包含模拟程序的启动耗时")
+        encodes = [spawn_time(event) for event in events if event["role"] == "encode"]
+        if encodes:
+            print(f"第一个编码进程在 merge 启动 {min(encodes) - launched:.2f} s 后创建（含解释器启动与探测全部视频）")
+
+        between, within = scheduling_gaps(events, max_jobs)
+        scheduling_ms = (sum(between) + sum(within)) / args.count * 1000
+
+        def describe(gaps):
+            return f"平均 {statistics.mean(gaps) * 1000:.1f} ms（{len(gaps)} 次）" if gaps else "无"
+        print(f"调度开销（进程退出到下一个进程被创建）：任务间 {describe(between)}，任务内 {describe(within)}，"
+              f"每个任务合计 {scheduling_ms:.1f} ms")
+
+        failed = bool(problems)
+        for problem in problems[:20]:
+            print(f"错误：{problem}")
+        if len(problems) > 20:
+            print(f"……共 {len(problems)} 个问题")
+        if args.budget_ms is not None and scheduling_ms > args.budget_ms:
+            print(f"错误：每个任务的调度开销 {scheduling_ms:.1f} ms 超出上限 {args.budget_ms:.1f} ms")
+            failed = True
+        keep = keep or failed
+        if keep:
+            print(f"模拟目录已保留: {work_dir}（merge 输出见 merge.log，把 bin 放在 PATH 最前面即可单独使用模拟程序）")
+        return 1 if failed else 0
+    finally:
+        if not keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+def run(args):
+    """bench 子命令入口"""
+    if args.bench_command == "startup":
+        return run_startup(args)
+    if args.bench_command == "scan":
+        return run_scan(args)
+    if args.bench_command == "simulate":
+        return run_simulate(args)
+    return 1
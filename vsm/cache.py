@@ -0,0 +1,130 @@
+"""内容寻址的输出缓存：视频、字幕和编码设置都相同时直接复用已有输出"""
+import os
+import json
+import time
+import shutil
+import socket
+import hashlib
+from datetime import datetime
+from pathlib import Path
+
+from .defaults import CACHE_MAX_SIZE_GB, CACHE_MAX_AGE_DAYS
+from .fsutil import write_json_atomic
+from .subtitles import subtitle_language
+
+# 内容指纹的采样块大小与块数
+CACHE_CHUNK_SIZE = 1 << 20
+CACHE_SAMPLE_CHUNKS = 8
+# Linux 下 reflink（写时复制克隆）使用的 ioctl 请求号
+FICLONE = 0x40049409
+
+def fast_file_hash(path):
+    """快速内容指纹：文件大小 + 均匀分布的若干个采样块，不读取整个视频"""
+    size = os.path.getsize(path)
+    digest = hashlib.blake2b(str(size).encode('ascii'), digest_size=20)
+    with open(path, 'rb') as f:
+        if size <= CACHE_CHUNK_SIZE * CACHE_SAMPLE_CHUNKS:
+            for chunk in iter(lambda: f.read(CACHE_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        else:
+            step = (size - CACHE_CHUNK_SIZE) // (CACHE_SAMPLE_CHUNKS - 1)
+            for i in range(CACHE_SAMPLE_CHUNKS):
+                f.seek(i * step)
+                digest.update(f.read(CACHE_CHUNK_SIZE))
+    return digest.hexdigest()
+
+def output_cache_key(video_path, subtitle_paths, settings):
+    """缓存键 = 视频指纹 + 各字幕的语言与内容 + 编码设置"""
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(fast_file_hash(video_path).encode('ascii'))
+    for subtitle_path in subtitle_paths:
+        digest.update((subtitle_language(subtitle_path, video_path) or "und").encode('ascii'))
+        digest.update(hashlib.blake2b(Path(subtitle_path).read_bytes(), digest_size=20).digest())
+    digest.update(json.dumps(settings, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+def rendition_cache_key(key, name):
+    """多规格输出时每个规格单独缓存，键由整体缓存键与规格名派生"""
+    return hashlib.blake2b(f"{key}:{name}".encode('utf-8'), digest_size=20).hexdigest()
+
+def cache_entry_path(cache_dir, key):
+    return Path(cache_dir) / key[:2] / f"{key}.mp4"
+
+def materialize_file(source, destination):
+    """按 reflink、硬链接、复制的顺序把 source 放到 destination，返回实际使用的方式"""
+    destination = Path(destination)
+    if destination.exists():
+        destination.unlink()
+    try:
+        import fcntl
+        with open(source, 'rb') as src, open(destination, 'wb') as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        return "reflink"
+    except Exception:
+        if destination.exists():
+            destination.unlink()
+    try:
+        os.link(source, destination)
+        return "硬链接"
+    except OSError:
+        shutil.copy2(source, destination)
+        return "复制"
+
+def cache_lookup(cache_dir, key):
+    """查找缓存，命中时更新最近使用时间并返回缓存文件路径"""
+    entry = cache_entry_path(cache_dir, key)
+    if not entry.exists():
+        return None
+    try:
+        entry.with_suffix(".json").touch()  # 以元数据文件的修改时间作为最近使用时间
+    except OSError:
+        pass
+    return entry
+
+def cache_store(cache_dir, key, output_path, source_name, logger):
+    """把已校验通过的输出放入缓存"""
+    entry = cache_entry_path(cache_dir, key)
+    try:
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = entry.with_name(f".{entry.name}.{socket.gethostname()}-{os.getpid()}.tmp")
+        materialize_file(output_path, tmp_path)
+        os.replace(tmp_path, entry)
+        write_json_atomic(entry.with_suffix(".json"), {
+            "source": source_name,
+            "size": entry.stat().st_size,
+            "created": datetime.now().isoformat(timespec='seconds'),
+        })
+        logger.debug(f"已缓存 {source_name}: {entry}")
+    except Exception as e:
+        logger.warning(f"缓存 {source_name} 失败: {str(e)}")
+
+def evict_cache(cache_dir, logger, max_size_gb=CACHE_MAX_SIZE_GB, max_age_days=CACHE_MAX_AGE_DAYS):
+    """淘汰超过最长保留时间的缓存，再按最近使用时间淘汰，直到总大小不超过上限"""
+    cache_dir = Path(cache_dir)
+    if not cache_dir.is_dir():
+        return
+    entries = []
+    for entry in cache_dir.glob("*/*.mp4"):
+        meta = entry.with_suffix(".json")
+        try:
+            last_used = meta.stat().st_mtime if meta.exists() else entry.stat().st_mtime
+            entries.append((last_used, entry.stat().st_size, entry))
+        except FileNotFoundError:
+            continue
+    entries.sort()
+
+    now = time.time()
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for last_used, size, entry in entries:
+        if now - last_used <= max_age_days * 86400 and total <= max_size_gb * 1024 ** 3:
+            break
+        for path in (entry, entry.with_suffix(".json")):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+        total -= size
+        removed += 1
+    if removed:
+        logger.info(f"缓存淘汰 {removed} 项，剩余 {total / 1024 ** 3:.1f} GB")
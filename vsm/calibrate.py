@@ -0,0 +1,227 @@
+"""编码预设自动选择：在本机用真实输入的片段试编码各预设，之后按目标速度或截止时间为每个任务选择预设
+
+校准结果按主机、编码器和分辨率（高度）记录每个预设的吞吐量（像素/秒）与输出码率。
+选择时换算为该任务的实时倍速，取仍能满足要求的最慢（压缩效率最高）的预设：
+  --target-speed X   每个任务至少 X 倍实时速度
+  --deadline WHEN    剩余任务需在 WHEN 之前全部完成，所需速度随批次进度在每个任务开始时重新计算
+校准时机器上只运行一个编码，同时运行 jobs 个任务时每个任务大约只能得到 1/jobs 的吞吐量。
+"""
+import re
+import sys
+import json
+import time
+import socket
+import asyncio
+import logging
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from .fsutil import write_json_atomic
+from .media import DEFAULT_PRESETS, ENCODER_PRESETS, detect_nvenc_support, video_encoder_args
+from .schedule import encode_stats_key, probe_job
+from .supervisor import run_ffmpeg_async
+
+logger = logging.getLogger("vsm")
+
+# 校准结果记录文件（按主机名区分）
+CALIBRATION_PATH = Path.home() / ".video_subtitle_merger" / "calibration.json"
+CALIBRATION_VERSION = 1
+# 每个预设试编码的秒数
+CALIBRATION_SAMPLE_SECONDS = 10
+
+RELATIVE_DEADLINE_PATTERN = re.compile(r"^(\d+(?:\.\d+)?)([smh])$")
+
+def parse_deadline(text, now=None):
+    """解析截止时间，返回 Unix 时间戳
+
+    支持 HH:MM（今天，已过则为明天）、YYYY-MM-DD HH:MM 和相对时长 90m、2h、3600s
+    """
+    now = now or datetime.now()
+    text = text.strip()
+    match = RELATIVE_DEADLINE_PATTERN.match(text)
+    if match:
+        value, unit = match.groups()
+        return (now + timedelta(seconds=float(value) * {"s": 1, "m": 60, "h": 3600}[unit])).timestamp()
+    for fmt in ("%Y-%m-%d %H:%M", "%Y-%m-%dT%H:%M"):
+        try:
+            return datetime.strptime(text, fmt).timestamp()
+        except ValueError:
+            pass
+    try:
+        clock = datetime.strptime(text, "%H:%M")
+    except ValueError:
+        raise ValueError(f"无法解析截止时间 '{text}'，应为 HH:MM、YYYY-MM-DD HH:MM 或 90m、2h 的形式")
+    deadline = now.replace(hour=clock.hour, minute=clock.minute, second=0, microsecond=0)
+    if deadline <= now:
+        deadline += timedelta(days=1)
+    return deadline.timestamp()
+
+def load_calibration():
+    """读取本机的校准记录：{编码器|分辨率: {预设: {"pixel_rate", "bytes_per_second"}}}"""
+    try:
+        data = json.loads(CALIBRATION_PATH.read_text(encoding='utf-8'))
+        if data.get("version") == CALIBRATION_VERSION:
+            return data["hosts"].get(socket.gethostname(), {})
+    except Exception:
+        pass
+    return {}
+
+def save_calibration(results, logger):
+    """把新的校准结果合并进本机记录"""
+    try:
+        try:
+            data = json.loads(CALIBRATION_PATH.read_text(encoding='utf-8'))
+            if data.get("version") != CALIBRATION_VERSION:
+                raise ValueError
+        except Exception:
+            data = {"version": CALIBRATION_VERSION, "hosts": {}}
+        host = data["hosts"].setdefault(socket.gethostname(), {})
+        for key, presets in results.items():
+            host.setdefault(key, {}).update(presets)
+        CALIBRATION_PATH.parent.mkdir(parents=True, exist_ok=True)
+        write_json_atomic(CALIBRATION_PATH, data)
+    except Exception as e:
+        logger.warning(f"保存校准结果失败: {str(e)}")
+
+async def calibrate_video(video_path, encoder, presets, logger, sample_seconds=CALIBRATION_SAMPLE_SECONDS, info=None):
+    """从视频中间截取一段，依次用各预设试编码，返回 (记录键, {预设: 结果})；探测失败时返回 (None, {})
+
+    info 为调用方已探测的结果（probe_job），省略时自行探测
+    """
+    info = info or await probe_job(video_path)
+    if not info:
+        logger.error(f"无法探测 {video_path.name}，跳过校准")
+        return None, {}
+    sample = min(sample_seconds, info["duration"])
+    start = max(0.0, info["duration"] / 2 - sample / 2)
+    pixels = sample * info["frame_rate"] * info["width"] * info["height"]
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="vsm_calibrate_") as temp_dir:
+        for preset in presets:
+            output_path = Path(temp_dir) / f"{preset}.mp4"
+            cmd = [
+                "ffmpeg", "-ss", f"{start:.3f}", "-i", str(video_path), "-t", f"{sample:.3f}", "-an",
+                *video_encoder_args(encoder == "h264_nvenc", preset), "-y", str(output_path)
+            ]
+            began = time.monotonic()
+            if not await run_ffmpeg_async(cmd, logger, f" 校准 {encoder} {preset} "):
+                if encoder == "h264_nvenc":
+                    break  # NVENC 不可用时其余预设同样会失败
+                continue
+            elapsed = time.monotonic() - began
+            size = output_path.stat().st_size if output_path.exists() else 0
+            results[preset] = {
+                "pixel_rate": round(pixels / max(elapsed, 1e-3)),
+                "bytes_per_second": round(size / sample) if sample else 0,
+                "calibrated": datetime.now().isoformat(timespec='seconds'),
+            }
+            realtime = results[preset]["pixel_rate"] / (info["frame_rate"] * info["width"] * info["height"])
+            logger.info(f"{encoder} {preset} @ {info['height']}p: {realtime:.2f}x 实时，"
+                        f"{results[preset]['bytes_per_second'] * 8 / 1000:.0f} kb/s")
+    return encode_stats_key(encoder, info), results
+
+def preset_speeds(calibration, encoder, info):
+    """按校准记录估算各预设对该任务的实时倍速；没有该分辨率的记录时按像素数从最接近的分辨率换算"""
+    try:
+        pixels_per_second = info["frame_rate"] * info["width"] * info["height"]
+    except (KeyError, TypeError):
+        return {}
+    entries = calibration.get(encode_stats_key(encoder, info))
+    if not entries:
+        prefix = f"{encoder}|"
+        heights = [int(key[len(prefix):-1]) for key in calibration if key.startswith(prefix) and key[len(prefix):-1].isdigit()]
+        if not heights:
+            return {}
+        nearest = min(heights, key=lambda height: abs(height - info["height"]))
+        entries = calibration[f"{prefix}{nearest}p"]
+    return {preset: entry["pixel_rate"] / pixels_per_second for preset, entry in entries.items() if entry.get("pixel_rate")}
+
+def choose_preset(speeds, encoder, required_speed):
+    """选出实时倍速不低于 required_speed 的最慢预设，都达不到时选最快的已校准预设
+
+    返回 (预设, 估计倍速)；没有校准记录时返回 (默认预设, None)
+    """
+    calibrated = [preset for preset in ENCODER_PRESETS[encoder] if preset in speeds]
+    if not calibrated:
+        return DEFAULT_PRESETS[encoder], None
+    for preset in reversed(calibrated):
+        if speeds[preset] >= required_speed:
+            return preset, speeds[preset]
+    return calibrated[0], speeds[calibrated[0]]
+
+def required_speed(target_speed, deadline, jobs, remaining_content):
+    """单个编码独占机器时所需的实时倍速
+
+    target_speed 为每个任务的倍速，jobs 个任务并行时相当于独占时 target_speed × jobs；
+    deadline 要求剩余内容（秒）在截止前编码完，jobs 个任务合计的倍速为独占时的倍速
+    """
+    required = (target_speed or 0.0) * max(1, jobs)
+    if deadline:
+        remaining_time = deadline - time.time()
+        required = max(required, remaining_content / remaining_time if remaining_time > 0 else float('inf'))
+    return required
+
+async def calibrate_missing(pairs, encoders, logger, sample_seconds=CALIBRATION_SAMPLE_SECONDS):
+    """对本批次中尚未校准的分辨率，各取一个视频进行校准，返回与 pairs 对应的探测结果（probe_job）
+
+    全部视频并发探测一次，结果交给调度器复用；所有分辨率都已校准后立即结束
+    """
+    infos = await asyncio.gather(*(probe_job(video_path) for video_path, _ in pairs))
+    covered = set(load_calibration())
+    missing = {encode_stats_key(encoder, info) for info in infos if info for encoder in encoders} - covered
+    for (video_path, _), info in zip(pairs, infos):
+        if not missing:
+            break
+        for encoder in encoders:
+            key = encode_stats_key(encoder, info) if info else None
+            if key not in missing:
+                continue
+            logger.info(f"校准 {encoder} @ {info['height']}p（使用 {video_path.name}）")
+            _, results = await calibrate_video(video_path, encoder, ENCODER_PRESETS[encoder], logger,
+                                               sample_seconds, info)
+            missing.discard(key)
+            if results:
+                save_calibration({key: results}, logger)
+    return infos
+
+def run(args):
+    """calibrate 子命令入口"""
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    try:
+        if args.encoder == "auto":
+            encoders = ["h264_nvenc", "libx264"] if detect_nvenc_support(logger) else ["libx264"]
+        else:
+            encoders = [args.encoder]
+        failed = False
+        for video in args.videos:
+            video_path = Path(video).resolve()
+            if not video_path.is_file():
+                logger.error(f"视频 {video_path} 不存在")
+                failed = True
+                continue
+            for encoder in encoders:
+                presets = args.presets.split(",") if args.presets else ENCODER_PRESETS[encoder]
+                unknown = [preset for preset in presets if preset not in ENCODER_PRESETS[encoder]]
+                if unknown:
+                    logger.error(f"{encoder} 不支持预设: {', '.join(unknown)}")
+                    failed = True
+                    continue
+                key, results = asyncio.run(calibrate_video(video_path, encoder, presets, logger, args.sample))
+                if results:
+                    save_calibration({key: results}, logger)
+                else:
+                    failed = True
+        logger.info(f"校准结果已保存到 {CALIBRATION_PATH}")
+        return 1 if failed else 0
+    except Exception as e:
+        logger.error(f"校准出错: {str(e)}")
+        return 1
+    finally:
+        logger.removeHandler(handler)
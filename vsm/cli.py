@@ -0,0 +1,320 @@
+"""vsm 命令行入口
+
+此模块只导入 argparse 与 defaults，各子命令的实现模块在对应处理函数中才导入，
+使 `vsm --help` 与 rename 类子命令无需加载 asyncio、FFmpeg 相关代码。
+"""
+import argparse
+import sys
+
+from . import __version__
+from .defaults import (
+    CACHE_MAX_AGE_DAYS,
+    CACHE_MAX_SIZE_GB,
+    DEVICE_JOBS,
+    PREVIEW_COUNT,
+    QUEUE_LEASE_TIMEOUT,
+    QUEUE_MAX_ATTEMPTS,
+    SERVICE_PORT,
+    THROTTLE_CPU_PERCENT,
+    THROTTLE_MEMORY_PERCENT,
+    VERIFY_JOBS,
+)
+
+
+def cmd_merge(args):
+    from .merger import run
+    return run(args)
+
+
+def cmd_rename_srt(args):
+    from .rename_srt import run
+    return run(args)
+
+
+def cmd_rename_mp4(args):
+    from .rename_mp4 import run
+    return run(args)
+
+
+def cmd_restore(args):
+    from . import rename_mp4, rename_srt
+    from .scan import scan_tree
+    # 确保支持日语（UTF-8编码）
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+    # 两种日志共用一次扫描
+    snapshot = scan_tree(args.root, rescan=args.rescan)
+    rename_srt.restore_tree(args.root, snapshot)
+    rename_mp4.restore_tree(args.root, snapshot)
+    print("\n操作完成！")
+    return 0
+
+
+def cmd_retime(args):
+    from .retime import run
+    return run(args)
+
+
+def cmd_preview(args):
+    from .preview import run
+    return run(args)
+
+
+def cmd_bench(args):
+    from .bench import run
+    return run(args)
+
+
+def cmd_calibrate(args):
+    from .calibrate import run
+    return run(args)
+
+
+def deadline_arg(text):
+    from .calibrate import parse_deadline
+    try:
+        return parse_deadline(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def peak_hours_arg(text):
+    from .governor import parse_peak_hours
+    try:
+        return parse_peak_hours(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def renditions_arg(spec):
+    from .renditions import parse_renditions
+    try:
+        return parse_renditions(spec)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def add_retime_arguments(parser, prefix=""):
+    """时间轴校正选项：retime 子命令直接使用，merge 子命令加上 retime- 前缀"""
+    parser.add_argument(f"--{prefix}offset", type=float, default=0.0, metavar="SECONDS",
+                        help="整体偏移秒数，负数表示提前")
+    parser.add_argument(f"--{prefix}stretch", metavar="RATIO",
+                        help="线性拉伸：时间乘以该比例，如 1.001 或 1001/1000")
+    parser.add_argument(f"--{prefix}fps", metavar="SRC:DST",
+                        help="按帧率换算时间轴，如 23.976:25（PAL 加速）或 25:23.976")
+    parser.add_argument(f"--{prefix}anchor", action="append", metavar="OLD=NEW",
+                        help="锚点校正（可重复）：原字幕中 OLD 时刻的内容对齐到 NEW 时刻，"
+                             "多个锚点之间分段线性映射；先于拉伸和偏移应用")
+
+
+def cmd_serve(args):
+    from .service import run
+    return run(args)
+
+
+def add_encode_arguments(parser):
+    """编码、校验与缓存选项：merge 与 serve 子命令共用"""
+    parser.add_argument("--smart-render", action="store_true",
+                        help="只重编码有字幕出现的 GOP，其余片段直接流复制（与 --renditions、--retime-* 同用时不生效）")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="同时运行的 FFmpeg 任务数（默认 1）")
+    parser.add_argument("--device-jobs", type=int, default=DEVICE_JOBS,
+                        help=f"同一存储设备（磁盘、NAS 挂载）上同时编码的任务数，0 表示不限（默认 {DEVICE_JOBS}）")
+    parser.add_argument("--timeout", type=float,
+                        help="单个任务的最长处理秒数，超时后终止该任务")
+    parser.add_argument("--burn", default="auto", metavar="LANG",
+                        help="同一视频有多条字幕（name.ja.srt、name.zh.srt 等）时烧录的语言，其余全部作为软字幕封装；"
+                             "none 表示只封装软字幕；默认 auto：优先无语言标签的字幕，其次中文、日文、英文")
+    parser.add_argument("--fragmented", action="store_true",
+                        help="输出分片 MP4（frag_keyframe+empty_moov）：编码过程中已写出的部分即可读取，无需再重写文件")
+    parser.add_argument("--renditions", type=renditions_arg, metavar="SPEC",
+                        help="多规格输出，如 1080p:4M,720p:2M：一次解码、一次渲染字幕，同时编码各规格，"
+                             "输出为 name.1080p.mp4 等（不会放大低分辨率视频）")
+    tuning = parser.add_argument_group("预设自动选择（按 vsm calibrate 的校准结果，缺少时先自动校准）")
+    tuning.add_argument("--target-speed", type=float, metavar="X",
+                        help="每个任务至少达到 X 倍实时速度，选择满足要求的最慢预设")
+    tuning.add_argument("--deadline", type=deadline_arg, metavar="WHEN",
+                        help="全部任务的截止时间（HH:MM、YYYY-MM-DD HH:MM 或 90m、2h），每个任务开始时按剩余时长选择预设")
+    throttle = parser.add_argument_group("负载调节（与其他服务共用编码机时）")
+    throttle.add_argument("--throttle", action="store_true",
+                          help="按其他程序的 CPU 占用和内存压力调整同时编码的任务数，超出的任务暂停（SIGSTOP），"
+                               "负载下降后恢复；暂停期间 --timeout 仍然计时")
+    throttle.add_argument("--throttle-cpu", type=float, default=THROTTLE_CPU_PERCENT, metavar="PCT",
+                          help=f"其他程序的 CPU 占用超过该百分比时减少任务（默认 {THROTTLE_CPU_PERCENT}）")
+    throttle.add_argument("--throttle-memory", type=float, default=THROTTLE_MEMORY_PERCENT, metavar="PCT",
+                          help=f"可用内存低于该百分比时减少任务（默认 {THROTTLE_MEMORY_PERCENT}）")
+    throttle.add_argument("--peak-hours", type=peak_hours_arg, metavar="HH:MM-HH:MM",
+                          help="只在该时段内调节（隐含 --throttle），其余时间恢复全部并发")
+    add_retime_arguments(parser.add_argument_group("时间轴校正（在内存中应用，不修改字幕文件）"), "retime-")
+    parser.add_argument("--no-verify", action="store_true",
+                        help="跳过编码后的校验，编码成功即删除原文件")
+    parser.add_argument("--verify-sample", type=float, default=0, metavar="SECONDS",
+                        help="校验时从输出中间抽样解码的秒数（默认 0，不解码）")
+    parser.add_argument("--verify-jobs", type=int, default=VERIFY_JOBS,
+                        help=f"同时进行的校验任务数（默认 {VERIFY_JOBS}）")
+    parser.add_argument("--cache-dir",
+                        help="输出缓存目录；视频、字幕和编码设置都相同的任务直接复用缓存，不再编码")
+    parser.add_argument("--cache-max-size", type=float, default=CACHE_MAX_SIZE_GB, metavar="GB",
+                        help=f"缓存容量上限（默认 {CACHE_MAX_SIZE_GB} GB）")
+    parser.add_argument("--cache-max-age", type=float, default=CACHE_MAX_AGE_DAYS, metavar="DAYS",
+                        help=f"缓存最长保留天数（默认 {CACHE_MAX_AGE_DAYS} 天）")
+
+
+def add_merge_parser(subparsers, parents):
+    parser = subparsers.add_parser("merge", help="将 SRT 字幕烧录进同名 MP4 视频",
+                                   description="将 SRT 字幕烧录进同名 MP4 视频", parents=parents)
+    parser.add_argument("directory", nargs="?", help="要处理的目录（省略时交互输入）")
+    add_encode_arguments(parser)
+    parser.add_argument("--queue", metavar="QUEUE_DIR",
+                        help="共享存储上的任务队列目录；指定目录时只把任务入队，不在本机编码"
+                             "（已完成或失败的视频未变时跳过，被替换后重新入队）")
+    parser.add_argument("--worker", action="store_true",
+                        help="作为工作进程处理 --queue 中的任务（可在多台主机上同时运行，每个进程同时处理 --jobs 个）")
+    parser.add_argument("--lease-timeout", type=int, default=QUEUE_LEASE_TIMEOUT,
+                        help=f"租约超时秒数，超时未续约的任务会被重新入队（默认 {QUEUE_LEASE_TIMEOUT}）")
+    parser.add_argument("--max-attempts", type=int, default=QUEUE_MAX_ATTEMPTS,
+                        help=f"单个任务的最大尝试次数（默认 {QUEUE_MAX_ATTEMPTS}）")
+    parser.set_defaults(func=cmd_merge)
+
+
+def add_serve_parser(subparsers, parents):
+    parser = subparsers.add_parser("serve", help="以常驻服务方式运行，通过本地 HTTP 接口提交任务",
+                                   description="常驻本地服务：编码器检测、探测缓存与编码协程保持常驻，"
+                                               "通过 HTTP 接口（POST /jobs、GET /jobs、GET /events）提交任务和订阅进度",
+                                   parents=parents)
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址（默认 127.0.0.1）")
+    parser.add_argument("--port", type=int, default=SERVICE_PORT, help=f"监听端口（默认 {SERVICE_PORT}）")
+    parser.add_argument("--socket", metavar="PATH", help="改为监听 Unix 套接字（仅 POSIX）")
+    parser.add_argument("--token-file", metavar="PATH",
+                        help="访问令牌文件（默认 ~/.video_subtitle_merger/token，不存在时生成，权限须为 0600）")
+    add_encode_arguments(parser)
+    parser.set_defaults(func=cmd_serve)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="vsm", description="FFmpeg 字幕与 MP4 视频合并工具")
+    parser.add_argument("--version", action="version", version=f"%(prog)s {__version__}")
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND")
+    subparsers.required = True
+
+    # 扫描目录树的子命令共用的选项
+    scan_options = argparse.ArgumentParser(add_help=False)
+    scan_options.add_argument("--rescan", action="store_true",
+                              help="忽略扫描索引，重新列出所有目录（默认只重新列出修改时间有变化的目录）")
+    add_merge_parser(subparsers, [scan_options])
+    add_serve_parser(subparsers, [scan_options])
+
+    rename_srt_parser = subparsers.add_parser("rename-srt", help="按序号批量重命名字幕文件",
+                                              description="按序号批量重命名字幕文件（日志写入 rename_log_srt.txt）",
+                                              parents=[scan_options])
+    rename_srt_parser.add_argument("root", nargs="?", help="根文件夹（省略时交互输入）")
+    rename_srt_parser.add_argument("--prefix", help="新文件名前缀；省略时逐个子目录询问")
+    rename_srt_parser.add_argument("--strip-suffix", metavar="TEXT",
+                                   help="不按序号重命名，只去掉字幕文件名中的指定片段（如 .ja_2）")
+    rename_srt_parser.set_defaults(func=cmd_rename_srt)
+
+    rename_mp4_parser = subparsers.add_parser("rename-mp4", help="按序号批量重命名 MP4 文件",
+                                              description="按序号批量重命名 MP4 文件（日志写入 rename_log.txt）",
+                                              parents=[scan_options])
+    rename_mp4_parser.add_argument("root", nargs="?", help="根文件夹（省略时交互输入）")
+    rename_mp4_parser.add_argument("--prefix", help="新文件名前缀；省略时逐个子目录询问")
+    rename_mp4_parser.set_defaults(func=cmd_rename_mp4)
+
+    restore_parser = subparsers.add_parser("restore", help="根据重命名日志恢复原始文件名",
+                                           description="根据 rename_log_srt.txt 与 rename_log.txt 恢复原始文件名",
+                                           parents=[scan_options])
+    restore_parser.add_argument("root", help="根文件夹")
+    restore_parser.set_defaults(func=cmd_restore)
+
+    retime_parser = subparsers.add_parser("retime", help="批量调整字幕时间轴",
+                                          description="批量调整 SRT 字幕时间轴：整体偏移、线性拉伸、帧率换算、锚点校正",
+                                          parents=[scan_options])
+    retime_parser.add_argument("paths", nargs="+", help="字幕文件或目录（目录下的 SRT 全部处理）")
+    add_retime_arguments(retime_parser)
+    retime_parser.add_argument("-o", "--output-dir",
+                               help="输出目录（保持相对目录结构）；省略时原地修改并保留 .bak 备份")
+    retime_parser.set_defaults(func=cmd_retime)
+
+    calibrate_parser = subparsers.add_parser("calibrate", help="在本机试编码各预设，记录速度与码率",
+                                             description="用视频中间的片段试编码各预设，按主机、编码器和分辨率记录速度与码率，"
+                                                         "供 merge --target-speed/--deadline 选择预设")
+    calibrate_parser.add_argument("videos", nargs="+", help="用于校准的视频（每种分辨率一个即可）")
+    calibrate_parser.add_argument("--encoder", choices=["auto", "libx264", "h264_nvenc"], default="auto",
+                                  help="校准的编码器（默认 auto：可用时同时校准 NVENC 与 libx264）")
+    calibrate_parser.add_argument("--presets", help="只校准指定预设，逗号分隔（默认全部）")
+    calibrate_parser.add_argument("--sample", type=float, default=10, metavar="SECONDS",
+                                  help="每个预设试编码的秒数（默认 10）")
+    calibrate_parser.set_defaults(func=cmd_calibrate)
+
+    preview_parser = subparsers.add_parser("preview", help="在字幕密集处并行渲染截图，快速检查字幕样式",
+                                           description="在字幕密集处并行渲染截图（可选短片段），拼成一张预览图，用于检查字幕样式",
+                                           parents=[scan_options])
+    preview_parser.add_argument("paths", nargs="+", help="视频文件或目录（目录下的视频全部预览）")
+    preview_parser.add_argument("-n", "--count", type=int, default=PREVIEW_COUNT,
+                                help=f"每个视频的预览位置数（默认 {PREVIEW_COUNT}）")
+    preview_parser.add_argument("--clip", type=float, default=0, metavar="SECONDS",
+                                help="同时渲染该长度的烧录字幕短片段（默认 0，只截图）")
+    preview_parser.add_argument("--style", metavar="OVERRIDES",
+                                help="覆盖默认字幕样式的部分项，如 FontSize=20,MarginV=30")
+    preview_parser.add_argument("--burn", default="auto", metavar="LANG",
+                                help="同一视频有多条字幕时预览的语言（默认 auto，与 merge 相同）")
+    preview_parser.add_argument("--jobs", type=int, help="同时运行的 FFmpeg 数（默认 CPU 核数）")
+    preview_parser.add_argument("-o", "--output-dir", default="vsm_preview",
+                                help="输出目录（默认当前目录下的 vsm_preview）")
+    preview_parser.set_defaults(func=cmd_preview)
+
+    bench_parser = subparsers.add_parser("bench", help="性能检查", description="性能检查")
+    bench_subparsers = bench_parser.add_subparsers(dest="bench_command", metavar="BENCH")
+    bench_subparsers.required = True
+    startup_parser = bench_subparsers.add_parser("startup", help="测量命令行冷启动耗时与各模块导入耗时")
+    startup_parser.add_argument("--runs", type=int, default=5, help="重复次数，取中位数（默认 5）")
+    startup_parser.add_argument("--budget-ms", type=float,
+                                help="冷启动耗时上限（毫秒）；超出或 --help 加载了重模块时以非零状态退出")
+    scan_parser = bench_subparsers.add_parser("scan", help="对比逐目录遍历与并行扫描的耗时（用于网络共享）")
+    scan_parser.add_argument("directory", help="要扫描的目录")
+    scan_parser.add_argument("--runs", type=int, default=3, help="重复次数，取中位数（默认 3）")
+    scan_parser.add_argument("--workers", type=int, help="并行扫描的线程数")
+    simulate_parser = bench_subparsers.add_parser(
+        "simulate", help="用模拟的 FFmpeg 驱动 merge 处理大量任务，检查调度结果与开销",
+        description="生成模拟视频与字幕，把模拟的 ffmpeg/ffprobe 放在 PATH 最前面运行 vsm merge，"
+                    "按注入的故障检查每个任务的结果（输出、原文件删除、回退与失败处理）、并发上限和调度开销；"
+                    "-- 之后的参数原样传给 merge（默认附加 --device-jobs 0）"
+    )
+    simulate_parser.add_argument("--count", type=int, default=200, help="任务数（默认 200）")
+    simulate_parser.add_argument("--speed", type=float, default=20000,
+                                 help="模拟 libx264 的实时倍速（默认 20000，NVENC 为 4 倍）")
+    simulate_parser.add_argument("--min-duration", type=float, default=300, metavar="SECONDS",
+                                 help="模拟视频的最短时长（默认 300）")
+    simulate_parser.add_argument("--max-duration", type=float, default=2700, metavar="SECONDS",
+                                 help="模拟视频的最长时长（默认 2700）")
+    simulate_parser.add_argument("--seed", type=int, default=0, help="视频时长与故障分配的随机种子")
+    simulate_parser.add_argument("--no-gpu", action="store_true", help="模拟没有 NVENC 的主机")
+    faults = simulate_parser.add_argument_group("故障注入（按任务占比）")
+    faults.add_argument("--fail-nvenc", type=float, default=0.05, metavar="RATE",
+                        help="NVENC 初始化失败，应回退 libx264 并成功（默认 0.05）")
+    faults.add_argument("--fail-crash", type=float, default=0.01, metavar="RATE",
+                        help="编码中途进程崩溃（默认 0.01）")
+    faults.add_argument("--fail-disk-full", type=float, default=0.01, metavar="RATE",
+                        help="编码中途磁盘写满（默认 0.01）")
+    faults.add_argument("--fail-corrupt", type=float, default=0.01, metavar="RATE",
+                        help="输出丢帧，应被校验发现并保留原文件（默认 0.01）")
+    faults.add_argument("--fail-hang", type=float, default=0, metavar="RATE",
+                        help="编码中途卡住，需在 merge 参数中指定 --timeout（默认 0）")
+    simulate_parser.add_argument("--budget-ms", type=float,
+                                 help="每个任务的调度开销上限（毫秒，累计进程退出到下一个进程被创建的间隔）；超出或结果有误时以非零状态退出")
+    simulate_parser.add_argument("--keep", action="store_true", help="保留模拟目录（含模拟程序、事件日志和 merge 输出）")
+    simulate_parser.add_argument("merge_args", nargs=argparse.REMAINDER, help="传给 merge 的参数，写在 -- 之后")
+    bench_parser.set_defaults(func=cmd_bench)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if getattr(args, "worker", False) and not args.queue:
+        parser.error("--worker 需要同时指定 --queue")
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
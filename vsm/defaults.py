@@ -0,0 +1,27 @@
+"""命令行选项的默认值（此模块不导入任何其他模块，供命令行入口直接使用）"""
+
+# 共享任务队列：租约超时（秒），超过该时间未续约的任务会被重新入队
+QUEUE_LEASE_TIMEOUT = 300
+# 共享任务队列：单个任务的最大尝试次数
+QUEUE_MAX_ATTEMPTS = 3
+
+# 校验：默认同时进行的校验任务数
+VERIFY_JOBS = 2
+
+# 同一存储设备（磁盘、NAS 挂载）上默认同时编码的任务数
+DEVICE_JOBS = 2
+
+# 负载调节：其他程序的 CPU 占用（占全部核心的百分比）超过该值时减少同时编码的任务数
+THROTTLE_CPU_PERCENT = 50
+# 负载调节：可用内存低于该百分比时减少同时编码的任务数
+THROTTLE_MEMORY_PERCENT = 10
+
+# 输出缓存：默认容量上限（GB）与最长保留天数
+CACHE_MAX_SIZE_GB = 200
+CACHE_MAX_AGE_DAYS = 90
+
+# 常驻服务：默认监听端口
+SERVICE_PORT = 8765
+
+# 预览：每个视频默认的预览位置数
+PREVIEW_COUNT = 6
@@ -0,0 +1,102 @@
+"""按存储设备调度：同一设备（磁盘、NAS 挂载）上限制并发任务数，开始编码前检查剩余空间
+
+输出写在原视频旁边，同一块机械盘或同一个网络共享上同时运行多个编码会互相争抢 I/O；
+某个卷写满时，后续落在该卷上的任务会逐个失败。调度器按 st_dev 区分设备，
+每个设备最多同时编码 device_jobs 个任务，并按 码率 × 时长 估算输出大小，
+剩余空间（扣除同设备处理中任务的预留）不足时先等待同设备的任务完成，无任务可等时判为失败。
+"""
+import os
+import re
+import shutil
+from collections import Counter
+
+# 估算输出大小时的余量系数
+OUTPUT_SIZE_MARGIN = 1.1
+# 按码率估算时为复制的音轨额外计入的码率（bit/s）
+AUDIO_BITRATE_ESTIMATE = 192_000
+# 每个设备始终保留的剩余空间（字节）
+FREE_SPACE_RESERVE = 1 << 30
+
+BITRATE_PATTERN = re.compile(r"^(\d+(?:\.\d+)?)([kKmM]?)$")
+
+def parse_bitrate(value):
+    """把 FFmpeg 码率（4M、2500k、800000）换算为 bit/s，无法解析时返回 None"""
+    match = BITRATE_PATTERN.match(str(value).strip())
+    if not match:
+        return None
+    number, unit = match.groups()
+    return int(float(number) * {"": 1, "k": 1_000, "m": 1_000_000}[unit.lower()])
+
+def encoder_bitrate(encoder_args):
+    """编码参数中的目标视频码率（-b:v），CRF 等恒定质量模式返回 None"""
+    if "-b:v" in encoder_args:
+        return parse_bitrate(encoder_args[encoder_args.index("-b:v") + 1])
+    return None
+
+def estimate_output_size(source_size, duration, bitrates):
+    """估算全部输出的字节数；bitrates 为各输出的视频码率，None 表示码率未知，按原文件大小估算"""
+    total = 0
+    for bitrate in bitrates:
+        if bitrate is None or not duration:
+            total += source_size
+        else:
+            total += duration * (bitrate + AUDIO_BITRATE_ESTIMATE) / 8
+    return int(total * OUTPUT_SIZE_MARGIN)
+
+def device_of(path):
+    """路径所在的设备号，无法访问时返回 None（不参与按设备的限制）"""
+    try:
+        return os.stat(path).st_dev
+    except OSError:
+        return None
+
+class DeviceAdmission:
+    """记录各设备上处理中的任务数与预留空间，判断等待中的任务能否开始
+
+    编码位置在编码结束时释放；预留空间保留到任务完成（校验、删除原文件、重命名之后），
+    因为在此之前输出文件与原文件同时占用空间
+    """
+
+    def __init__(self, device_jobs, reserve=FREE_SPACE_RESERVE):
+        self.device_jobs = device_jobs  # 0 表示不限
+        self.reserve = reserve
+        self.running = Counter()
+        self.reserved = Counter()
+        self._free = {}
+
+    def begin_round(self):
+        """开始一轮选择：每个设备的剩余空间每轮只查询一次"""
+        self._free = {}
+
+    def free_space(self, device, directory):
+        if device not in self._free:
+            try:
+                self._free[device] = shutil.disk_usage(directory).free
+            except OSError:
+                self._free[device] = None
+        return self._free[device]
+
+    def check(self, device, directory, size):
+        """返回 "admit"（可以开始）、"wait"（等待同设备任务释放位置或空间）或 "reject"（空间不足且无任务可等）"""
+        if device is None:
+            return "admit"
+        if self.device_jobs and self.running[device] >= self.device_jobs:
+            return "wait"
+        free = self.free_space(device, directory)
+        if free is None or free - self.reserved[device] - size >= self.reserve:
+            return "admit"
+        return "wait" if self.reserved[device] else "reject"
+
+    def acquire(self, device, size):
+        if device is not None:
+            self.running[device] += 1
+            self.reserved[device] += size
+            self._free.pop(device, None)
+
+    def release_slot(self, device):
+        if device is not None:
+            self.running[device] -= 1
+
+    def release_space(self, device, size):
+        if device is not None:
+            self.reserved[device] -= size
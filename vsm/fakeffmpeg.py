@@ -0,0 +1,515 @@
+"""模拟的 ffmpeg / ffprobe：不解码任何视频，用于在没有真实视频和 GPU 的环境中驱动大量任务检查调度逻辑
+
+视频文件是一行 JSON（时长、帧率、分辨率、音频、起始时间、所属任务 id），由 write_media 生成。
+起始时间（start_time）不为 0 时，ffprobe 输出原始时间戳，ffmpeg 像真实程序一样减去起始时间（-copyts 时保留）。
+模拟的 ffmpeg 按命令行推算输出的时长与帧数，按 speed 倍实时速度耗时，
+像真实 FFmpeg 一样向 -progress 管道输出进度、向 stderr 输出日志，再写出同样格式的输出文件；
+模拟的 ffprobe 按 -show_entries / -of 输出对应格式。
+支持本仓库用到的全部调用方式：完整重编码、多规格、软字幕、-ss/-t、segment 切分、concat 拼接、抽样解码、截图
+和 IDR 帧探测（filter_units + framecrc，每个关键帧都是 IDR 帧）。
+
+配置文件（环境变量 VSM_FAKE_FFMPEG 指向的 JSON）：
+    speed       libx264 的实时倍速，NVENC 为其 NVENC_SPEEDUP 倍，流复制与解码更快
+    gpu         ffmpeg -encoders 是否列出 h264_nvenc
+    faults      各故障的任务占比，按任务 id 的哈希确定，同一任务的每次调用都相同：
+                  nvenc      NVENC 初始化失败（回退 libx264 后成功）
+                  crash      编码中途进程被杀死
+                  disk_full  编码中途磁盘写满，留下不完整的输出
+                  corrupt    编码成功但输出丢帧（由编码后的校验发现）
+                  hang       编码中途停止输出进度，直到被超时终止
+    seed        故障分配的随机种子
+    log         每个进程结束时追加一行 JSON 事件，供 vsm bench simulate 统计并发与开销；
+                事件记录进程被创建（spawned，Linux 上取自 /proc）与开始运行（start，解释器启动之后）的时刻，
+                以及开始运行前消耗的 CPU 时间（startup_cpu，即解释器启动的开销）
+
+只使用标准库且不依赖 vsm 包，可直接作为脚本运行：python fakeffmpeg.py ffmpeg|ffprobe 参数...
+"""
+import os
+import re
+import sys
+import json
+import math
+import time
+import signal
+import hashlib
+
+CONFIG_ENV = "VSM_FAKE_FFMPEG"
+DEFAULT_CONFIG = {"speed": 100.0, "gpu": True, "faults": {}, "seed": 0, "log": None, "progress_interval": 0.5}
+FAULTS = ("nvenc", "crash", "disk_full", "corrupt", "hang")
+
+# 相对 libx264 的速度倍数
+NVENC_SPEEDUP = 4.0
+COPY_SPEEDUP = 50.0
+DECODE_SPEEDUP = 8.0
+# corrupt 故障的输出只保留这一比例的帧
+CORRUPT_FRAME_RATIO = 0.95
+# 关键帧间隔（秒）
+GOP_SECONDS = 2.0
+# 模拟视频的平均码率（bit/s），只用于进度中的 total_size 与 bitrate
+FAKE_BITRATE = 2_500_000
+# framecrc 输出的时间基
+FRAMECRC_TIME_BASE = 15360
+# 模拟视频流的 profile、level、参考帧数与 B 帧重排序深度
+H264_STREAM = {"profile": "High", "level": 40, "refs": 4, "has_b_frames": 2}
+
+# 不带参数的 FFmpeg 选项
+FFMPEG_FLAGS = {"-y", "-n", "-an", "-vn", "-sn", "-dn", "-nostats", "-copyts", "-xerror", "-hide_banner",
+                "-nostdin", "-shortest", "-count_packets", "-show_format", "-show_streams"}
+FFPROBE_SECTIONS = ("packet", "stream", "format")
+QUIET_LEVELS = {"quiet", "panic", "fatal", "error", "-8", "0", "8", "16"}
+SUBTITLE_SUFFIXES = {".srt", ".ass", ".ssa", ".vtt"}
+
+PIPE_PATTERN = re.compile(r"pipe\\?:(\d+)")
+
+ENCODERS_TEXT = """Encoders:
+ V..... = Video
+ A..... = Audio
+ S..... = Subtitle
+ ------
+ V....D libx264              libx264 H.264 / AVC / MPEG-4 AVC / MPEG-4 part 10 (codec h264)
+{nvenc} A....D aac                  AAC (Advanced Audio Coding)
+ S..... mov_text             3GPP Timed Text subtitle
+"""
+
+def load_config():
+    config = dict(DEFAULT_CONFIG)
+    path = os.environ.get(CONFIG_ENV)
+    if path:
+        with open(path, encoding='utf-8') as f:
+            config.update(json.load(f))
+    return config
+
+def write_media(path, media_id, duration, frame_rate="24000/1001", width=1920, height=1080, audio=True, start_time=0.0):
+    """生成一个模拟视频文件"""
+    fps = parse_rate(frame_rate)
+    media = {"vsm_fake": 1, "id": media_id, "duration": duration, "start_time": start_time, "frames": round(duration * fps),
+             "frame_rate": frame_rate, "width": width, "height": height, "codec": "h264", "pix_fmt": "yuv420p",
+             "audio": audio, "subtitles": 0, "encoder": None, "fragmented": False}
+    with open(path, "w", encoding='utf-8') as f:
+        f.write(json.dumps(media) + "\n")
+
+def read_media(path):
+    """读取模拟视频，不是模拟视频（或已损坏）时返回 None"""
+    try:
+        with open(path, "rb") as f:
+            data = json.loads(f.read())
+        return data if isinstance(data, dict) and data.get("vsm_fake") else None
+    except (OSError, ValueError):
+        return None
+
+def parse_rate(text):
+    numerator, _, denominator = str(text).partition("/")
+    return float(numerator) / float(denominator or 1)
+
+def fault_point(seed, media_id, salt=""):
+    """把任务 id 映射到 [0, 1) 上的确定位置"""
+    digest = hashlib.sha256(f"{seed}:{media_id}:{salt}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64
+
+def planned_fault(config, media_id):
+    """按配置中的故障占比，确定任务 id 对应的故障（没有时返回 None）"""
+    if media_id is None:
+        return None
+    point = fault_point(config.get("seed", 0), media_id)
+    for name in FAULTS:
+        rate = config.get("faults", {}).get(name, 0.0)
+        if point < rate:
+            return name
+        point -= rate
+    return None
+
+def timestamp(seconds):
+    seconds = max(0.0, seconds)
+    return f"{int(seconds // 3600):02d}:{int(seconds % 3600 // 60):02d}:{seconds % 60:09.6f}"
+
+def process_created():
+    """本进程被创建的时刻（Linux 上读 /proc/self/stat，精度为一个时钟节拍），取不到时返回 None"""
+    try:
+        with open("/proc/self/stat", encoding='utf-8') as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        ticks = os.sysconf("SC_CLK_TCK")
+        since_boot = time.clock_gettime(time.CLOCK_BOOTTIME)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+    # 节拍向下取整，加半个节拍使平均误差为 0
+    return time.time() - since_boot + (start_ticks + 0.5) / ticks
+
+def record_event(config, **event):
+    """向事件日志追加一行（单次 write，多进程并发追加不会交错）"""
+    if config.get("log"):
+        with open(config["log"], "a", encoding='utf-8') as f:
+            f.write(json.dumps(event) + "\n")
+
+def drain_pipes(args):
+    """读完继承的字幕管道（pipe:N），避免写端阻塞"""
+    fds = {int(fd) for arg in args for fd in PIPE_PATTERN.findall(arg)} - {0, 1, 2}
+    for fd in fds:
+        try:
+            while os.read(fd, 65536):
+                pass
+        except OSError:
+            pass
+
+def split_ffmpeg_args(args):
+    """把 FFmpeg 命令行拆成全局选项、输入和输出：[(路径, {选项: 值})]，-map 的值为列表"""
+    global_options, inputs, outputs, pending = {}, [], [], {}
+    index = 0
+    while index < len(args):
+        arg = args[index]
+        if arg == "-i" and index + 1 < len(args):
+            inputs.append((args[index + 1], pending))
+            pending = {}
+            index += 2
+        elif arg in FFMPEG_FLAGS:
+            pending[arg] = True
+            index += 1
+        elif arg == "-map" and index + 1 < len(args):
+            pending.setdefault("-map", []).append(args[index + 1])
+            index += 2
+        elif arg.startswith("-") and arg != "-" and index + 1 < len(args):
+            pending.setdefault(arg, args[index + 1])
+            index += 2
+        else:
+            outputs.append((arg, pending))
+            pending = {}
+            index += 1
+    for key in ("-progress", "-v", "-loglevel", "-filter_complex"):
+        for _, options in (*inputs, *outputs):
+            if key in options:
+                global_options[key] = options[key]
+    return global_options, inputs, outputs
+
+def open_input(path, options):
+    """返回输入的模拟视频；字幕、图片序列和管道返回 {}；无法读取时抛出 ValueError"""
+    if options.get("-f") == "concat":
+        media = None
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line.startswith("file "):
+                    continue
+                part = read_media(line[5:].strip().strip("'").replace("'\\''", "'"))
+                if part is None:
+                    raise ValueError(f"{path}: Invalid data found when processing input")
+                if media is None:
+                    media = dict(part)
+                else:
+                    media["duration"] += part["duration"]
+                    media["frames"] += part["frames"]
+        if media is None:
+            raise ValueError(f"{path}: Invalid data found when processing input")
+        return media
+    if options.get("-f") == "srt" or PIPE_PATTERN.match(path) or "%" in path:
+        return {}
+    if not os.path.exists(path):
+        raise ValueError(f"{path}: No such file or directory")
+    if os.path.splitext(path)[1].lower() in SUBTITLE_SUFFIXES:
+        return {}
+    media = read_media(path)
+    if media is None:
+        raise ValueError(f"{path}: Invalid data found when processing input")
+    return media
+
+def encoder_of(options):
+    return options.get("-c:v") or options.get("-vcodec") or options.get("-c") or "libx264"
+
+def stream_banner(media, path, index):
+    lines = [
+        f"Input #{index}, mov,mp4,m4a,3gp,3g2,mj2, from '{path}':",
+        f"  Duration: {timestamp(media['duration'])[:11]}, start: {media.get('start_time', 0.0):.6f}, bitrate: {FAKE_BITRATE // 1000} kb/s",
+        f"  Stream #{index}:0[0x1](und): Video: {media['codec']} (High), {media['pix_fmt']}, "
+        f"{media['width']}x{media['height']}, {parse_rate(media['frame_rate']):.2f} fps",
+    ]
+    if media.get("audio"):
+        lines.append(f"  Stream #{index}:1[0x2](und): Audio: aac (LC), 48000 Hz, stereo, fltp")
+    return lines
+
+def run_ffmpeg(args, config, process):
+    if args in (["-encoders"], ["-hide_banner", "-encoders"]):
+        nvenc = " V....D h264_nvenc           NVIDIA NVENC H.264 encoder (codec h264)\n" if config.get("gpu") else ""
+        sys.stdout.write(ENCODERS_TEXT.format(nvenc=nvenc))
+        return 0
+    if args == ["-version"]:
+        print("ffmpeg version 6.1-vsm-fake")
+        return 0
+
+    drain_pipes(args)
+    global_options, inputs, outputs = split_ffmpeg_args(args)
+    verbose = global_options.get("-v", global_options.get("-loglevel", "info")) not in QUIET_LEVELS
+    log = sys.stderr.write
+    if verbose:
+        log("ffmpeg version 6.1-vsm-fake Copyright (c) 2000-2023 the FFmpeg developers\n")
+    if not inputs or not outputs:
+        log("At least one output file must be specified\n")
+        return 1
+
+    media, input_options, audio = None, {}, False
+    for index, (path, options) in enumerate(inputs):
+        try:
+            opened = open_input(path, options)
+        except (OSError, ValueError) as e:
+            log(f"{e}\n")
+            return 1
+        audio = audio or bool(opened.get("audio"))
+        if opened and media is None:
+            media, input_options = opened, options
+            if verbose:
+                log("\n".join(stream_banner(media, path, index)) + "\n")
+
+    # 推算输出的起止时间
+    fps = parse_rate(media["frame_rate"]) if media else 25.0
+    total = media["duration"] if media else 1 / fps
+    start = min(float(input_options.get("-ss", 0)), total)
+    end = total
+    for options in (input_options, *(options for _, options in outputs)):
+        if "-t" in options:
+            end = min(end, start + float(options["-t"]))
+    duration = max(0.0, end - start)
+
+    file_outputs = [(path, options) for path, options in outputs if path != "-" and options.get("-f") != "null"]
+    encoders = [encoder_of(options) for _, options in file_outputs] or ["rawvideo"]
+    fault = planned_fault(config, media.get("id")) if media and file_outputs else None
+    event = {"tool": "ffmpeg", "id": media.get("id") if media else None, **process,
+             "role": "encode" if file_outputs else "decode", "encoder": encoders[0]}
+
+    if "h264_nvenc" in encoders and (fault == "nvenc" or not config.get("gpu")):
+        if config.get("gpu"):
+            log("[h264_nvenc @ 0x55d1c0a4e2c0] OpenEncodeSessionEx failed: unsupported device (2): (no details)\n"
+                "[vost#0:0/h264_nvenc @ 0x55d1c0a4d6c0] Error while opening encoder - maybe incorrect parameters "
+                "such as bit_rate, rate, width or height.\nConversion failed!\n")
+        else:
+            log("Unknown encoder 'h264_nvenc'\n")
+        record_event(config, **event, end=time.time(), fault="nvenc", rc=1)
+        return 1
+
+    # 按编码器决定耗时
+    base = float(config.get("speed", DEFAULT_CONFIG["speed"]))
+    if not file_outputs:
+        speed = base * DECODE_SPEEDUP
+    elif all(encoder == "copy" for encoder in encoders):
+        speed = base * COPY_SPEEDUP
+    else:
+        speed = base * (NVENC_SPEEDUP if "h264_nvenc" in encoders else 1.0)
+    work = duration / speed * (1 + 0.5 * (len(file_outputs) - 1))
+    stop_at = 1.0
+    if fault in ("crash", "disk_full", "hang"):
+        stop_at = 0.2 + 0.6 * fault_point(config.get("seed", 0), media["id"], "stop")
+    if verbose and media:
+        log("Stream mapping:\n"
+            f"  Stream #0:0 -> #0:0 ({media['codec']} (native) -> h264 ({encoders[0]}))\n")
+        for index, (path, _) in enumerate(file_outputs):
+            log(f"Output #{index}, mp4, to '{path}':\n")
+
+    # 按 -progress 的格式周期性输出进度；按步累加耗时，被 SIGSTOP 暂停后不会跳变
+    progress = global_options.get("-progress") == "pipe:1"
+    interval = float(config.get("progress_interval", DEFAULT_CONFIG["progress_interval"]))
+    frames = round(duration * fps)
+    done = 0.0
+    began = time.monotonic()
+    while True:
+        step = min(interval, work * stop_at - done)
+        if step > 0:
+            time.sleep(step)
+            done += step
+        fraction = done / work if work > 0 else 1.0
+        if progress:
+            elapsed = max(time.monotonic() - began, 1e-6)
+            out_time = duration * fraction
+            sys.stdout.write(
+                f"frame={round(frames * fraction)}\nfps={frames * fraction / elapsed:.2f}\nstream_0_0_q=23.0\n"
+                f"bitrate={FAKE_BITRATE / 1000:.1f}kbits/s\ntotal_size={int(out_time * FAKE_BITRATE / 8)}\n"
+                f"out_time_us={int(out_time * 1_000_000)}\nout_time_ms={int(out_time * 1_000_000)}\n"
+                f"out_time={timestamp(out_time)}\ndup_frames=0\ndrop_frames=0\nspeed={out_time / elapsed:.3g}x\n"
+                f"progress={'end' if fraction >= 1.0 else 'continue'}\n"
+            )
+            sys.stdout.flush()
+        if done >= work * stop_at - 1e-9:
+            break
+
+    if fault == "hang":
+        record_event(config, **event, end=None, fault="hang", rc=None)
+        while True:
+            time.sleep(3600)
+    if fault in ("crash", "disk_full"):
+        # 留下不完整的输出
+        for path, _ in file_outputs:
+            if "%" not in path:
+                with open(path, "w", encoding='utf-8') as f:
+                    f.write('{"vsm_fake": 1, "id": ')
+        record_event(config, **event, end=time.time(), fault=fault, rc=1 if fault == "disk_full" else -9)
+        if fault == "disk_full":
+            log(f"[mp4 @ 0x55d1c0a52f00] Error writing trailer of {file_outputs[0][0]}: No space left on device\n"
+                "av_interleaved_write_frame(): No space left on device\nConversion failed!\n")
+            return 1
+        sys.stdout.flush()
+        sys.stderr.flush()
+        if hasattr(signal, "SIGKILL"):
+            os.kill(os.getpid(), signal.SIGKILL)
+        os._exit(139)
+
+    for path, options in file_outputs:
+        write_output(path, options, media, audio, start, end, fps, fault == "corrupt")
+    for path, options in outputs:
+        if path == "-" and options.get("-f") == "framecrc" and media:
+            copyts = any("-copyts" in options for _, options in (*inputs, *outputs))
+            write_framecrc(options, start, end, fps, media.get("start_time", 0.0) if copyts else 0.0)
+    if verbose:
+        log(f"video:{int(duration * FAKE_BITRATE / 8 / 1024)}kB audio:0kB subtitle:0kB other streams:0kB "
+            "global headers:0kB muxing overhead: 0.1%\n")
+    record_event(config, **event, end=time.time(), fault=fault if fault == "corrupt" else None, rc=0)
+    return 0
+
+def write_output(path, options, media, audio, start, end, fps, corrupt):
+    """写出一个输出：segment 切分时写出各片段与片段列表，图片输出写一个占位文件
+
+    audio 为输入中是否有音频；输出含音频的条件与 FFmpeg 相同：未指定 -an，且没有 -map 或映射了音频
+    """
+    if media is None or options.get("-frames:v") == "1" or os.path.splitext(path)[1].lower() in (".jpg", ".png"):
+        with open(path, "wb") as f:
+            f.write(b"VSMFAKE-IMAGE\n")
+        return
+
+    maps = options.get("-map")
+    output = dict(media, start_time=0.0)
+    output["audio"] = audio and "-an" not in options and (not maps or any(re.match(r"^\d+:a", value) for value in maps))
+    output["subtitles"] = sum(1 for key in options if key.startswith("-metadata:s:s:"))
+    output["encoder"] = encoder_of(options)
+    output["fragmented"] = "frag_keyframe" in options.get("-movflags", "")
+
+    def frames_between(a, b):
+        return round(b * fps) - round(a * fps)
+
+    if options.get("-f") == "segment":
+        cuts = [start]
+        for value in filter(None, options.get("-segment_times", "").split(",")):
+            cut = math.ceil(float(value) / GOP_SECONDS - 1e-6) * GOP_SECONDS
+            if start < cut < end:
+                cuts.append(cut)
+        cuts.append(end)
+        lines = []
+        for index, (a, b) in enumerate(zip(cuts, cuts[1:])):
+            segment_path = path.replace("%05d", f"{index:05d}")
+            segment = dict(output, duration=b - a, frames=frames_between(a, b), audio=False)
+            with open(segment_path, "w", encoding='utf-8') as f:
+                f.write(json.dumps(segment) + "\n")
+            lines.append(f"{os.path.basename(segment_path)},{a:.6f},{b:.6f}\n")
+        if options.get("-segment_list"):
+            with open(options["-segment_list"], "w", encoding='utf-8') as f:
+                f.write("".join(lines))
+        return
+
+    output["duration"] = end - start
+    output["frames"] = media["frames"] if (start, end) == (0.0, media["duration"]) else frames_between(start, end)
+    if corrupt:
+        output["frames"] = int(output["frames"] * CORRUPT_FRAME_RATIO)
+    with open(path, "w", encoding='utf-8') as f:
+        f.write(json.dumps(output) + "\n")
+
+def write_framecrc(options, start, end, fps, offset):
+    """向 stdout 输出 framecrc：只保留 IDR 分片（filter_units=pass_types=5）时只列出各关键帧；offset 为 -copyts 保留的起始时间"""
+    if "pass_types=5" in options.get("-bsf:v", ""):
+        times = [index * GOP_SECONDS for index in range(math.ceil(start / GOP_SECONDS), math.ceil(end / GOP_SECONDS))]
+    else:
+        times = [index / fps for index in range(round(start * fps), round(end * fps))]
+    lines = [f"#tb 0: 1/{FRAMECRC_TIME_BASE}", "#media_type 0: video", "#codec_id 0: h264",
+             "#stream#, dts,        pts, duration,     size, hash"]
+    duration = round(FRAMECRC_TIME_BASE / fps)
+    for value in times:
+        pts = round((value + offset) * FRAMECRC_TIME_BASE)
+        lines.append(f"0, {pts - 2 * duration:10d}, {pts:10d}, {duration:8d}, {FAKE_BITRATE // 8 // 24:8d}, 0x00000000")
+    sys.stdout.write("\n".join(lines) + "\n")
+
+def run_ffprobe(args, config, process):
+    options, positional, index = {}, [], 0
+    while index < len(args):
+        arg = args[index]
+        if arg in FFMPEG_FLAGS:
+            options[arg] = True
+            index += 1
+        elif arg.startswith("-") and index + 1 < len(args):
+            options[arg] = args[index + 1]
+            index += 2
+        else:
+            positional.append(arg)
+            index += 1
+    path = positional[-1] if positional else None
+    media = read_media(path) if path else None
+    record_event(config, tool="ffprobe", id=media.get("id") if media else None, **process, end=time.time(),
+                 role="probe", encoder=None, fault=None, rc=0 if media else 1)
+    if media is None:
+        sys.stderr.write(f"{path}: {'Invalid data found when processing input' if path and os.path.exists(path) else 'No such file or directory'}\n")
+        return 1
+
+    streams = [{"index": 0, "codec_type": "video", "codec_name": media["codec"], "pix_fmt": media["pix_fmt"],
+                "width": media["width"], "height": media["height"], "r_frame_rate": media["frame_rate"], **H264_STREAM}]
+    if not media.get("fragmented"):
+        streams[0]["nb_frames"] = str(media["frames"])
+    if options.get("-count_packets"):
+        streams[0]["nb_read_packets"] = str(media["frames"])
+    if media.get("audio"):
+        streams.append({"index": 1, "codec_type": "audio", "codec_name": "aac"})
+    for _ in range(media.get("subtitles", 0)):
+        streams.append({"index": len(streams), "codec_type": "subtitle", "codec_name": "mov_text"})
+    selector = options.get("-select_streams")
+    if selector:
+        kind, _, number = selector.partition(":")
+        streams = [stream for stream in streams if stream["codec_type"][0] == kind]
+        if number:
+            streams = streams[int(number):int(number) + 1]
+
+    fps = parse_rate(media["frame_rate"])
+    offset = media.get("start_time", 0.0)
+    packets = []
+    for keyframe in range(math.ceil(media["duration"] / GOP_SECONDS)):
+        packets.append({"pts_time": f"{offset + keyframe * GOP_SECONDS:.6f}", "flags": "K__"})
+        packets.append({"pts_time": f"{offset + keyframe * GOP_SECONDS + 1 / fps:.6f}", "flags": "___"})
+    sections = {"packet": packets, "stream": streams,
+                "format": [{"duration": f"{media['duration']:.6f}", "start_time": f"{offset:.6f}"}]}
+
+    # 只保留 -show_entries 中要求的字段
+    requested = {}
+    for entry in options.get("-show_entries", "").split(":"):
+        section, _, keys = entry.partition("=")
+        if section in sections:
+            requested[section] = keys.split(",") if keys else None
+    selected = {}
+    for section in FFPROBE_SECTIONS:
+        if section in requested:
+            keys = requested[section]
+            selected[section] = [{key: item[key] for key in (keys or item) if key in item} for item in sections[section]]
+
+    writer, _, writer_options = options.get("-of", options.get("-print_format", "default")).partition("=")
+    settings = dict(item.split("=", 1) for item in writer_options.split(":") if "=" in item)
+    if writer == "json":
+        data = {("format" if section == "format" else f"{section}s"): items[0] if section == "format" else items
+                for section, items in selected.items()}
+        print(json.dumps(data, indent=4))
+    elif writer == "csv":
+        for section, items in selected.items():
+            for item in items:
+                prefix = [] if settings.get("print_section", "1") == "0" else [section]
+                print(",".join(prefix + [str(value) for value in item.values()]))
+    else:
+        for section, items in selected.items():
+            for item in items:
+                if settings.get("noprint_wrappers", settings.get("nw", "0")) != "1":
+                    print(f"[{section.upper()}]")
+                for key, value in item.items():
+                    print(value if settings.get("nokey", settings.get("nk", "0")) == "1" else f"{key}={value}")
+                if settings.get("noprint_wrappers", settings.get("nw", "0")) != "1":
+                    print(f"[/{section.upper()}]")
+    return 0
+
+def main(argv):
+    """argv[0] 为 ffmpeg 或 ffprobe，其余为该程序的参数"""
+    process = {"spawned": process_created(), "start": time.time(), "startup_cpu": time.process_time()}
+    if not argv or argv[0] not in ("ffmpeg", "ffprobe"):
+        sys.stderr.write("用法: fakeffmpeg.py ffmpeg|ffprobe 参数...\n")
+        return 2
+    config = load_config()
+    if argv[0] == "ffprobe":
+        return run_ffprobe(argv[1:], config, process)
+    return run_ffmpeg(argv[1:], config, process)
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
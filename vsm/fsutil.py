@@ -0,0 +1,10 @@
+"""共享存储上的文件操作工具"""
+import os
+import json
+import socket
+
+def write_json_atomic(path, data, indent=2):
+    """先写临时文件再替换，保证其他主机不会读到写了一半的文件"""
+    tmp_path = path.with_name(f".{path.name}.{socket.gethostname()}-{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(data, ensure_ascii=False, indent=indent), encoding='utf-8')
+    os.replace(tmp_path, path)
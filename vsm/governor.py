@@ -0,0 +1,223 @@
+"""负载调节：编码机同时运行其他服务时，按其他程序的 CPU 占用和内存压力调整同时编码的任务数
+
+每隔 GOVERNOR_INTERVAL 秒采样一次：
+  - 其他程序的 CPU 占用 = 全机 CPU 忙碌时间 − 本程序及其全部子进程（编码、智能渲染分段、校验中的
+    FFmpeg/FFprobe，含采样间隔内已结束的）的 CPU 时间（占全部核心的百分比）。
+    编码本身会占满 CPU，系统负载与 PSI 的 cpu 项都会被自己推高，因此扣除自己的部分后再判断；
+  - 内存压力：可用内存低于阈值，或 PSI（/proc/pressure/memory）some avg10 超过 MEMORY_PSI_THRESHOLD。
+超过阈值时同时编码数减一，超出的任务用 SIGSTOP 暂停；连续 GOVERNOR_RAISE_AFTER 次低于阈值（留有回差）后加一，
+先用 SIGCONT 恢复暂停的任务。指定高峰时段时只在高峰时段内调节，其余时间恢复全部并发。
+Linux 上直接读取 /proc；其他平台需要安装 psutil，否则只能按内存调节（Windows 不支持暂停，只减少新开始的任务）。
+"""
+import os
+import re
+import logging
+import asyncio
+from datetime import datetime
+
+logger = logging.getLogger("vsm")
+
+# 采样间隔（秒）
+GOVERNOR_INTERVAL = 5
+# 连续多少次采样低于阈值后才增加一个任务，避免来回抖动
+GOVERNOR_RAISE_AFTER = 3
+# 恢复并发时其他程序的 CPU 占用需低于阈值的百分点数（回差）
+CPU_HYSTERESIS = 20
+# 内存 PSI（some avg10）超过该值视为内存压力
+MEMORY_PSI_THRESHOLD = 20
+
+PEAK_HOURS_PATTERN = re.compile(r"^(\d{1,2}):(\d{2})-(\d{1,2}):(\d{2})$")
+
+def parse_peak_hours(text):
+    """解析 08:00-20:00 形式的高峰时段，返回 (开始分钟, 结束分钟)；结束早于开始表示跨过午夜"""
+    match = PEAK_HOURS_PATTERN.match(text.strip())
+    if not match:
+        raise ValueError(f"无法解析高峰时段 '{text}'，应为 08:00-20:00 的形式")
+    start_hour, start_minute, end_hour, end_minute = map(int, match.groups())
+    if start_hour > 23 or end_hour > 24 or start_minute > 59 or end_minute > 59:
+        raise ValueError(f"无效的高峰时段 '{text}'")
+    return start_hour * 60 + start_minute, end_hour * 60 + end_minute
+
+def in_peak_hours(peak_hours, now=None):
+    """当前是否处于高峰时段；未指定高峰时段时始终视为高峰"""
+    if peak_hours is None:
+        return True
+    now = now or datetime.now()
+    minute = now.hour * 60 + now.minute
+    start, end = peak_hours
+    if start <= end:
+        return start <= minute < end
+    return minute >= start or minute < end
+
+def _import_psutil():
+    try:
+        import psutil
+        return psutil
+    except ImportError:
+        return None
+
+def system_cpu_times():
+    """全机 CPU 的 (忙碌秒数, 总秒数)（所有核心累计），无法获取时返回 None"""
+    try:
+        with open("/proc/stat", encoding='ascii') as f:
+            fields = [int(value) for value in f.readline().split()[1:9]]
+        ticks = os.sysconf("SC_CLK_TCK")
+        idle = fields[3] + fields[4]  # idle + iowait
+        return (sum(fields) - idle) / ticks, sum(fields) / ticks
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    psutil = _import_psutil()
+    if psutil is None:
+        return None
+    times = psutil.cpu_times()
+    total = sum(times)
+    idle = times.idle + getattr(times, "iowait", 0.0)
+    return total - idle, total
+
+def process_cpu_time(pid):
+    """进程已使用的 CPU 秒数（用户态 + 内核态），进程不存在或无法获取时返回 None"""
+    try:
+        with open(f"/proc/{pid}/stat", encoding='ascii', errors='replace') as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    psutil = _import_psutil()
+    if psutil is None:
+        return None
+    try:
+        times = psutil.Process(pid).cpu_times()
+        return times.user + times.system
+    except psutil.Error:
+        return None
+
+def child_pids():
+    """本进程当前的直接子进程，无法获取时返回空列表"""
+    own = os.getpid()
+    try:
+        names = os.listdir("/proc")
+    except OSError:
+        psutil = _import_psutil()
+        if psutil is None:
+            return []
+        try:
+            return [child.pid for child in psutil.Process(own).children()]
+        except psutil.Error:
+            return []
+    pids = []
+    for name in names:
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat", encoding='ascii', errors='replace') as f:
+                if int(f.read().rsplit(")", 1)[1].split()[1]) == own:
+                    pids.append(int(name))
+        except (OSError, ValueError, IndexError):
+            continue
+    return pids
+
+def own_cpu_time():
+    """本进程及已结束（已回收）的子进程累计使用的 CPU 秒数"""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+def memory_status():
+    """返回 (可用内存百分比, 内存 PSI some avg10)，无法获取的项为 None"""
+    available = psi = None
+    try:
+        with open("/proc/pressure/memory", encoding='ascii') as f:
+            for line in f:
+                if line.startswith("some"):
+                    psi = float(dict(item.split("=") for item in line.split()[1:])["avg10"])
+    except (OSError, ValueError, KeyError):
+        pass
+    try:
+        meminfo = {}
+        with open("/proc/meminfo", encoding='ascii') as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                meminfo[key] = int(value.split()[0])
+        available = meminfo["MemAvailable"] * 100 / meminfo["MemTotal"]
+    except (OSError, ValueError, KeyError, IndexError, ZeroDivisionError):
+        psutil = _import_psutil()
+        if psutil is not None:
+            available = psutil.virtual_memory().available * 100 / psutil.virtual_memory().total
+    return available, psi
+
+class CpuSampler:
+    """按相邻两次采样的差值计算其他程序的 CPU 占用百分比"""
+
+    def __init__(self):
+        self.last_system = None
+        self.last_own = 0.0
+        self.last_children = {}
+
+    def sample(self):
+        """首次采样或无法统计时返回 None"""
+        system = system_cpu_times()
+        own = own_cpu_time()
+        children = {pid: process_cpu_time(pid) for pid in child_pids()}
+        children = {pid: cpu for pid, cpu in children.items() if cpu is not None}
+        last_system, last_own, last_children = self.last_system, self.last_own, self.last_children
+        self.last_system, self.last_own, self.last_children = system, own, children
+        if system is None or last_system is None or system[1] <= last_system[1]:
+            return None
+        # 运行中的子进程按增量计入（上次采样后才启动的全部计入）；已结束的子进程的全部 CPU 时间
+        # 进入 own_cpu_time 的累计值，需扣除上次采样时已计入的部分
+        used = own - last_own
+        used += sum(cpu - last_children.get(pid, 0.0) for pid, cpu in children.items())
+        used -= sum(cpu for pid, cpu in last_children.items() if pid not in children)
+        busy = system[0] - last_system[0]
+        return max(0.0, busy - max(0.0, used)) * 100 / (system[1] - last_system[1])
+
+class LoadGovernor:
+    """周期性采样系统负载，调整 JobRunner 同时编码的任务数"""
+
+    def __init__(self, runner, cpu_threshold, memory_threshold, peak_hours=None, interval=GOVERNOR_INTERVAL):
+        self.runner = runner
+        self.max_jobs = max(1, runner.options.jobs)
+        self.cpu_threshold = cpu_threshold
+        self.memory_threshold = memory_threshold
+        self.peak_hours = peak_hours
+        self.interval = interval
+        self.sampler = CpuSampler()
+        self.calm = 0
+        self.warned = False
+
+    def decide(self, limit, now=None):
+        """根据一次采样决定新的同时编码数"""
+        if not in_peak_hours(self.peak_hours, now):
+            self.calm = 0
+            return self.max_jobs, "非高峰时段"
+        foreign = self.sampler.sample()
+        available, psi = memory_status()
+        if foreign is None and available is None and not self.warned:
+            logger.warning("无法获取 CPU 与内存使用情况（非 Linux 平台请安装 psutil），负载调节不生效")
+            self.warned = True
+
+        memory_pressure = (available is not None and available < self.memory_threshold) or \
+            (psi is not None and psi > MEMORY_PSI_THRESHOLD)
+        reason = f"其他程序 CPU {'--' if foreign is None else f'{foreign:.0f}'}%，" \
+                 f"可用内存 {'--' if available is None else f'{available:.0f}'}%" + \
+                 (f"，内存 PSI {psi:.1f}" if psi else "")
+        if memory_pressure or (foreign is not None and foreign > self.cpu_threshold):
+            self.calm = 0
+            return max(0, limit - 1), reason
+        if foreign is None or foreign < self.cpu_threshold - CPU_HYSTERESIS:
+            self.calm += 1
+            if self.calm >= GOVERNOR_RAISE_AFTER:
+                self.calm = 0
+                return min(self.max_jobs, limit + 1), reason
+        else:
+            self.calm = 0
+        return limit, reason
+
+    async def run(self):
+        """持续调节，直到被取消"""
+        self.sampler.sample()  # 建立基准
+        while True:
+            await asyncio.sleep(self.interval)
+            limit, reason = self.decide(self.runner.limit)
+            if limit != self.runner.limit:
+                logger.info(f"负载调节: {reason}，同时编码数 {self.runner.limit} -> {limit}")
+                self.runner.set_limit(limit)
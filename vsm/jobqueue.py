@@ -0,0 +1,196 @@
+"""共享存储上的任务队列：多台主机的工作进程通过原子 rename 领取任务，靠租约文件续约"""
+import os
+import json
+import socket
+import hashlib
+from datetime import datetime
+from pathlib import Path
+
+from .defaults import QUEUE_LEASE_TIMEOUT, QUEUE_MAX_ATTEMPTS
+from .fsutil import write_json_atomic
+
+# 各状态对应队列目录下的同名子目录
+QUEUE_STATES = ("pending", "claimed", "leases", "done", "failed")
+# 没有可领取任务时的轮询间隔（秒）
+QUEUE_POLL_INTERVAL = 10
+# 工作进程检查本机任务是否完成、是否需要续约的间隔（秒）
+QUEUE_CHECK_INTERVAL = 1
+
+def init_job_queue(queue_dir):
+    """创建共享任务队列目录结构（位于各主机均可访问的共享存储上）"""
+    queue_dir = Path(queue_dir)
+    for state in QUEUE_STATES:
+        (queue_dir / state).mkdir(parents=True, exist_ok=True)
+    return queue_dir
+
+def shared_now(queue_dir):
+    """以共享存储的时钟为准获取当前时间，避免各主机时钟不一致导致误判租约过期"""
+    clock_path = Path(queue_dir) / ".clock"
+    clock_path.touch()
+    return clock_path.stat().st_mtime
+
+def read_queued_job(path):
+    """读取队列中的任务文件，不存在或已损坏时返回 None"""
+    try:
+        return json.loads(Path(path).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+
+def enqueue_jobs(queue_dir, pairs, logger):
+    """将匹配的文件对写入共享队列
+
+    任务 ID 由视频路径决定，待处理或处理中的任务不会重复入队；
+    done/failed 中的任务只在视频的大小和修改时间都未变时跳过，同名视频被替换后重新入队
+    """
+    queue_dir = init_job_queue(queue_dir)
+    added = 0
+    for video_path, subtitle_paths in pairs:
+        video_path = Path(video_path).resolve()
+        try:
+            stat = video_path.stat()
+        except OSError as e:
+            logger.warning(f"无法读取 {video_path}，跳过: {str(e)}")
+            continue
+        job_id = hashlib.sha1(str(video_path).encode('utf-8')).hexdigest()[:16]
+        name = f"{job_id}.json"
+        if any((queue_dir / state / name).exists() for state in ("pending", "claimed")):
+            logger.info(f"任务已在队列中等待或处理，跳过: {video_path}")
+            continue
+        finished = [(state, read_queued_job(queue_dir / state / name)) for state in ("done", "failed")]
+        finished = [(state, job) for state, job in finished if job is not None]
+        state = next((state for state, job in finished
+                      if job.get("size") == stat.st_size and job.get("mtime_ns") == stat.st_mtime_ns), None)
+        if state:
+            logger.info(f"任务已{'完成' if state == 'done' else '失败'}且视频未变，跳过"
+                        f"（删除 {queue_dir / state / name} 可重新入队）: {video_path}")
+            continue
+        for state, _ in finished:
+            logger.info(f"视频已被替换，重新入队（取代 {state} 中的记录）: {video_path}")
+            (queue_dir / state / name).unlink(missing_ok=True)
+        job = {
+            "id": job_id,
+            "video": str(video_path),
+            "subtitles": [str(Path(path).resolve()) for path in subtitle_paths],
+            "output": str(video_path.parent / f"R{video_path.name}"),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "attempts": 0,
+        }
+        write_json_atomic(queue_dir / "pending" / name, job)
+        added += 1
+    logger.info(f"已入队 {added} 个任务，队列目录: {queue_dir}")
+    return added
+
+def read_lease_owner(lease_path):
+    """读取租约文件中的工作进程 ID；租约不存在时抛出 FileNotFoundError，内容尚未写入时返回 None"""
+    try:
+        return json.loads(Path(lease_path).read_text(encoding='utf-8')).get("worker")
+    except ValueError:
+        return None
+
+def claim_job(queue_dir, worker_id):
+    """领取一个待处理任务：先以独占方式创建租约，再依靠 rename 的原子性把任务移入 claimed，
+    任务一出现在 claimed 中就已有租约，回收者不会在领取过程中误判其超时"""
+    queue_dir = Path(queue_dir)
+    for job_path in sorted((queue_dir / "pending").glob("*.json")):
+        lease_path = queue_dir / "leases" / job_path.name
+        try:
+            fd = os.open(lease_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL)
+        except FileExistsError:
+            continue  # 其他工作进程正在领取
+        with os.fdopen(fd, "w", encoding='utf-8') as f:
+            json.dump({"id": job_path.stem, "worker": worker_id}, f)
+        claimed_path = queue_dir / "claimed" / job_path.name
+        try:
+            os.rename(job_path, claimed_path)
+        except OSError:
+            lease_path.unlink()  # 已被其他工作进程领取并完成
+            continue
+        job = json.loads(claimed_path.read_text(encoding='utf-8'))
+        job["worker"] = worker_id
+        job["attempts"] = job.get("attempts", 0) + 1
+        write_json_atomic(claimed_path, job)
+        return job
+    return None
+
+def renew_lease(queue_dir, job_id, worker_id=None):
+    """续约：更新租约文件的修改时间；租约已被回收（或已属于其他工作进程）时抛出 FileNotFoundError"""
+    lease_path = Path(queue_dir) / "leases" / f"{job_id}.json"
+    if worker_id is not None and read_lease_owner(lease_path) != worker_id:
+        raise FileNotFoundError(lease_path)
+    os.utime(lease_path)
+
+def requeue_expired_jobs(queue_dir, logger, lease_timeout=QUEUE_LEASE_TIMEOUT, max_attempts=QUEUE_MAX_ATTEMPTS):
+    """回收超时未续约（工作进程已失联）的任务，重新放回待处理队列或标记为失败"""
+    queue_dir = Path(queue_dir)
+    now = shared_now(queue_dir)
+    reaper_id = f"{socket.gethostname()}-{os.getpid()}"
+    requeued = 0
+    for claimed_path in (queue_dir / "claimed").glob("*.json"):
+        lease_path = queue_dir / "leases" / claimed_path.name
+        try:
+            lease_mtime = lease_path.stat().st_mtime
+        except FileNotFoundError:
+            # 旧版本领取后尚未写入租约就失联的任务，以任务文件时间为准
+            try:
+                lease_mtime = claimed_path.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            lease_path = None
+        if now - lease_mtime <= lease_timeout:
+            continue
+
+        # 先把任务文件改名为回收中，多个回收者同时发现时只有一个会成功
+        reaping_path = claimed_path.with_name(f".{claimed_path.stem}.reaping-{reaper_id}")
+        try:
+            os.rename(claimed_path, reaping_path)
+        except OSError:
+            continue
+        if lease_path is not None:
+            try:
+                lease_path.unlink()
+            except FileNotFoundError:
+                pass
+
+        job = json.loads(reaping_path.read_text(encoding='utf-8'))
+        dead_worker = job.pop("worker", "未知")
+        if job.get("attempts", 0) >= max_attempts:
+            job["error"] = f"超过最大尝试次数 {max_attempts}"
+            write_json_atomic(queue_dir / "failed" / claimed_path.name, job)
+            logger.error(f"任务 {job['video']} 的工作进程 {dead_worker} 失联，且已达最大尝试次数，标记为失败")
+        else:
+            write_json_atomic(queue_dir / "pending" / claimed_path.name, job)
+            logger.warning(f"任务 {job['video']} 的工作进程 {dead_worker} 失联，重新入队")
+            requeued += 1
+        reaping_path.unlink()
+
+    # 创建租约后、移入 claimed 前失联留下的租约会挡住该任务的领取，超时后删除
+    for lease_path in (queue_dir / "leases").glob("*.json"):
+        try:
+            if now - lease_path.stat().st_mtime <= lease_timeout or (queue_dir / "claimed" / lease_path.name).exists():
+                continue
+            lease_path.unlink()
+        except FileNotFoundError:
+            continue
+        logger.warning(f"删除没有对应任务的过期租约: {lease_path.name}")
+    return requeued
+
+def complete_job(queue_dir, job, success, logger):
+    """将任务移入 done 或 failed；租约已被回收（或已被其他工作进程重新领取）时不再改动队列"""
+    queue_dir = Path(queue_dir)
+    name = f"{job['id']}.json"
+    lease_path = queue_dir / "leases" / name
+    try:
+        owner = read_lease_owner(lease_path)
+    except FileNotFoundError:
+        owner = None
+    if owner != job["worker"]:
+        logger.warning(f"任务 {job['video']} 的租约已被回收，结果不写回队列")
+        return
+    job["finished_at"] = datetime.now().isoformat(timespec='seconds')
+    write_json_atomic(queue_dir / ("done" if success else "failed") / name, job)
+    for path in (queue_dir / "claimed" / name, lease_path):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,182 @@
+"""FFprobe 探测与编码器相关的工具函数"""
+import os
+import json
+import logging
+import functools
+import subprocess
+from fractions import Fraction
+
+logger = logging.getLogger("vsm")
+
+def get_video_duration(video_path):
+    """获取视频时长（秒）"""
+    try:
+        cmd = [
+            "ffprobe",
+            "-v", "error",
+            "-show_entries", "format=duration",
+            "-of", "default=noprint_wrappers=1:nokey=1",
+            str(video_path)
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        return float(result.stdout.strip())
+    except Exception as e:
+        logger.error(f"获取 {video_path.name} 时长失败: {str(e)}")
+        return None
+
+def detect_nvenc_support(logger):
+    """检测系统是否支持 NVIDIA NVENC 编码器"""
+    try:
+        cmd = ["ffmpeg", "-encoders"]
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        if "h264_nvenc" in result.stdout:
+            logger.info("检测到 NVIDIA NVENC 支持，将优先使用 GPU 加速")
+            return True
+        else:
+            logger.warning("未检测到 NVIDIA NVENC 支持，将使用 libx264 (CPU 编码)")
+            return False
+    except Exception as e:
+        logger.warning(f"检测 NVENC 支持失败: {str(e)}，将使用 libx264 (CPU 编码)")
+        return False
+
+def get_video_stream_info(video_path):
+    """获取第一路视频流的编码、像素格式、分辨率、帧率，以及 profile、level、参考帧数和 B 帧重排序深度"""
+    cmd = [
+        "ffprobe",
+        "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "stream=codec_name,pix_fmt,width,height,r_frame_rate,profile,level,refs,has_b_frames",
+        "-of", "json",
+        str(video_path)
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    streams = json.loads(result.stdout).get("streams", [])
+    return streams[0] if streams else {}
+
+def get_idr_frame_times(video_path):
+    """读取 H.264 视频流中 IDR 帧的时间（只解析 NAL 头，不解码）
+
+    容器标记的关键帧还包括开放 GOP 的恢复点 I 帧，其后的 B 帧仍参考前一个 GOP，只有在 IDR 帧处切开才能无损拼接。
+    用 filter_units 只保留 IDR 分片（NAL 类型 5），不含 IDR 的包被丢弃，framecrc 逐包输出剩下的时间戳。
+    不加 -copyts：与智能渲染的切分命令一样由 FFmpeg 减去文件的 start_time，时间与字幕、切分点都在从 0 开始的同一时间轴上
+    """
+    cmd = [
+        "ffmpeg",
+        "-v", "error",
+        "-i", str(video_path),
+        "-map", "0:v:0", "-c", "copy",
+        "-bsf:v", "filter_units=pass_types=5",
+        "-f", "framecrc", "-"
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    time_base = None
+    idr_frames = set()
+    for line in result.stdout.splitlines():
+        if line.startswith("#tb 0:"):
+            numerator, _, denominator = line.split(":", 1)[1].strip().partition('/')
+            time_base = Fraction(int(numerator), int(denominator or 1))
+        elif line and not line.startswith("#") and time_base is not None:
+            parts = [part.strip() for part in line.split(',')]
+            if len(parts) >= 3 and parts[0] == "0":
+                idr_frames.add(float(int(parts[2]) * time_base))
+    return sorted(idr_frames)
+
+def parse_frame_rate(text, default=25.0):
+    """解析 ffprobe 的帧率字符串（如 24000/1001）"""
+    try:
+        numerator, _, denominator = str(text).partition('/')
+        rate = float(numerator) / float(denominator or 1)
+        return rate if rate > 0 else default
+    except (ValueError, ZeroDivisionError):
+        return default
+
+# 各编码器可选的预设（从快到慢）与默认预设
+ENCODER_PRESETS = {
+    "libx264": ("ultrafast", "superfast", "veryfast", "faster", "fast", "medium", "slow", "slower"),
+    "h264_nvenc": ("p1", "p2", "p3", "p4", "p5", "p6", "p7"),
+}
+DEFAULT_PRESETS = {"libx264": "medium", "h264_nvenc": "p7"}
+
+def video_encoder_args(use_nvenc, preset=None):
+    """返回视频编码参数，与完整重编码保持一致；preset 为空时使用默认预设"""
+    if use_nvenc:
+        return ["-c:v", "h264_nvenc", "-preset", preset or DEFAULT_PRESETS["h264_nvenc"], "-rc", "vbr", "-b:v", "1M"]
+    return ["-c:v", "libx264", "-preset", preset or DEFAULT_PRESETS["libx264"], "-crf", "23"]
+
+# ffprobe 报告的 H.264 profile -> 各编码器 -profile:v 的取值；不在表中的 profile 无法匹配
+H264_ENCODER_PROFILES = {
+    "libx264": {"Constrained Baseline": "baseline", "Baseline": "baseline", "Main": "main", "High": "high",
+                "High 10": "high10", "High 4:2:2": "high422", "High 4:4:4 Predictive": "high444"},
+    "h264_nvenc": {"Constrained Baseline": "baseline", "Baseline": "baseline", "Main": "main", "High": "high",
+                   "High 4:4:4 Predictive": "high444p"},
+}
+
+def matching_encoder_args(use_nvenc, stream_info):
+    """与源视频流的 profile、level、参考帧数和 B 帧一致的编码参数（追加在 video_encoder_args 之后）
+
+    B 帧数取源视频的重排序深度，重编码片段的解码延迟不会超过原片段。无法匹配时返回 None
+    """
+    profile = H264_ENCODER_PROFILES["h264_nvenc" if use_nvenc else "libx264"].get(stream_info.get("profile"))
+    try:
+        level = int(stream_info.get("level"))
+        refs = int(stream_info.get("refs"))
+        b_frames = int(stream_info.get("has_b_frames"))
+    except (TypeError, ValueError):
+        return None
+    if profile is None or level < 10 or refs <= 0 or b_frames < 0:
+        return None
+    return ["-profile:v", profile, "-level", f"{level // 10}.{level % 10}", "-refs", str(refs), "-bf", str(b_frames)]
+
+def rendition_encoder_args(use_nvenc, bitrate=None, preset=None):
+    """多规格输出的视频编码参数：指定码率时按码率编码，否则与完整重编码相同"""
+    if bitrate is None:
+        return video_encoder_args(use_nvenc, preset)
+    if use_nvenc:
+        return ["-c:v", "h264_nvenc", "-preset", preset or DEFAULT_PRESETS["h264_nvenc"], "-rc", "vbr", "-b:v", bitrate]
+    return ["-c:v", "libx264", "-preset", preset or DEFAULT_PRESETS["libx264"],
+            "-b:v", bitrate, "-maxrate", bitrate, "-bufsize", bitrate]
+
+@functools.lru_cache(maxsize=4096)
+def _probe_media_cached(path, size, mtime_ns):
+    cmd = [
+        "ffprobe",
+        "-v", "error",
+        "-show_entries", "format=duration:stream=codec_type,nb_frames",
+        "-of", "json",
+        path
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    data = json.loads(result.stdout)
+    stream_counts = {}
+    video_frames = None
+    for stream in data.get("streams", []):
+        codec_type = stream.get("codec_type", "unknown")
+        stream_counts[codec_type] = stream_counts.get(codec_type, 0) + 1
+        if codec_type == "video" and video_frames is None and str(stream.get("nb_frames", "")).isdigit():
+            video_frames = int(stream["nb_frames"])
+
+    if video_frames is None and stream_counts.get("video"):
+        # 容器头中没有帧数（如 TS、分片 MP4）时数包：读取整个文件但不解码
+        cmd = [
+            "ffprobe",
+            "-v", "error",
+            "-count_packets",
+            "-select_streams", "v:0",
+            "-show_entries", "stream=nb_read_packets",
+            "-of", "default=noprint_wrappers=1:nokey=1",
+            path
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        if result.stdout.strip().isdigit():
+            video_frames = int(result.stdout.strip())
+
+    return {
+        "duration": float(data.get("format", {}).get("duration") or 0),
+        "streams": stream_counts,
+        "video_frames": video_frames,
+    }
+
+def probe_media(path):
+    """探测容器时长、各类流数量和视频帧数（只读容器头，不解码），结果按文件大小和修改时间缓存"""
+    stat = os.stat(path)
+    return _probe_media_cached(str(path), stat.st_size, stat.st_mtime_ns)
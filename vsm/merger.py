@@ -0,0 +1,761 @@
+"""merge 子命令：将 SRT 字幕烧录进同名 MP4 视频"""
+import os
+import sys
+import time
+import socket
+import asyncio
+import logging
+import itertools
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from .cache import output_cache_key, rendition_cache_key, cache_lookup, cache_store, materialize_file, evict_cache
+from .calibrate import calibrate_missing, choose_preset, load_calibration, preset_speeds, required_speed
+from .defaults import (
+    DEVICE_JOBS, QUEUE_LEASE_TIMEOUT, QUEUE_MAX_ATTEMPTS, THROTTLE_CPU_PERCENT, THROTTLE_MEMORY_PERCENT, VERIFY_JOBS
+)
+from .devices import DeviceAdmission, device_of, encoder_bitrate, estimate_output_size, parse_bitrate
+from .governor import LoadGovernor
+from .jobqueue import (
+    QUEUE_POLL_INTERVAL, QUEUE_CHECK_INTERVAL, init_job_queue, enqueue_jobs, claim_job, renew_lease, requeue_expired_jobs, complete_job
+)
+from .media import get_video_duration, detect_nvenc_support, video_encoder_args, rendition_encoder_args
+from .renditions import rendition_output_path, build_rendition_graph
+from .retime import Retiming, SubtitleFeeds, retime_bytes
+from .scan import scan_tree
+from .schedule import (
+    DEFAULT_PIXEL_RATES, load_encode_stats, save_encode_stats, estimate_job_cost, record_encode_speed, probe_job
+)
+from .smart_render import smart_render_subtitles
+from .subtitles import SUBTITLE_STYLE, build_subtitle_filter, normalize_language, plan_subtitle_tracks, soft_subtitle_args
+from .supervisor import JobProgress, ProgressDashboard, DashboardLogHandler, format_seconds, run_ffmpeg_async
+from .verify import verify_output
+
+logger = logging.getLogger("vsm")
+
+# 分片 MP4：moov 写在文件开头，数据按关键帧分成 moof/mdat 片段依次写出，
+# 编码过程中已写出的部分即可读取，结束后也无需 +faststart 再重写一遍文件
+FRAGMENTED_MP4_ARGS = ["-movflags", "+frag_keyframe+empty_moov+default_base_moof"]
+
+@dataclass
+class MergeOptions:
+    """一次批处理的编码、校验和缓存选项"""
+    use_nvenc: bool = False
+    smart_render: bool = False
+    jobs: int = 1
+    timeout: Optional[float] = None
+    verify: bool = True
+    verify_sample: float = 0
+    verify_jobs: int = VERIFY_JOBS
+    device_jobs: int = DEVICE_JOBS  # 同一存储设备上同时编码的任务数，0 表示不限
+    cache_dir: Optional[str] = None
+    burn: str = "auto"
+    renditions: tuple = ()  # [(名称, 高度, 码率或 None), ...]，为空时输出单个同分辨率文件
+    retime: Optional[Retiming] = None  # 在内存中对字幕应用的时间轴校正
+    target_speed: Optional[float] = None  # 按校准结果选择预设：每个任务至少达到的实时倍速
+    deadline: Optional[float] = None  # 按校准结果选择预设：全部任务的截止时间（Unix 时间戳）
+    fragmented: bool = False  # 输出分片 MP4
+    throttle: bool = False  # 按系统负载调整同时编码的任务数
+    throttle_cpu: float = THROTTLE_CPU_PERCENT  # 其他程序的 CPU 占用超过该百分比时减少任务
+    throttle_memory: float = THROTTLE_MEMORY_PERCENT  # 可用内存低于该百分比时减少任务
+    peak_hours: Optional[tuple] = None  # 只在该时段内调节（开始分钟, 结束分钟）
+
+    @property
+    def container_args(self):
+        """输出文件的封装参数"""
+        return FRAGMENTED_MP4_ARGS if self.fragmented else []
+
+    @classmethod
+    def from_args(cls, args, use_nvenc):
+        retime = Retiming.from_values(args.retime_offset, args.retime_stretch, args.retime_fps, args.retime_anchor)
+        return cls(
+            use_nvenc=use_nvenc,
+            smart_render=args.smart_render,
+            jobs=args.jobs,
+            timeout=args.timeout,
+            verify=not args.no_verify,
+            verify_sample=args.verify_sample,
+            verify_jobs=args.verify_jobs,
+            device_jobs=args.device_jobs,
+            cache_dir=args.cache_dir,
+            burn=args.burn,
+            renditions=tuple(args.renditions or ()),
+            retime=None if retime.is_identity else retime,
+            target_speed=args.target_speed,
+            deadline=args.deadline,
+            fragmented=args.fragmented,
+            throttle=args.throttle or args.peak_hours is not None,
+            throttle_cpu=args.throttle_cpu,
+            throttle_memory=args.throttle_memory,
+            peak_hours=args.peak_hours,
+        )
+
+def setup_logging(directory, suffix=""):
+    """配置日志，输出到控制台和文件"""
+    log_filename = f"embed_subtitles_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}{suffix}.log"
+    log_path = Path(directory) / log_filename
+    
+    logger = logging.getLogger("vsm")
+    logger.setLevel(logging.DEBUG)  # 设置为 DEBUG 以记录更多信息
+    
+    console_handler = DashboardLogHandler()
+    console_handler.setLevel(logging.INFO)
+    
+    file_handler = logging.FileHandler(log_path, encoding='utf-8')
+    file_handler.setLevel(logging.DEBUG)
+    
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    console_handler.setFormatter(formatter)
+    file_handler.setFormatter(formatter)
+    
+    logger.addHandler(console_handler)
+    logger.addHandler(file_handler)
+    
+    return logger, log_path
+
+def find_matching_files(directory, snapshot=None):
+    """查找目录及其子目录中的 MP4 文件及其全部字幕，返回 (视频, [字幕, ...]) 列表
+
+    name.srt 以及 name.ja.srt、name.zh.srt 等带语言标签的字幕都归入同目录的 name.mp4。
+    未传入扫描快照时先并行扫描整个目录
+    """
+    directory = Path(directory)
+    if not directory.is_dir():
+        raise ValueError(f"目录 {directory} 不存在")
+
+    snapshot = snapshot or scan_tree(directory)
+    mp4_files = {(mp4.parent, mp4.stem): mp4 for mp4 in snapshot.files(".mp4")}
+
+    groups = {}
+    for srt in snapshot.files(".srt"):
+        mp4 = mp4_files.get((srt.parent, srt.stem))
+        if mp4 is None and "." in srt.stem:
+            base, tag = srt.stem.rsplit(".", 1)
+            if normalize_language(tag):
+                mp4 = mp4_files.get((srt.parent, base))
+        if mp4 is None:
+            logger.warning(f"未找到与 {srt} 匹配的 MP4 文件")
+            continue
+        groups.setdefault(mp4, []).append(srt)
+
+    return list(groups.items())
+
+def encode_settings(options):
+    """影响输出内容的编码设置，作为缓存键的一部分"""
+    return {
+        "video": video_encoder_args(options.use_nvenc),
+        "style": SUBTITLE_STYLE,
+        "smart_render": options.smart_render,
+        "burn": options.burn,
+        "renditions": options.renditions,
+        "retime": asdict(options.retime) if options.retime else None,
+        "fragmented": options.fragmented,
+    }
+
+def output_targets(video_path, options):
+    """本任务的临时输出路径列表：多规格时每个规格一个，否则为 R 前缀的同名文件"""
+    if options.renditions:
+        return [rendition_output_path(video_path, name) for name, _, _ in options.renditions]
+    return [video_path.parent / f"R{video_path.name}"]
+
+def job_footprint(video_path, info, options):
+    """任务所在的存储设备与预计输出字节数（码率 × 时长；CRF、流复制和智能渲染按原文件大小估算）"""
+    try:
+        source_size = video_path.stat().st_size
+    except OSError:
+        source_size = 0
+    default_bitrate = encoder_bitrate(video_encoder_args(options.use_nvenc))
+    if options.renditions:
+        bitrates = [parse_bitrate(bitrate) if bitrate else default_bitrate for _, _, bitrate in options.renditions]
+    elif options.burn == "none" or options.smart_render:
+        bitrates = [None]
+    else:
+        bitrates = [default_bitrate]
+    return device_of(video_path.parent), estimate_output_size(source_size, info.get("duration"), bitrates)
+
+def build_encode_command(video_path, burn_path, soft_paths, output_paths, options, use_nvenc, source=str, presets=None):
+    """生成完整编码的 FFmpeg 命令，返回 (编码方式描述, 命令)
+
+    source 把字幕路径转换为传给 FFmpeg 的地址，默认直接使用文件路径；
+    presets 为 编码器 -> 预设，未列出的编码器使用默认预设
+    """
+    preset = (presets or {}).get("h264_nvenc" if use_nvenc else "libx264")
+    soft_inputs, soft_outputs = soft_subtitle_args(video_path, soft_paths, 1, source)
+    cmd = ["ffmpeg", "-i", str(video_path), *soft_inputs]
+
+    if options.renditions:
+        # 字幕只渲染一次，split 后每路缩放到各自分辨率，在同一进程中分别编码
+        encoder_desc = "GPU (h264_nvenc)" if use_nvenc else "CPU (libx264)"
+        subtitle_filter = build_subtitle_filter(source(burn_path)) if burn_path is not None else None
+        graph, labels = build_rendition_graph(subtitle_filter, options.renditions)
+        cmd += ["-filter_complex", graph]
+        for label, output_path, (_, _, bitrate) in zip(labels, output_paths, options.renditions):
+            cmd += [
+                "-map", label, "-map", "0:a?",
+                *rendition_encoder_args(use_nvenc, bitrate, preset),
+                "-c:a", "copy", *soft_outputs, *options.container_args, "-y", str(output_path)
+            ]
+        return encoder_desc, cmd
+
+    if burn_path is None:
+        # 不烧录时视频无需重编码
+        encoder_desc = "流复制"
+        video_args = ["-c:v", "copy"]
+    else:
+        encoder_desc = "GPU (h264_nvenc)" if use_nvenc else "CPU (libx264)"
+        video_args = ["-vf", build_subtitle_filter(source(burn_path)), *video_encoder_args(use_nvenc, preset)]
+    # 显式映射：与软字幕、多规格和智能渲染的输出一致，保留全部音轨，校验时按此计算应有的流数量
+    cmd += [
+        "-map", "0:v:0", "-map", "0:a?", *video_args, "-c:a", "copy", *soft_outputs, *options.container_args,
+        "-y", str(output_paths[0])
+    ]
+    return encoder_desc, cmd
+
+async def embed_subtitles(video_path, subtitle_paths, output_paths, logger, options, progress=None, presets=None,
+                          info=None):
+    """调用 FFmpeg 将 SRT 字幕烧录进 MP4 视频，支持 GPU 加速，失败回退 CPU
+
+    同一视频有多条字幕时，在同一次 FFmpeg 调用中烧录其中一条（options.burn），
+    并把全部字幕作为带语言标签的软字幕轨封装，源视频只读取、解码一次。
+    指定 options.renditions 时同一进程按各规格分别输出到 output_paths。
+    指定 options.retime 时在内存中校正字幕时间轴，经管道交给 FFmpeg，不写中间文件。
+    presets 为按校准结果为本任务选择的预设（编码器 -> 预设）。
+    info 为调度时的探测结果（probe_job），有时直接使用其中的时长和视频流信息，不再重复探测。
+    编码成功返回 True，否则返回 False；删除原文件和重命名由 finalize_output 在校验通过后完成
+    """
+    use_nvenc = options.use_nvenc
+    try:
+        burn_path, soft_paths = plan_subtitle_tracks(video_path, subtitle_paths, options.burn)
+        if burn_path is None and options.burn != "none":
+            logger.warning(f"{video_path.name} 没有 {options.burn} 字幕，只封装软字幕")
+        if soft_paths:
+            logger.info(f"{video_path.name} 封装 {len(soft_paths)} 条软字幕" + (f"，烧录 {burn_path.name}" if burn_path else ""))
+
+        # 获取视频总时长
+        info = info or {}
+        duration = info.get("duration") or await asyncio.to_thread(get_video_duration, video_path)
+        if progress is not None and duration:
+            progress.duration = duration
+
+        # 在内存中校正时间轴，每次启动 FFmpeg 时为每处引用新建管道
+        retimed = {}
+        if options.retime:
+            for path in subtitle_paths:
+                retimed[path] = await asyncio.to_thread(retime_bytes, path, options.retime)
+
+        # 智能渲染：只重编码有字幕的 GOP，不适用时回退到完整重编码
+        rendered = False
+        if options.smart_render and burn_path is not None and (options.renditions or retimed):
+            # 智能渲染直接读取字幕文件且只输出一个规格
+            logger.info(f"{video_path.name} {'输出多个规格' if options.renditions else '需要校正字幕时间轴'}，"
+                        f"忽略 --smart-render，完整重编码")
+        elif options.smart_render and burn_path is not None:
+            rendered = await smart_render_subtitles(
+                video_path, burn_path, output_paths[0], logger, use_nvenc, progress, soft_paths,
+                options.container_args, info.get("stream"), duration, presets
+            )
+            if not rendered:
+                logger.info(f"{video_path.name} 改为完整重编码")
+
+        # 优先 NVENC 编码（如果启用），失败时回退到 CPU 编码
+        while not rendered:
+            feeds = SubtitleFeeds() if retimed else None
+            source = (lambda path: feeds.add(retimed[path])) if retimed else str
+            encoder_desc, cmd = build_encode_command(
+                video_path, burn_path, soft_paths, output_paths, options, use_nvenc, source, presets
+            )
+            if progress is not None:
+                progress.start(encoder_desc)
+            if await run_ffmpeg_async(cmd, logger, f" {video_path.name} {encoder_desc} 编码", progress, feeds=feeds):
+                logger.info(f"成功处理: {', '.join(str(path) for path in output_paths)} ({encoder_desc})")
+                break
+            if encoder_desc == "流复制" or not use_nvenc:
+                logger.error(f"编码失败: {video_path.name} ({encoder_desc})")
+                return False
+            logger.info(f"回退到 CPU 编码 (libx264) 处理 {video_path.name}")
+            use_nvenc = False  # 切换到 CPU 编码
+
+        return True
+
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.error(f"处理 {video_path.name} 时出错: {str(e)}")
+        return False
+
+def finalize_output(video_path, subtitle_paths, output_paths, logger):
+    """删除原始视频和全部字幕，并把各输出文件去掉 'R' 前缀；全部重命名成功返回 True"""
+    # 删除原始文件
+    for path in (video_path, *subtitle_paths):
+        try:
+            path.unlink()
+            logger.info(f"删除原始文件: {path}")
+        except Exception as e:
+            logger.error(f"删除 {path} 失败: {str(e)}")
+
+    # 重命名输出文件，去掉 'R' 前缀
+    success = True
+    for output_path in output_paths:
+        final_path = output_path.parent / output_path.name[1:]
+        try:
+            output_path.rename(final_path)
+            logger.info(f"重命名 {output_path} 为 {final_path}")
+        except Exception as e:
+            logger.error(f"重命名 {output_path} 失败: {str(e)}")
+            success = False
+    return success
+
+@dataclass
+class MergeJob:
+    """调度器中的一个任务：视频、字幕、探测信息与进度；success 在完成前为 None"""
+    id: str
+    video_path: Path
+    subtitle_paths: list
+    info: dict
+    progress: JobProgress
+    device: Optional[int] = None  # 所在存储设备（st_dev）
+    output_size: int = 0  # 预计输出字节数
+    admitted: bool = False  # 是否已占用设备位置与预留空间
+    presets: dict = field(default_factory=dict)  # 按校准结果选择的预设（编码器 -> 预设），为空时使用默认预设
+    success: Optional[bool] = None
+
+class JobRunner:
+    """任务调度器，批处理与服务模式共用
+
+    调度采用最长处理时间优先（LPT）：每次空出位置时，按最新的吞吐量估计选出预计耗时最长的任务，
+    避免长片排在最后拖长整批的完成时间。同一存储设备上最多同时编码 options.device_jobs 个任务，
+    剩余空间不足以容纳预计输出时先等待同设备的任务完成。
+    启用 options.throttle 时由 LoadGovernor 按系统负载调整 limit，超出的任务暂停。编码完成后立即释放编码位置，
+    校验、删除原文件和重命名在独立的校验并发池（options.verify_jobs）中进行。
+    指定 options.cache_dir 时，内容与设置相同的任务直接取用缓存的输出，不再编码。
+    submit() 可在运行期间随时加入任务；history 为保留的已完成任务数（服务模式），超出后最早完成的任务被移除
+    """
+
+    def __init__(self, logger, options, history=None):
+        self.logger = logger
+        self.options = options
+        self.dashboard = ProgressDashboard()
+        self.jobs = []
+        self.pending = []
+        self.stats = load_encode_stats()
+        self.encoder = "h264_nvenc" if options.use_nvenc else "libx264"
+        self.settings = encode_settings(options)
+        self.inflight = {}  # 缓存键 -> 完成事件，内容相同的任务只编码一次
+        self.verify_semaphore = asyncio.Semaphore(options.verify_jobs)
+        self.verify_tasks = set()
+        self.admission = DeviceAdmission(options.device_jobs)
+        self.calibration = load_calibration() if options.target_speed or options.deadline else {}
+        self.limit = max(1, options.jobs)  # 当前允许同时编码的任务数，由负载调节器调整
+        self.encoding = 0  # 已领取、尚未编码结束的任务数（含暂停的）
+        self.history = history
+        self.finished = deque()  # 按完成顺序排列的已完成任务，用于按 history 移除
+        self._job_ids = itertools.count(1)
+        self._wakeup = asyncio.Event()  # 有新任务、编码位置或预留空间被释放时置位
+        self._stopping = False
+
+    async def submit(self, pairs, infos=None):
+        """探测并加入任务，返回对应的 MergeJob 列表；同一视频已在等待或处理中时返回已有任务
+
+        infos 为调用方已探测的结果（与 pairs 对应，probe_job），省略时在此探测
+        """
+        active = {job.video_path: job for job in self.jobs if job.success is None}
+        new_pairs = [(video_path, subtitle_paths) for video_path, subtitle_paths in pairs if video_path not in active]
+        probed = dict(zip((video_path for video_path, _ in pairs), infos or ()))
+
+        async def probe(video_path):
+            return probed[video_path] if video_path in probed else await probe_job(video_path)
+
+        infos = await asyncio.gather(*(probe(video_path) for video_path, _ in new_pairs))
+        footprints = await asyncio.gather(*(
+            asyncio.to_thread(job_footprint, video_path, info, self.options)
+            for (video_path, _), info in zip(new_pairs, infos)
+        ))
+        added = {}
+        for (video_path, subtitle_paths), info, (device, output_size) in zip(new_pairs, infos, footprints):
+            job = MergeJob(
+                str(next(self._job_ids)), video_path, list(subtitle_paths), info,
+                self.dashboard.add(video_path.name, info.get("duration") or 0.0), device, output_size
+            )
+            self.jobs.append(job)
+            self.pending.append(job)
+            added[video_path] = job
+        if added:
+            self._wakeup.set()
+        return [active.get(video_path) or added[video_path] for video_path, _ in pairs]
+
+    def stop(self):
+        """服务模式：不再领取新任务，处理中的任务完成后 run() 返回"""
+        self._stopping = True
+        self._wakeup.set()
+
+    def output_cache_keys(self, key):
+        """各输出文件的缓存键：多规格时每个规格一个"""
+        if self.options.renditions:
+            return [rendition_cache_key(key, name) for name, _, _ in self.options.renditions]
+        return [key]
+
+    def release(self, key):
+        event = self.inflight.pop(key, None)
+        if event is not None:
+            event.set()
+
+    def finish(self, job, success):
+        job.progress.finish(success)
+        job.success = success
+        if job.admitted:
+            job.admitted = False
+            self.admission.release_space(job.device, job.output_size)
+            self._wakeup.set()
+        if self.history is not None:
+            self.finished.append(job)
+            while len(self.finished) > self.history:
+                expired = self.finished.popleft()
+                self.jobs.remove(expired)
+                self.dashboard.jobs.remove(expired.progress)
+
+    def choose_presets(self, job):
+        """按校准结果为任务选择各编码器的预设：满足目标速度或截止时间的最慢预设"""
+        options = self.options
+        if not (options.target_speed or options.deadline) or not job.info:
+            return {}
+        remaining_content = sum(
+            item.progress.duration * (1 - item.progress.fraction)
+            for item in self.jobs if item.success is None and item.progress.state != "校验中"
+        )
+        required = required_speed(options.target_speed, options.deadline, options.jobs, remaining_content)
+        presets = {}
+        for encoder in (["h264_nvenc", "libx264"] if options.use_nvenc else ["libx264"]):
+            preset, speed = choose_preset(preset_speeds(self.calibration, encoder, job.info), encoder, required)
+            presets[encoder] = preset
+            if encoder != self.encoder:
+                continue
+            if speed is None:
+                self.logger.warning(f"{encoder} 在 {job.info['height']}p 下没有校准记录，{job.video_path.name} 使用默认预设 {preset}")
+            elif speed < required:
+                self.logger.warning(f"{job.video_path.name} 需要 {required:.2f}x，最快的预设 {preset} 只有 {speed:.2f}x")
+            else:
+                self.logger.info(f"{job.video_path.name} 选用预设 {preset}（需要 {required:.2f}x，预计 {speed:.2f}x）")
+        return presets
+
+    def set_limit(self, limit):
+        """调整同时编码的任务数：超出的任务（最后开始的优先）暂停，提高时先恢复暂停的任务"""
+        self.limit = limit
+        active = sorted((job for job in self.jobs if job.progress.state == "编码中"),
+                        key=lambda job: job.progress.attempt_started or 0.0)
+        paused = [job for job in self.jobs if job.progress.state == "暂停"]
+        for job in reversed(active[limit:]):
+            if job.progress.pause():
+                self.logger.info(f"暂停 {job.video_path.name}")
+        for job in paused[:max(0, limit - len(active))]:
+            job.progress.resume()
+            self.logger.info(f"恢复 {job.video_path.name}")
+        self._wakeup.set()
+
+    def admit_next(self):
+        """按 LPT 顺序选出第一个所在设备有空位且空间足够的任务，没有时返回 None
+
+        空间不足且同设备没有处理中任务可等的任务直接判为失败，不影响其他设备上的任务
+        """
+        self.admission.begin_round()
+        for job in sorted(self.pending, key=lambda item: estimate_job_cost(item.info, self.encoder, self.stats), reverse=True):
+            decision = self.admission.check(job.device, job.video_path.parent, job.output_size)
+            if decision == "wait":
+                continue
+            self.pending.remove(job)
+            if decision == "reject":
+                self.logger.error(
+                    f"{job.video_path.name} 所在磁盘剩余空间不足（预计输出 {job.output_size / (1 << 20):.0f} MB），跳过"
+                )
+                self.finish(job, False)
+                continue
+            self.admission.acquire(job.device, job.output_size)
+            job.admitted = True
+            return job
+        return None
+
+    async def verify_and_finalize(self, job, output_paths, store_key=None):
+        options, logger = self.options, self.logger
+        async with self.verify_semaphore:
+            success = True
+            if options.verify:
+                job.progress.state = "校验中"
+                _, soft_paths = plan_subtitle_tracks(job.video_path, job.subtitle_paths, options.burn)
+                for output_path in output_paths:
+                    success = success and await verify_output(
+                        job.video_path, output_path, logger, options.verify_sample, len(soft_paths)
+                    )
+            if store_key:
+                if success:
+                    for output_key, output_path in zip(self.output_cache_keys(store_key), output_paths):
+                        await asyncio.to_thread(
+                            cache_store, options.cache_dir, output_key, output_path, job.video_path.name, logger
+                        )
+                self.release(store_key)
+            if success:
+                success = await asyncio.to_thread(
+                    finalize_output, job.video_path, job.subtitle_paths, output_paths, logger
+                )
+            self.finish(job, success)
+
+    def start_verify(self, job, output_paths, store_key=None):
+        task = asyncio.create_task(self.verify_and_finalize(job, output_paths, store_key))
+        self.verify_tasks.add(task)
+        task.add_done_callback(self.verify_tasks.discard)
+
+    async def worker(self, until_idle):
+        while True:
+            if self._stopping:
+                return  # 等待中的任务保持“等待”，不再领取
+            if not self.pending:
+                if until_idle:
+                    return
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            job = self.admit_next() if self.encoding < self.limit else None
+            if job is None:
+                # 负载调节降低了并发，或等待中的任务所在设备都没有空位或空间，等待其他任务释放
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            self.encoding += 1
+            try:
+                await self.process(job, until_idle)
+            finally:
+                self.encoding -= 1
+                self.admission.release_slot(job.device)
+                self._wakeup.set()
+
+    async def process(self, job, until_idle):
+        """编码一个已获准开始的任务（或取用缓存），随后交给校验并发池"""
+        options, logger, stats = self.options, self.logger, self.stats
+        video_path, subtitle_paths, info, progress = job.video_path, job.subtitle_paths, job.info, job.progress
+        logger.debug(f"调度 {video_path.name}，预计编码耗时 {format_seconds(estimate_job_cost(info, self.encoder, stats))}")
+
+        output_paths = output_targets(video_path, options)
+        job.presets = self.choose_presets(job)
+        key = None
+        if options.cache_dir:
+            try:
+                settings = {**self.settings, "presets": job.presets} if job.presets else self.settings
+                key = await asyncio.to_thread(output_cache_key, video_path, subtitle_paths, settings)
+                if key in self.inflight:
+                    logger.info(f"{video_path.name} 与正在处理的任务内容相同，等待其完成后复用")
+                    await self.inflight[key].wait()
+                cached = [cache_lookup(options.cache_dir, output_key) for output_key in self.output_cache_keys(key)]
+                if all(path is not None for path in cached):
+                    for cached_path, output_path in zip(cached, output_paths):
+                        method = await asyncio.to_thread(materialize_file, cached_path, output_path)
+                    logger.info(f"命中缓存: {video_path.name}（{method}），跳过编码")
+                    self.start_verify(job, output_paths)
+                    return
+                self.inflight[key] = asyncio.Event()
+            except Exception as e:
+                logger.warning(f"查询 {video_path.name} 的缓存失败: {str(e)}")
+                key = None
+
+        try:
+            success = await asyncio.wait_for(
+                embed_subtitles(video_path, subtitle_paths, output_paths, logger, options, progress, job.presets, info),
+                options.timeout
+            )
+        except asyncio.TimeoutError:
+            logger.error(f"处理 {video_path.name} 超过 {options.timeout} 秒，已终止")
+            success = False
+        if not success:
+            self.finish(job, False)
+            self.release(key)
+            return
+
+        # 只用默认预设下单规格完整重编码的结果修正估计（智能渲染、多规格输出和调整过的预设不代表默认吞吐量）
+        used_encoder = None if options.renditions or job.presets else next(
+            (name for name in DEFAULT_PIXEL_RATES if name in progress.encoder_desc), None
+        )
+        elapsed = time.monotonic() - progress.attempt_started
+        if used_encoder and info and elapsed > 0:
+            record_encode_speed(stats, used_encoder, info, info["duration"] * info["frame_rate"] / elapsed)
+            if not until_idle:
+                save_encode_stats(stats, logger)
+
+        self.start_verify(job, output_paths, key)
+
+    async def run(self, until_idle=True):
+        """运行 options.jobs 个编码协程；until_idle 为 True 时所有任务完成后返回，否则持续运行直到 stop()"""
+        console_handlers = [handler for handler in self.logger.handlers if isinstance(handler, DashboardLogHandler)]
+        for handler in console_handlers:
+            handler.dashboard = self.dashboard
+        dashboard_task = asyncio.create_task(self.dashboard.run())
+        governor_task = None
+        if self.options.throttle:
+            governor = LoadGovernor(self, self.options.throttle_cpu, self.options.throttle_memory, self.options.peak_hours)
+            governor_task = asyncio.create_task(governor.run())
+        try:
+            await asyncio.gather(*(self.worker(until_idle) for _ in range(max(1, self.options.jobs))))
+            while self.verify_tasks:
+                await asyncio.gather(*self.verify_tasks)
+        finally:
+            if governor_task is not None:
+                governor_task.cancel()
+            for task in list(self.verify_tasks):
+                task.cancel()
+            self.dashboard.stop()
+            await dashboard_task
+            for handler in console_handlers:
+                handler.dashboard = None
+            save_encode_stats(self.stats, self.logger)
+
+async def run_batch(pairs, logger, options, infos=None):
+    """在同一个事件循环中并发处理所有文件对，最多同时运行 options.jobs 个 FFmpeg，返回每个任务是否成功
+
+    infos 为已探测的结果（与 pairs 对应），省略时由调度器探测
+    """
+    runner = JobRunner(logger, options)
+    jobs = await runner.submit(pairs, infos)
+    await runner.run()
+    return [job.success is True for job in jobs]
+
+def run_worker(queue_dir, logger, options, lease_timeout=QUEUE_LEASE_TIMEOUT, max_attempts=QUEUE_MAX_ATTEMPTS):
+    """工作进程：循环领取并处理共享队列中的任务，队列清空后退出，返回处理的任务数"""
+    return asyncio.run(work_queue(queue_dir, logger, options, lease_timeout, max_attempts))
+
+async def work_queue(queue_dir, logger, options, lease_timeout, max_attempts):
+    """最多同时领取 options.jobs 个任务，交给同一个常驻的 JobRunner 调度，并定期为处理中的任务续约"""
+    queue_dir = init_job_queue(queue_dir)
+    worker_id = f"{socket.gethostname()}-{os.getpid()}"
+    logger.info(f"工作进程 {worker_id} 启动，队列目录: {queue_dir}，同时处理 {max(1, options.jobs)} 个任务")
+    runner = JobRunner(logger, options, history=max(1, options.jobs))
+    runner_task = asyncio.create_task(runner.run(until_idle=False))
+    active = {}  # 队列任务 ID -> (队列任务, MergeJob)
+    lost = set()  # 租约已被回收的任务 ID
+    processed = 0
+    last_renew = time.monotonic()
+    next_claim = 0.0  # 队列中没有可领取的任务时，下次尝试领取的时间
+
+    try:
+        while not runner_task.done():
+            for job_id, (job, merge_job) in list(active.items()):
+                if merge_job.success is not None:
+                    await asyncio.to_thread(complete_job, queue_dir, job, merge_job.success, logger)
+                    del active[job_id]
+                    lost.discard(job_id)
+                    processed += 1
+                    next_claim = 0.0
+
+            if time.monotonic() - last_renew >= lease_timeout / 4:
+                last_renew = time.monotonic()
+                for job_id, (job, _) in active.items():
+                    if job_id in lost:
+                        continue
+                    try:
+                        await asyncio.to_thread(renew_lease, queue_dir, job_id, worker_id)
+                    except FileNotFoundError:
+                        logger.warning(f"任务 {job['video']} 的租约已被回收")
+                        lost.add(job_id)
+                    except Exception as e:
+                        logger.warning(f"续约 {job['video']} 失败: {str(e)}")
+
+            if len(active) < max(1, options.jobs) and time.monotonic() >= next_claim:
+                # 每个工作进程都兼任回收者，不需要单独的协调进程常驻
+                await asyncio.to_thread(requeue_expired_jobs, queue_dir, logger, lease_timeout, max_attempts)
+                while len(active) < max(1, options.jobs):
+                    job = await asyncio.to_thread(claim_job, queue_dir, worker_id)
+                    if job is None:
+                        next_claim = time.monotonic() + QUEUE_POLL_INTERVAL
+                        break
+                    logger.info(f"{worker_id} 领取任务: {job['video']} (第 {job['attempts']} 次尝试)")
+                    # 兼容旧版本写入的单字幕任务
+                    subtitle_paths = [Path(path) for path in job.get("subtitles") or [job["subtitle"]]]
+                    merge_job, = await runner.submit([(Path(job["video"]), subtitle_paths)])
+                    active[job["id"]] = (job, merge_job)
+                if not active and not any((queue_dir / "pending").glob("*.json")) \
+                        and not any((queue_dir / "claimed").glob("*.json")):
+                    break
+
+            await asyncio.sleep(QUEUE_CHECK_INTERVAL)
+    finally:
+        runner.stop()
+        await runner_task
+
+    logger.info(f"工作进程 {worker_id} 退出，共处理 {processed} 个任务")
+    return processed
+
+def run(args):
+    """merge 子命令入口：处理目录及其子目录中的所有匹配文件"""
+    log_path = None
+    
+    try:
+        if args.worker and not args.queue:
+            raise ValueError("--worker 需要同时指定 --queue")
+
+        # 获取目录（工作进程的日志写入队列目录）
+        if args.worker:
+            target_directory = init_job_queue(args.queue)
+        elif args.directory:
+            target_directory = args.directory
+        elif sys.stdin.isatty():
+            target_directory = input("请输入要处理的目录路径: ").strip()
+        else:
+            raise ValueError("未指定要处理的目录")
+        
+        # 验证目录
+        target_directory = Path(target_directory).resolve()
+        if not target_directory.is_dir():
+            raise ValueError(f"目录 {target_directory} 不存在")
+        
+        # 初始化日志
+        if args.worker:
+            _, log_path = setup_logging(target_directory, f"_{socket.gethostname()}-{os.getpid()}")
+        else:
+            _, log_path = setup_logging(target_directory)
+            logger.info(f"开始处理目录: {target_directory}")
+        
+        # 检测 NVENC 支持
+        options = MergeOptions.from_args(args, detect_nvenc_support(logger))
+
+        if args.worker:
+            run_worker(target_directory, logger, options, args.lease_timeout, args.max_attempts)
+            return 0
+        
+        snapshot = scan_tree(target_directory, rescan=args.rescan)
+        logger.info(f"扫描 {len(snapshot.dirs)} 个目录，其中 {len(snapshot.changed)} 个为新增或有改动")
+        pairs = find_matching_files(target_directory, snapshot)
+        if not pairs:
+            logger.warning("未找到任何匹配的 SRT 和 MP4 文件对")
+            return 0
+
+        if args.queue:
+            enqueue_jobs(args.queue, pairs, logger)
+            return 0
+
+        # 按目标速度或截止时间选择预设时，先在空闲的机器上校准本批次中尚未校准的分辨率，探测结果交给调度器复用
+        infos = None
+        if options.target_speed or options.deadline:
+            encoder = "h264_nvenc" if options.use_nvenc else "libx264"
+            infos = asyncio.run(calibrate_missing(pairs, [encoder], logger))
+
+        # 在单个事件循环中调度所有 FFmpeg 子进程
+        results = asyncio.run(run_batch(pairs, logger, options, infos))
+        if args.cache_dir:
+            evict_cache(args.cache_dir, logger, args.cache_max_size, args.cache_max_age)
+        logger.info(f"成功 {sum(results)} 个，失败 {len(results) - sum(results)} 个")
+        return 0 if all(results) else 1
+            
+    except Exception as e:
+        logger.error(f"程序运行出错: {str(e)}")
+        return 1
+    finally:
+        logger.info("处理完成")
+        # 关闭日志处理器
+        for handler in logger.handlers[:]:
+            handler.close()
+            logger.removeHandler(handler)
+        # 删除日志文件
+        if log_path and log_path.exists():
+            try:
+                log_path.unlink()
+                logger.info(f"删除日志文件: {log_path.name}")
+            except Exception as e:
+                logger.error(f"删除日志文件 {log_path.name} 失败: {str(e)}")
@@ -0,0 +1,216 @@
+"""preview 子命令：在字幕密集处并行渲染截图或短片段，并拼成一张预览图，用于快速检查字幕样式
+
+每个视频按字幕出现的密度选出若干个互不重叠的时间窗口，每个窗口用输入端 -ss 快速定位，
+加 -copyts 保留原始时间戳，使 subtitles 滤镜按原时间轴渲染对应的字幕。
+所有截图（以及可选的短片段）并行渲染，最后用 tile 滤镜拼成一张预览图，
+调整 --style 后整季的效果几秒钟即可看到，不需要完整编码。
+"""
+import os
+import sys
+import math
+import shutil
+import asyncio
+import logging
+import tempfile
+from pathlib import Path
+
+from .merger import find_matching_files
+from .scan import scan_directory, scan_tree
+from .subtitles import SUBTITLE_STYLE, build_subtitle_filter, merge_style, parse_srt_cues, plan_subtitle_tracks
+from .supervisor import format_seconds, run_ffmpeg_async
+
+logger = logging.getLogger("vsm")
+
+# 统计字幕密度的窗口长度（秒）；渲染短片段时使用片段长度
+PREVIEW_WINDOW = 10.0
+# 短片段的编码参数：只用于查看效果，速度优先
+PREVIEW_ENCODER_ARGS = ["-c:v", "libx264", "-preset", "ultrafast", "-crf", "28", "-c:a", "aac", "-b:a", "96k"]
+# 预览图中每格的尺寸
+SHEET_TILE_SIZE = (480, 270)
+# 单次渲染的最长秒数
+PREVIEW_TIMEOUT = 120
+
+def pick_preview_points(cues, count, window):
+    """在字幕最密集处选出最多 count 个互不重叠的窗口，返回按时间排序的截图时刻（秒）
+
+    以每条字幕的开始时间作为候选窗口起点，按窗口内开始的字幕条数排序；
+    相邻窗口至少间隔字幕总跨度的 1/(2*count)，避免都集中在同一个场景。
+    截图时刻取窗口第一条字幕的中点，保证画面上有字幕
+    """
+    if not cues or count <= 0:
+        return []
+    span = cues[-1][1] - cues[0][0]
+    spacing = max(window, span / (2 * count))
+
+    candidates = []
+    end_index = 0
+    for index, (start, end) in enumerate(cues):
+        while end_index < len(cues) and cues[end_index][0] < start + window:
+            end_index += 1
+        candidates.append((end_index - index, start, (start + end) / 2))
+    candidates.sort(key=lambda item: (-item[0], item[1]))
+
+    picked = []
+    for _, start, moment in candidates:
+        if all(abs(start - other) >= spacing for other, _ in picked):
+            picked.append((start, moment))
+            if len(picked) == count:
+                break
+    return sorted(moment for _, moment in picked)
+
+def collect_videos(paths, burn, rescan=False):
+    """把命令行给出的目录和视频文件解析为 (视频, 烧录的字幕) 列表"""
+    pairs = []
+    for path in paths:
+        path = Path(path).resolve()
+        if path.is_dir():
+            pairs.extend(find_matching_files(path, scan_tree(path, rescan=rescan)))
+        elif path.is_file():
+            matched = dict(find_matching_files(path.parent, scan_directory(path.parent)))
+            if path in matched:
+                pairs.append((path, matched[path]))
+            else:
+                logger.warning(f"未找到与 {path.name} 匹配的字幕")
+        else:
+            logger.warning(f"路径 {path} 不存在")
+
+    videos = []
+    for video_path, subtitle_paths in sorted(pairs):
+        burn_path, _ = plan_subtitle_tracks(video_path, subtitle_paths, burn)
+        if burn_path is None:
+            logger.warning(f"{video_path.name} 没有可烧录的 {burn} 字幕，跳过")
+            continue
+        videos.append((video_path, burn_path))
+    return videos
+
+def preview_label(video_path, moment):
+    return f"{video_path.stem}_{format_seconds(moment).replace(':', '-')}"
+
+def still_command(video_path, subtitle_path, style, moment, still_path, thumb_path):
+    """截取一帧：原分辨率截图，另输出一张缩放到预览图格子尺寸的缩略图"""
+    width, height = SHEET_TILE_SIZE
+    graph = (
+        f"[0:v]{build_subtitle_filter(subtitle_path, style)},split=2[full][thumb];"
+        f"[thumb]scale={width}:{height}:force_original_aspect_ratio=decrease,"
+        f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2[small]"
+    )
+    return [
+        "ffmpeg", "-ss", f"{moment:.3f}", "-copyts", "-i", str(video_path),
+        "-filter_complex", graph,
+        "-map", "[full]", "-frames:v", "1", "-q:v", "2", "-y", str(still_path),
+        "-map", "[small]", "-frames:v", "1", "-q:v", "3", "-y", str(thumb_path),
+    ]
+
+def clip_command(video_path, subtitle_path, style, start, length, clip_path):
+    """渲染一个烧录字幕的短片段"""
+    return [
+        "ffmpeg", "-ss", f"{start:.3f}", "-copyts", "-i", str(video_path), "-t", f"{length:.3f}",
+        "-vf", build_subtitle_filter(subtitle_path, style), *PREVIEW_ENCODER_ARGS,
+        "-y", str(clip_path),
+    ]
+
+def sheet_command(pattern, columns, rows, sheet_path):
+    """把按序号命名的缩略图拼成一张预览图"""
+    return [
+        "ffmpeg", "-framerate", "1", "-start_number", "0", "-i", str(pattern),
+        "-vf", f"tile={columns}x{rows}:padding=4:margin=4", "-frames:v", "1", "-q:v", "3",
+        "-y", str(sheet_path),
+    ]
+
+async def render_previews(videos, count, clip_length, style, output_dir, thumb_dir, jobs):
+    """并行渲染所有截图与短片段，返回 (按视频、时间排序的成功项 [(标签, 缩略图路径), ...], 预览位置总数)"""
+    semaphore = asyncio.Semaphore(max(1, jobs))
+    (output_dir / "stills").mkdir(exist_ok=True)
+    if clip_length:
+        (output_dir / "clips").mkdir(exist_ok=True)
+
+    async def render(cmd, desc):
+        async with semaphore:
+            return await run_ffmpeg_async(cmd, logger, desc, timeout=PREVIEW_TIMEOUT)
+
+    async def render_point(video_path, subtitle_path, moment):
+        label = preview_label(video_path, moment)
+        thumb_path = thumb_dir / f"{label}.jpg"
+        tasks = [render(
+            still_command(video_path, subtitle_path, style, moment, output_dir / "stills" / f"{label}.jpg", thumb_path),
+            f"截图 {label} "
+        )]
+        if clip_length:
+            # 片段从截图时刻前 1/3 处开始，使截到的字幕出现在片段中间
+            start = max(0.0, moment - clip_length / 3)
+            tasks.append(render(
+                clip_command(video_path, subtitle_path, style, start, clip_length, output_dir / "clips" / f"{label}.mp4"),
+                f"片段 {label} "
+            ))
+        results = await asyncio.gather(*tasks)
+        return label, thumb_path if results[0] and thumb_path.exists() else None
+
+    points = []
+    for video_path, subtitle_path in videos:
+        try:
+            cues = await asyncio.to_thread(parse_srt_cues, subtitle_path)
+        except Exception as e:
+            logger.error(f"读取字幕 {subtitle_path.name} 失败: {str(e)}")
+            continue
+        moments = pick_preview_points(cues, count, clip_length or PREVIEW_WINDOW)
+        logger.info(f"{video_path.name}: {', '.join(format_seconds(moment) for moment in moments) or '没有字幕'}")
+        points.extend((video_path, subtitle_path, moment) for moment in moments)
+
+    rendered = await asyncio.gather(*(render_point(*point) for point in points))
+    return [(label, thumb) for label, thumb in rendered if thumb is not None], len(points)
+
+async def build_contact_sheet(thumbs, thumb_dir, columns, output_dir):
+    """拼接预览图，并写出每格对应的视频与时刻"""
+    sequence_dir = thumb_dir / "sequence"
+    sequence_dir.mkdir()
+    for index, (_, thumb) in enumerate(thumbs):
+        shutil.copyfile(thumb, sequence_dir / f"{index:05d}.jpg")
+    columns = min(columns, len(thumbs))
+    rows = math.ceil(len(thumbs) / columns)
+    sheet_path = output_dir / "contact_sheet.jpg"
+    if not await run_ffmpeg_async(sheet_command(sequence_dir / "%05d.jpg", columns, rows, sheet_path),
+                                  logger, "拼接预览图", timeout=PREVIEW_TIMEOUT):
+        return None
+    index_lines = [f"{index // columns + 1}-{index % columns + 1}\t{label}" for index, (label, _) in enumerate(thumbs)]
+    (output_dir / "contact_sheet.txt").write_text("行-列\t视频_时刻\n" + "\n".join(index_lines) + "\n", encoding='utf-8')
+    return sheet_path
+
+async def preview(args, style, output_dir):
+    videos = await asyncio.to_thread(collect_videos, args.paths, args.burn, args.rescan)
+    if not videos:
+        logger.warning("未找到任何可预览的视频")
+        return 1
+    thumb_dir = Path(tempfile.mkdtemp(prefix=".thumbs_", dir=output_dir))
+    try:
+        thumbs, total = await render_previews(
+            videos, args.count, args.clip, style, output_dir, thumb_dir, args.jobs or os.cpu_count() or 1
+        )
+        if not thumbs:
+            logger.error("所有截图均渲染失败")
+            return 1
+        sheet_path = await build_contact_sheet(thumbs, thumb_dir, args.count, output_dir)
+    finally:
+        shutil.rmtree(thumb_dir, ignore_errors=True)
+    logger.info(f"渲染 {len(thumbs)}/{total} 个截图" + (f"，预览图: {sheet_path}" if sheet_path else ""))
+    return 0 if sheet_path and len(thumbs) == total else 1
+
+def run(args):
+    """preview 子命令入口"""
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    try:
+        style = merge_style(args.style) if args.style else SUBTITLE_STYLE
+        if args.style:
+            logger.info(f"预览样式: {style}")
+        output_dir = Path(args.output_dir).resolve()
+        output_dir.mkdir(parents=True, exist_ok=True)
+        return asyncio.run(preview(args, style, output_dir))
+    except Exception as e:
+        logger.error(f"预览出错: {str(e)}")
+        return 1
+    finally:
+        logger.removeHandler(handler)
@@ -0,0 +1,364 @@
+"""rename-srt 子命令：按序号批量重命名字幕文件，并记录日志以便恢复"""
+import os
+import re
+import sys
+import csv
+
+from .scan import scan_tree
+
+# 重命名日志文件名（restore 子命令据此恢复）
+RENAME_LOG_NAME = "rename_log_srt.txt"
+
+# 罗马数字到阿拉伯数字的映射
+roman_to_arabic = {
+    'I': 1, 'II': 2, 'III': 3, 'IV': 4, 'V': 5,
+    'VI': 6, 'VII': 7, 'VIII': 8, 'IX': 9, 'X': 10
+}
+
+# 中文大写数字到阿拉伯数字的映射
+chinese_to_arabic = {
+    '一': 1, '二': 2, '三': 3, '四': 4, '五': 5,
+    '六': 6, '七': 7, '八': 8, '九': 9, '十': 10
+}
+
+def convert_to_arabic(number):
+    """将罗马数字或中文大写数字转换为阿拉伯数字"""
+    try:
+        if number.upper() in roman_to_arabic:
+            return str(roman_to_arabic[number.upper()])
+        if number in chinese_to_arabic:
+            return str(chinese_to_arabic[number])
+        return number  # 如果是阿拉伯数字，直接返回
+    except Exception as e:
+        print(f"转换数字 {number} 时出错：{e}")
+        return None
+
+def get_next_available_number(prefix, folder_path, used_numbers):
+    """获取下一个可用的序号"""
+    number = 1
+    while True:
+        if number not in used_numbers:
+            new_srt_path = os.path.join(folder_path, f"{prefix}{number}.srt")
+            if not os.path.exists(new_srt_path):
+                return number
+        number += 1
+
+def save_rename_log(folder_path, old_name, new_name):
+    """保存重命名日志到文件"""
+    log_file = os.path.join(folder_path, RENAME_LOG_NAME)
+    try:
+        with open(log_file, 'a', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow([folder_path, old_name, new_name])
+        print(f"已记录重命名日志：{old_name} -> {new_name}")
+    except Exception as e:
+        print(f"保存重命名日志失败：{e}")
+
+def restore_original_names(folder_path):
+    """根据日志文件恢复原始文件名"""
+    log_file = os.path.join(folder_path, RENAME_LOG_NAME)
+    if not os.path.exists(log_file):
+        print(f"错误：在 {folder_path} 中未找到重命名日志文件，无法恢复")
+        return
+
+    try:
+        with open(log_file, 'r', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            for row in reader:
+                if len(row) != 3:
+                    print(f"跳过无效日志记录：{row}")
+                    continue
+                _, old_name, new_name = row
+                old_path = os.path.join(folder_path, old_name)
+                new_path = os.path.join(folder_path, new_name)
+                if os.path.exists(new_path):
+                    os.rename(new_path, old_path)
+                    print(f"已将 {new_path} 恢复为 {old_name}")
+                else:
+                    print(f"错误：文件 {new_path} 不存在，无法恢复")
+        # 删除日志文件（可选，建议保留以便多次恢复）
+        # os.remove(log_file)
+        print(f"目录 {folder_path} 的文件已恢复")
+    except Exception as e:
+        print(f"恢复目录 {folder_path} 时出错：{e}")
+
+def process_directory(folder_path, new_prefix, files=None):
+    """处理单个目录中的srt文件"""
+    try:
+        # 收集所有srt文件
+        # 优先使用扫描快照中的文件列表，避免再次列目录
+        files = list(files) if files is not None else os.listdir(folder_path)
+        srt_files = [f for f in files if f.lower().endswith('.srt')]
+
+        # 检测已存在的目标文件名中的序号
+        used_numbers = set()
+        for filename in files:
+            match = re.match(rf"{re.escape(new_prefix)}(\d+)\.srt", filename, re.IGNORECASE)
+            if match:
+                used_numbers.add(int(match.group(1)))
+            match_r = re.match(rf"R{re.escape(new_prefix)}(\d+)\.srt", filename, re.IGNORECASE)
+            if match_r:
+                used_numbers.add(int(match_r.group(1)))
+
+        # 检查是否所有文件都包含顺序的阿拉伯数字（优先匹配“第X話”或“第X”）
+        all_arabic = True
+        arabic_numbers = []
+        for filename in srt_files:
+            if re.match(rf"({re.escape(new_prefix)}|R{re.escape(new_prefix)})\d+\.srt", filename, re.IGNORECASE):
+                print(f"跳过已符合目标格式的文件：{os.path.join(folder_path, filename)}")
+                continue
+            # 优先匹配“第X話”或“第X”
+            match_episode = re.search(r'第(\d+)話', filename)
+            if match_episode:
+                number = int(match_episode.group(1))
+                arabic_numbers.append((filename, number))
+                print(f"文件 {filename}：检测到 第{number}話，提取序号 {number}")
+                continue
+            match_di = re.search(r'第(\d+)', filename)
+            if match_di:
+                number = int(match_di.group(1))
+                arabic_numbers.append((filename, number))
+                print(f"文件 {filename}：检测到 第{number}，提取序号 {number}")
+                continue
+            # 其他数字提取方式
+            match_number = re.search(r'(\d+)', filename)
+            if match_number:
+                number = int(match_number.group(1))
+                arabic_numbers.append((filename, number))
+                print(f"文件 {filename}：检测到阿拉伯数字 {number}")
+            else:
+                all_arabic = False
+                print(f"文件 {filename}：未检测到阿拉伯数字，退出阿拉伯数字优先模式")
+                break
+
+        # 如果所有文件都包含阿拉伯数字，按数字排序并重命名
+        if all_arabic and arabic_numbers:
+            arabic_numbers.sort(key=lambda x: x[1])
+            for srt_filename, original_number in arabic_numbers:
+                try:
+                    new_number = get_next_available_number(new_prefix, folder_path, used_numbers)
+                    used_numbers.add(new_number)
+                    new_basename = f"{new_prefix}{new_number}"
+                    old_srt_path = os.path.join(folder_path, srt_filename)
+                    new_srt_path = os.path.join(folder_path, f"{new_basename}.srt")
+                    os.rename(old_srt_path, new_srt_path)
+                    print(f"已将 {old_srt_path} 重命名为 {new_basename}.srt")
+                    save_rename_log(folder_path, srt_filename, f"{new_basename}.srt")
+                except Exception as e:
+                    print(f"错误：无法重命名 {old_srt_path}，原因：{e}")
+                    continue
+            return
+
+        # 如果不全包含阿拉伯数字，回退到原逻辑
+        file_numbers = []
+        max_number = 0
+        for filename in srt_files:
+            try:
+                if re.match(rf"({re.escape(new_prefix)}|R{re.escape(new_prefix)})\d+\.srt", filename, re.IGNORECASE):
+                    print(f"跳过已符合目标格式的文件：{os.path.join(folder_path, filename)}")
+                    continue
+                match_episode = re.search(r'第(\d+)話', filename)
+                if match_episode:
+                    number = int(match_episode.group(1))
+                    file_numbers.append((filename, number))
+                    max_number = max(max_number, number)
+                    print(f"文件 {filename}：清理为 第{number}，提取序号 {number}")
+                    continue
+                match_di = re.search(r'第(\d+)', filename)
+                if match_di:
+                    number = int(match_di.group(1))
+                    file_numbers.append((filename, number))
+                    max_number = max(max_number, number)
+                    print(f"文件 {filename}：清理为 第{number}，提取序号 {number}")
+                    continue
+                if '最終話' in filename:
+                    number = max_number + 1
+                    file_numbers.append((filename, number))
+                    max_number = max(max_number, number)
+                    print(f"文件 {filename}：识别为最終話，分配序号 {number}")
+                    continue
+                match_r_number = re.search(r'R(\d+)', filename, re.IGNORECASE)
+                if match_r_number:
+                    number = int(match_r_number.group(1))
+                    file_numbers.append((filename, number))
+                    max_number = max(max_number, number)
+                    print(f"文件 {filename}：提取序号 {number}")
+                    continue
+                match_number = re.search(r'(\d+)', filename)
+                if match_number:
+                    number = int(match_number.group(1))
+                    file_numbers.append((filename, number))
+                    max_number = max(max_number, number)
+                    print(f"文件 {filename}：提取序号 {number}")
+                    continue
+                match_roman = re.search(r'[IVXLCDM]+', filename, re.IGNORECASE)
+                if match_roman:
+                    number = convert_to_arabic(match_roman.group())
+                    if number:
+                        number = int(number)
+                        file_numbers.append((filename, number))
+                        max_number = max(max_number, number)
+                        print(f"文件 {filename}：提取罗马数字 {match_roman.group()}，转换为序号 {number}")
+                    continue
+                match_chinese = re.search(r'[一二三四五六七八九十]+', filename)
+                if match_chinese:
+                    number = convert_to_arabic(match_chinese.group())
+                    if number:
+                        number = int(number)
+                        file_numbers.append((filename, number))
+                        max_number = max(max_number, number)
+                        print(f"文件 {filename}：提取中文数字 {match_chinese.group()}，转换为序号 {number}")
+                    continue
+                print(f"警告：在 {folder_path} 中，{filename} 未找到数字、罗马数字、中文数字或第X話，跳过")
+            except Exception as e:
+                print(f"处理文件 {os.path.join(folder_path, filename)} 时出错：{e}")
+                continue
+
+        file_numbers.sort(key=lambda x: x[1])
+        for srt_filename, original_number in file_numbers:
+            try:
+                new_number = get_next_available_number(new_prefix, folder_path, used_numbers)
+                used_numbers.add(new_number)
+                new_basename = f"{new_prefix}{new_number}"
+                old_srt_path = os.path.join(folder_path, srt_filename)
+                new_srt_path = os.path.join(folder_path, f"{new_basename}.srt")
+                os.rename(old_srt_path, new_srt_path)
+                print(f"已将 {old_srt_path} 重命名为 {new_basename}.srt")
+                save_rename_log(folder_path, srt_filename, f"{new_basename}.srt")
+            except Exception as e:
+                print(f"错误：无法重命名 {old_srt_path}，原因：{e}")
+                continue
+    except Exception as e:
+        print(f"处理目录 {folder_path} 时出错：{e}")
+
+def strip_suffix(folder_path, suffix, snapshot=None):
+    """递归去掉字幕文件名中的指定片段（如 .ja_2）"""
+    snapshot = snapshot or scan_tree(folder_path)
+    # 递归遍历文件夹及其子目录
+    for root, _, files in snapshot.walk():
+        # 用快照中的文件列表判断重名，并随重命名同步更新
+        existing = set(files)
+        for filename in files:
+            # 检查文件是否是srt格式
+            if filename.lower().endswith('.srt') and suffix in filename:
+                # 构建旧文件的完整路径
+                old_file_path = os.path.join(root, filename)
+                
+                # 创建新的文件名，移除指定片段
+                new_filename = filename.replace(suffix, '')
+                
+                # 构建新文件的完整路径
+                new_file_path = os.path.join(root, new_filename)
+                
+                # 检查目标文件名是否已存在
+                if new_filename in existing:
+                    print(f"警告：{new_filename} 已存在，跳过 {old_file_path}")
+                    continue
+                
+                # 重命名文件
+                try:
+                    os.rename(old_file_path, new_file_path)
+                    existing.discard(filename)
+                    existing.add(new_filename)
+                    print(f"已将 {old_file_path} 重命名为 {new_filename}")
+                except Exception as e:
+                    print(f"错误：无法重命名 {old_file_path}，原因：{e}")
+
+    print("批量重命名完成！")
+
+def rename_tree(root_folder, prefix=None, snapshot=None):
+    """遍历根目录下所有含字幕的子目录并重命名；未指定前缀时逐个目录询问"""
+    snapshot = snapshot or scan_tree(root_folder)
+    for dirpath, dirnames, files in snapshot.walk():
+        if any(f.lower().endswith('.srt') for f in files):
+            try:
+                print(f"\n发现子目录：{dirpath}")
+                new_prefix = prefix or input(f"请输入 {dirpath} 的新文件名前缀（直接按回车跳过）：").strip()
+                if not new_prefix:
+                    print(f"跳过子目录 {dirpath} 的处理")
+                    continue
+                process_directory(dirpath, new_prefix, files)
+            except Exception as e:
+                print(f"处理子目录 {dirpath} 时出错：{e}")
+                continue
+
+def restore_tree(root_folder, snapshot=None):
+    """恢复根目录下所有留有重命名日志的子目录"""
+    snapshot = snapshot or scan_tree(root_folder)
+    for dirpath, dirnames, files in snapshot.walk():
+        if RENAME_LOG_NAME in files:
+            try:
+                print(f"\n发现日志文件，恢复目录：{dirpath}")
+                restore_original_names(dirpath)
+            except Exception as e:
+                print(f"恢复子目录 {dirpath} 时出错：{e}")
+                continue
+
+def run(args):
+    """rename-srt 子命令入口"""
+    # 确保支持日语（UTF-8编码）
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+
+    root_folder = args.root or input("请输入要修改的根文件夹路径：").strip()
+    if not os.path.exists(root_folder):
+        print(f"错误：根文件夹 {root_folder} 不存在！")
+        return 1
+    if args.strip_suffix:
+        strip_suffix(root_folder, args.strip_suffix, scan_tree(root_folder, rescan=args.rescan))
+    else:
+        if args.prefix is None and not sys.stdin.isatty():
+            print("错误：非交互运行时需要通过 --prefix 指定新文件名前缀")
+            return 1
+        rename_tree(root_folder, args.prefix, scan_tree(root_folder, rescan=args.rescan))
+    print("\n操作完成！")
+    return 0
+
+def interactive():
+    """交互模式（兼容原脚本）：先选择重命名或恢复，再输入根目录"""
+    # 确保支持日语（UTF-8编码）
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+    try:
+        print("选择操作模式：")
+        print("1. 重命名文件")
+        print("2. 恢复原始文件名")
+        mode = input("请输入模式（1 或 2）：").strip()
+        
+        if mode not in ['1', '2']:
+            print("错误：无效的模式选择！")
+            input("按回车键退出...")
+            sys.exit(1)
+
+        root_folder = input("请输入要修改的根文件夹路径：").strip()
+        if not os.path.exists(root_folder):
+            print(f"错误：根文件夹 {root_folder} 不存在！")
+            input("按回车键退出...")
+            sys.exit(1)
+
+        if mode == '1':
+            rename_tree(root_folder)
+        elif mode == '2':
+            restore_tree(root_folder)
+
+        print("\n操作完成！")
+        input("按回车键退出...")
+    except Exception as e:
+        print(f"程序运行出错：{e}")
+        input("按回车键退出...")
+        sys.exit(1)
+
+def interactive_strip(suffix):
+    """交互模式（兼容原脚本）：输入目录后去掉字幕文件名中的指定片段"""
+    # 提示用户输入文件夹路径
+    folder_path = input("请输入要修改的文件夹路径：").strip()
+
+    # 检查文件夹路径是否存在
+    if not os.path.exists(folder_path):
+        print(f"错误：文件夹 {folder_path} 不存在！")
+        input("按回车键退出...")
+        sys.exit(1)
+
+    strip_suffix(folder_path, suffix)
+    # 添加手动退出确认
+    input("按回车键退出...")
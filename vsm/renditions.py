@@ -0,0 +1,33 @@
+"""多规格输出：一次解码、一次字幕渲染，split 后按多种分辨率与码率同时编码"""
+import re
+
+# 单个规格：高度（可带 p）与可选码率，如 1080p:4M、720p:2500k、480
+RENDITION_PATTERN = re.compile(r"^(\d+)p?(?::(\d+(?:\.\d+)?[kKmM]?))?$")
+
+def parse_renditions(spec):
+    """解析 '1080p:4M,720p:2M' 形式的规格，返回 [(名称, 高度, 码率或 None), ...]"""
+    renditions = []
+    for item in spec.split(","):
+        match = RENDITION_PATTERN.match(item.strip())
+        if not match:
+            raise ValueError(f"无法解析输出规格 '{item}'，应为 1080p:4M 的形式")
+        height, bitrate = match.groups()
+        renditions.append((f"{int(height)}p", int(height), bitrate))
+    names = [name for name, _, _ in renditions]
+    if len(set(names)) != len(names):
+        raise ValueError(f"输出规格重复: {spec}")
+    return renditions
+
+def rendition_output_path(video_path, name):
+    """规格输出的临时路径（R 前缀，校验通过后去掉），如 Rname.720p.mp4"""
+    return video_path.parent / f"R{video_path.stem}.{name}{video_path.suffix}"
+
+def build_rendition_graph(subtitle_filter, renditions):
+    """字幕只渲染一次，再 split 成多路并分别缩放（不放大），返回 (filter_complex, 各输出的标签)"""
+    head = f"[0:v]{subtitle_filter}," if subtitle_filter else "[0:v]"
+    branches = [f"[v{i}]" for i in range(len(renditions))]
+    labels = [f"[out{i}]" for i in range(len(renditions))]
+    graph = f"{head}split={len(renditions)}{''.join(branches)}"
+    for branch, label, (_, height, _) in zip(branches, labels, renditions):
+        graph += f";{branch}scale=-2:'min({height},ih)'{label}"
+    return graph, labels
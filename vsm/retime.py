@@ -0,0 +1,308 @@
+"""retime 子命令：批量调整 SRT 字幕时间轴（整体偏移、线性拉伸、帧率换算、锚点校正）
+
+字幕解析为开始、结束时间数组，多个文件的时间拼接成一个数组一次完成换算（安装了 NumPy 时向量化计算），
+再逐个文件流式写出。merge 子命令也可以在内存中应用同样的校正，通过管道交给 FFmpeg，不写中间文件。
+"""
+import os
+import re
+import bisect
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from fractions import Fraction
+from pathlib import Path
+
+from .scan import scan_tree
+
+# 并发读写字幕文件的线程数（网络共享上读写是延迟瓶颈）
+RETIME_IO_WORKERS = 8
+
+TIMING_PATTERN = re.compile(
+    r"^\s*(\d{1,2}):(\d{2}):(\d{2})[,.](\d{1,3})\s*-->\s*(\d{1,2}):(\d{2}):(\d{2})[,.](\d{1,3})(.*)$"
+)
+TIMESTAMP_PATTERN = re.compile(r"^(?:(\d+):)?(\d{1,2}):(\d{2})(?:[,.](\d{1,3}))?$")
+
+def parse_timestamp(value):
+    """解析 '00:01:02,500'、'01:02.5' 或秒数 '62.5'，返回秒"""
+    value = value.strip()
+    match = TIMESTAMP_PATTERN.match(value)
+    if match:
+        hours, minutes, seconds, millis = match.groups()
+        return int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds) + int((millis or "0").ljust(3, '0')) / 1000
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"无法解析时间 '{value}'") from None
+
+def parse_rate(value):
+    """解析帧率或比例：'23.976'、'24000/1001'、'25'"""
+    try:
+        rate = Fraction(value.strip())
+    except (ValueError, ZeroDivisionError):
+        raise ValueError(f"无法解析帧率 '{value}'") from None
+    if rate <= 0:
+        raise ValueError(f"帧率必须为正数: {value}")
+    return rate
+
+def parse_fps_conversion(value):
+    """解析 'SRC:DST' 形式的帧率换算，返回时间缩放系数 SRC/DST（如 23.976:25 表示 PAL 加速）"""
+    source, sep, target = value.partition(":")
+    if not sep:
+        raise ValueError(f"帧率换算应为 SRC:DST 的形式: {value}")
+    return float(parse_rate(source) / parse_rate(target))
+
+def parse_anchor(value):
+    """解析锚点 'OLD=NEW'：原字幕中 OLD 时刻的内容应出现在 NEW 时刻"""
+    old, sep, new = value.partition("=")
+    if not sep:
+        raise ValueError(f"锚点应为 OLD=NEW 的形式: {value}")
+    return parse_timestamp(old), parse_timestamp(new)
+
+@dataclass(frozen=True)
+class Retiming:
+    """时间轴校正：先按锚点分段线性映射，再乘以 scale（拉伸 × 帧率换算），最后加上 offset（秒）"""
+    offset: float = 0.0
+    scale: float = 1.0
+    anchors: tuple = ()  # ((原时间, 新时间), ...)，按原时间排序
+
+    @classmethod
+    def from_values(cls, offset=0.0, stretch=None, fps=None, anchors=()):
+        """由命令行参数构造：stretch 为比例（如 1.001 或 25/23.976），fps 为 'SRC:DST'"""
+        scale = 1.0
+        if stretch:
+            scale *= float(parse_rate(stretch))
+        if fps:
+            scale *= parse_fps_conversion(fps)
+        anchors = tuple(sorted(parse_anchor(anchor) for anchor in anchors or ()))
+        if len({old for old, _ in anchors}) != len(anchors):
+            raise ValueError("同一原时间不能有多个锚点")
+        return cls(offset=float(offset or 0.0), scale=scale, anchors=anchors)
+
+    @property
+    def is_identity(self):
+        return self.offset == 0 and self.scale == 1 and not self.anchors
+
+    def apply(self, times):
+        """换算一组时间（秒）；安装了 NumPy 时向量化计算，否则逐个计算"""
+        try:
+            import numpy as np
+        except ImportError:
+            return [self._apply_one(t) for t in times]
+        times = np.asarray(times, dtype=np.float64)
+        if self.anchors:
+            old, new = (np.array(column, dtype=np.float64) for column in zip(*self.anchors))
+            if len(old) == 1:
+                times = times + (new[0] - old[0])
+            else:
+                mapped = np.interp(times, old, new)
+                # 锚点范围之外沿首尾两段的斜率外推
+                before, after = times < old[0], times > old[-1]
+                mapped[before] = new[0] + (times[before] - old[0]) * (new[1] - new[0]) / (old[1] - old[0])
+                mapped[after] = new[-1] + (times[after] - old[-1]) * (new[-1] - new[-2]) / (old[-1] - old[-2])
+                times = mapped
+        return times * self.scale + self.offset
+
+    def _apply_one(self, t):
+        anchors = self.anchors
+        if len(anchors) == 1:
+            t += anchors[0][1] - anchors[0][0]
+        elif anchors:
+            i = min(max(bisect.bisect_right([old for old, _ in anchors], t), 1), len(anchors) - 1)
+            (old0, new0), (old1, new1) = anchors[i - 1], anchors[i]
+            t = new0 + (t - old0) * (new1 - new0) / (old1 - old0)
+        return t * self.scale + self.offset
+
+def parse_srt(subtitle_path):
+    """解析 SRT，返回 (开始时间列表, 结束时间列表, 时间行尾部（位置信息等）列表, 文本列表)，时间单位为秒"""
+    starts, ends, extras, texts = [], [], [], []
+    text_lines = None
+    content = Path(subtitle_path).read_text(encoding='utf-8-sig', errors='replace')
+    for line in content.splitlines():
+        match = TIMING_PATTERN.match(line)
+        if match:
+            if text_lines is not None:
+                texts.append("\n".join(text_lines).strip("\n"))
+            h1, m1, s1, ms1, h2, m2, s2, ms2, extra = match.groups()
+            starts.append(int(h1) * 3600 + int(m1) * 60 + int(s1) + int(ms1.ljust(3, '0')) / 1000)
+            ends.append(int(h2) * 3600 + int(m2) * 60 + int(s2) + int(ms2.ljust(3, '0')) / 1000)
+            extras.append(extra.rstrip())
+            text_lines = []
+        elif text_lines is not None:
+            text_lines.append(line)
+    if text_lines is not None:
+        texts.append("\n".join(text_lines).strip("\n"))
+    # 去掉下一条字幕前的序号行（空行之后单独一行的数字）
+    for i in range(len(texts) - 1):
+        lines = texts[i].split("\n")
+        if lines[-1].strip().isdigit() and (len(lines) == 1 or not lines[-2].strip()):
+            texts[i] = "\n".join(lines[:-1]).strip("\n")
+    return starts, ends, extras, texts
+
+def format_timestamp(seconds):
+    millis = max(0, int(round(seconds * 1000)))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
+
+def iter_srt(starts, ends, extras, texts):
+    """逐条生成 SRT 文本并重新编号；移到 0 之前的字幕被丢弃，开始时间截断为 0"""
+    number = 0
+    for start, end, extra, text in zip(starts, ends, extras, texts):
+        if end <= 0 or end <= start:
+            continue
+        number += 1
+        yield f"{number}\n{format_timestamp(start)} --> {format_timestamp(end)}{extra}\n{text}\n\n"
+
+def retime_tracks(tracks, retiming):
+    """对多条已解析的字幕一次完成换算：拼接所有开始、结束时间后整体计算，再按条数切回各文件"""
+    counts = [len(starts) for starts, _, _, _ in tracks]
+    all_times = [t for starts, _, _, _ in tracks for t in starts] + [t for _, ends, _, _ in tracks for t in ends]
+    mapped = retiming.apply(all_times)
+    total = sum(counts)
+    results, position = [], 0
+    for (_, _, extras, texts), count in zip(tracks, counts):
+        starts = mapped[position:position + count]
+        ends = mapped[total + position:total + position + count]
+        results.append((starts, ends, extras, texts))
+        position += count
+    return results
+
+def retime_bytes(subtitle_path, retiming):
+    """在内存中校正单个字幕文件，返回 UTF-8 编码的 SRT 内容"""
+    track, = retime_tracks([parse_srt(subtitle_path)], retiming)
+    return "".join(iter_srt(*track)).encode('utf-8')
+
+class SubtitleFeeds:
+    """把内存中的字幕交给 FFmpeg，不写中间文件
+
+    POSIX 上每份内容对应一个管道，子进程继承读端，以 pipe:N 作为输入或 subtitles 滤镜的文件名，
+    FFmpeg 启动后由后台线程写入。Windows 不支持向子进程传递额外的文件描述符，退回到临时文件
+    """
+
+    def __init__(self):
+        self.pipes = []
+        self.temp_dir = None
+
+    def add(self, data):
+        """登记一份字幕内容，返回传给 FFmpeg 的地址"""
+        if os.name != "posix":
+            if self.temp_dir is None:
+                self.temp_dir = tempfile.TemporaryDirectory(prefix="vsm_retime_")
+            path = Path(self.temp_dir.name) / f"{len(self.pipes)}.srt"
+            path.write_bytes(data)
+            self.pipes.append((None, None, data))
+            return str(path)
+        read_fd, write_fd = os.pipe()
+        self.pipes.append((read_fd, write_fd, data))
+        return f"pipe:{read_fd}"
+
+    @property
+    def pass_fds(self):
+        return tuple(read_fd for read_fd, _, _ in self.pipes if read_fd is not None)
+
+    def start(self):
+        """子进程启动后调用：关闭父进程中的读端，后台写入各管道"""
+        for read_fd, write_fd, data in self.pipes:
+            if read_fd is None:
+                continue
+            os.close(read_fd)
+            threading.Thread(target=self._write, args=(write_fd, data), daemon=True).start()
+        self.pipes = [(None, None, data) for _, _, data in self.pipes]
+
+    @staticmethod
+    def _write(write_fd, data):
+        try:
+            with os.fdopen(write_fd, 'wb') as pipe:
+                pipe.write(data)
+        except OSError:
+            pass  # FFmpeg 提前退出时管道已断开，由调用方根据退出码处理
+
+    def close(self):
+        """释放未交给子进程的管道和临时文件"""
+        for read_fd, write_fd, _ in self.pipes:
+            for fd in (read_fd, write_fd):
+                if fd is not None:
+                    os.close(fd)
+        self.pipes = []
+        if self.temp_dir is not None:
+            self.temp_dir.cleanup()
+            self.temp_dir = None
+
+def collect_subtitles(paths, rescan=False):
+    """展开命令行给出的文件和目录，返回 [(字幕路径, 相对路径)]，相对路径用于在输出目录中保持结构"""
+    subtitles = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            subtitles += [(srt, srt.relative_to(path)) for srt in scan_tree(path, rescan=rescan).files(".srt")]
+        elif path.is_file():
+            subtitles.append((path, Path(path.name)))
+        else:
+            print(f"错误：{path} 不存在，跳过")
+    return subtitles
+
+def write_srt(track, destination, backup):
+    """流式写出一条字幕：先写临时文件再替换，原地修改时保留 .bak 备份（已有备份时不覆盖）"""
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = destination.with_name(f".{destination.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8', newline='\n') as f:
+        for block in iter_srt(*track):
+            f.write(block)
+    if backup:
+        backup_path = destination.with_name(destination.name + ".bak")
+        if not backup_path.exists():
+            os.replace(destination, backup_path)
+    os.replace(tmp_path, destination)
+
+def run(args):
+    """retime 子命令入口"""
+    try:
+        retiming = Retiming.from_values(args.offset, args.stretch, args.fps, args.anchor)
+    except ValueError as e:
+        print(f"错误：{e}")
+        return 1
+    if retiming.is_identity:
+        print("错误：未指定任何校正（--offset、--stretch、--fps 或 --anchor）")
+        return 1
+
+    subtitles = collect_subtitles(args.paths, args.rescan)
+    if not subtitles:
+        print("未找到任何 SRT 字幕")
+        return 1
+
+    output_dir = Path(args.output_dir) if args.output_dir else None
+    written = failed = 0
+    with ThreadPoolExecutor(max_workers=RETIME_IO_WORKERS) as pool:
+        parsed = list(pool.map(lambda item: _try(parse_srt, item[0]), subtitles))
+        ok = [(item, track) for item, track in zip(subtitles, parsed) if not isinstance(track, Exception)]
+        for (path, _), track in zip(subtitles, parsed):
+            if isinstance(track, Exception):
+                print(f"错误：解析 {path} 失败：{track}")
+                failed += 1
+
+        retimed = retime_tracks([track for _, track in ok], retiming)
+
+        def write(item, track):
+            path, relative = item
+            destination = output_dir / relative if output_dir else path
+            write_srt(track, destination, backup=output_dir is None)
+            return destination
+
+        futures = [(item[0], pool.submit(write, item, track)) for (item, _), track in zip(ok, retimed)]
+        for path, future in futures:
+            try:
+                print(f"已校正 {path} -> {future.result()}")
+                written += 1
+            except Exception as e:
+                print(f"错误：写入 {path} 失败：{e}")
+                failed += 1
+
+    print(f"\n共校正 {written} 个字幕，失败 {failed} 个")
+    return 1 if failed else 0
+
+def _try(func, *args):
+    try:
+        return func(*args)
+    except Exception as e:
+        return e
@@ -0,0 +1,187 @@
+"""并行目录扫描：用线程池并发 os.scandir 各子目录，生成整棵目录树的内存快照
+
+网络共享（SMB/NFS）上每次列目录、stat 都是一次往返，逐个目录遍历时总耗时由延迟决定；
+并发列出多个子目录可以把这些往返重叠起来。各子命令只扫描一次，之后都从快照中读取。
+
+扫描结果按根目录持久化为扫描索引，记录每个目录的修改时间和文件列表。下次扫描时每个目录只 stat 一次，
+修改时间未变的目录直接沿用索引中的列表，只有新增或改动过的目录才重新列出。
+索引只记录名称，不记录文件的大小和修改时间：原地改写文件不会改变所在目录的修改时间，
+这类信息只能在使用时重新 stat（如 probe_media 的缓存）。
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from .fsutil import write_json_atomic
+
+# 并发列目录的线程数（瓶颈是网络往返而不是 CPU，可以远多于核数）
+SCAN_WORKERS = 16
+# 扫描索引目录（每个根目录一个文件）与格式版本
+SCAN_INDEX_DIR = Path.home() / ".video_subtitle_merger" / "scan_index"
+SCAN_INDEX_VERSION = 2
+# 修改时间距扫描开始不足该秒数的目录下次仍重新列出：
+# 文件系统的时间戳精度有限（FAT 为 2 秒），同一时间片内的后续改动可能不会改变目录的修改时间
+SCAN_INDEX_RACY_SECONDS = 2
+
+class ScanSnapshot:
+    """目录树快照：dirs 为 目录 -> (子目录名列表, 文件名列表)
+
+    mtimes 记录各目录的修改时间，changed 为本次重新列出（新增或有改动）的目录
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.dirs = {}
+        self.mtimes = {}
+        self.changed = set()
+
+    def walk(self):
+        """按 os.walk 的自顶向下顺序产出 (目录, 子目录名列表, 文件名列表)"""
+        stack = [self.root]
+        while stack:
+            dirpath = stack.pop()
+            if dirpath not in self.dirs:
+                continue
+            subdirs, files = self.dirs[dirpath]
+            yield dirpath, subdirs, files
+            stack.extend(dirpath / name for name in reversed(subdirs))
+
+    def files(self, *suffixes):
+        """按扩展名（不区分大小写）列出快照中的文件路径"""
+        for dirpath, _, filenames in self.walk():
+            for name in filenames:
+                if name.lower().endswith(suffixes):
+                    yield dirpath / name
+
+def list_directory(path, cached=None):
+    """列出单个目录，返回 (目录, 子目录名列表, 文件名列表, 目录修改时间 ns, 是否重新列出)
+
+    目录修改时间与索引记录 cached 相同时直接沿用记录。先取修改时间再列目录，
+    列目录期间发生的改动会使下次扫描看到更新的修改时间而重新列出。
+    文件与目录只按 DirEntry 自带的类型（d_type）区分，不逐个 stat：网络共享上每次 stat 都是一次往返。
+    与 os.walk 一样忽略无法访问的目录，不跟随指向目录的符号链接
+    """
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        return path, [], [], None, True
+    if isinstance(cached, dict) and cached.get("mtime_ns") == mtime_ns:
+        subdirs, files = cached.get("subdirs"), cached.get("files")
+        # 只信任名称列表；记录损坏或含有其他内容时重新列出
+        if all(isinstance(names, list) and all(isinstance(name, str) for name in names) for names in (subdirs, files)):
+            return path, list(subdirs), list(files), mtime_ns, False
+
+    subdirs, files = [], []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.name)
+                    elif entry.is_file():
+                        files.append(entry.name)
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    subdirs.sort()
+    files.sort()
+    return path, subdirs, files, mtime_ns, True
+
+def scan_directory(path):
+    """只列出单个目录（不递归、不使用索引）的快照"""
+    snapshot = ScanSnapshot(path)
+    dirpath, subdirs, files, mtime_ns, _ = list_directory(snapshot.root)
+    snapshot.dirs[dirpath] = (subdirs, files)
+    snapshot.mtimes[dirpath] = mtime_ns
+    return snapshot
+
+def scan_index_path(root):
+    return SCAN_INDEX_DIR / f"{hashlib.sha1(str(Path(root).resolve()).encode('utf-8')).hexdigest()[:16]}.json"
+
+def load_scan_index(root):
+    """读取根目录的扫描索引（相对路径 -> 目录记录），不存在、损坏或版本不符时返回空索引"""
+    try:
+        index = json.loads(scan_index_path(root).read_text(encoding='utf-8'))
+        if index.get("version") == SCAN_INDEX_VERSION and index.get("root") == str(Path(root).resolve()):
+            return index["dirs"]
+    except Exception:
+        pass
+    return {}
+
+def save_scan_index(snapshot, started):
+    """保存扫描索引；索引只用于加速，保存失败时忽略"""
+    racy_ns = int((started - SCAN_INDEX_RACY_SECONDS) * 1e9)
+    dirs = {}
+    for dirpath, (subdirs, files) in snapshot.dirs.items():
+        mtime_ns = snapshot.mtimes.get(dirpath)
+        dirs[relative_key(snapshot.root, dirpath)] = {
+            # 修改时间过新的目录不记录修改时间，下次必定重新列出
+            "mtime_ns": mtime_ns if mtime_ns is not None and mtime_ns < racy_ns else None,
+            "subdirs": subdirs,
+            "files": files,
+        }
+    try:
+        path = scan_index_path(snapshot.root)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {"version": SCAN_INDEX_VERSION, "root": str(snapshot.root.resolve()), "dirs": dirs}
+        write_json_atomic(path, data, indent=None)
+    except Exception:
+        pass
+
+def relative_key(root, dirpath):
+    return Path(dirpath).relative_to(root).as_posix()
+
+def scan_tree(root, workers=SCAN_WORKERS, rescan=False):
+    """并发扫描 root 下的整棵目录树，返回 ScanSnapshot
+
+    默认沿用扫描索引中修改时间未变的目录；rescan 为 True 时忽略已有索引、重新列出全部目录。
+    扫描完成后更新索引
+    """
+    snapshot = ScanSnapshot(root)
+    index = {} if rescan else load_scan_index(snapshot.root)
+    started = time.time()
+
+    # 每个任务列出一个目录后直接提交其子目录；outstanding 归零时整棵树扫描完毕
+    lock = threading.Lock()
+    finished = threading.Event()
+    outstanding = 1
+    errors = []
+
+    def visit(pool, dirpath):
+        nonlocal outstanding
+        try:
+            dirpath, subdirs, files, mtime_ns, relisted = list_directory(
+                dirpath, index.get(relative_key(snapshot.root, dirpath))
+            )
+            with lock:
+                snapshot.dirs[dirpath] = (subdirs, files)
+                snapshot.mtimes[dirpath] = mtime_ns
+                if relisted:
+                    snapshot.changed.add(dirpath)
+                outstanding += len(subdirs)
+            for name in subdirs:
+                pool.submit(visit, pool, dirpath / name)
+        except BaseException as e:
+            errors.append(e)
+            finished.set()
+        finally:
+            with lock:
+                outstanding -= 1
+                if outstanding == 0:
+                    finished.set()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pool.submit(visit, pool, snapshot.root)
+        finished.wait()
+    if errors:
+        raise errors[0]
+
+    # 没有任何目录新增、改动或消失时索引无需重写
+    if snapshot.changed or len(snapshot.dirs) != len(index):
+        save_scan_index(snapshot, started)
+    return snapshot
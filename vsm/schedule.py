@@ -0,0 +1,71 @@
+"""批处理调度：根据历史吞吐量估计任务耗时，按最长处理时间优先排序"""
+import json
+import asyncio
+from pathlib import Path
+
+from .fsutil import write_json_atomic
+from .media import get_video_stream_info, parse_frame_rate, probe_media
+
+# 历史编码吞吐量（像素/秒）记录文件
+ENCODE_STATS_PATH = Path.home() / ".video_subtitle_merger" / "encode_stats.json"
+# 没有历史记录时假定的编码吞吐量（像素/秒，约为 1080p 下 NVENC 300 fps、libx264 60 fps）
+DEFAULT_PIXEL_RATES = {"h264_nvenc": 1920 * 1080 * 300, "libx264": 1920 * 1080 * 60}
+# 新观测值在吞吐量估计中的权重
+ENCODE_STATS_WEIGHT = 0.3
+
+def load_encode_stats():
+    """读取历史编码吞吐量记录，不存在或损坏时返回空记录"""
+    try:
+        return json.loads(ENCODE_STATS_PATH.read_text(encoding='utf-8'))
+    except Exception:
+        return {}
+
+def save_encode_stats(stats, logger):
+    """保存历史编码吞吐量记录"""
+    try:
+        ENCODE_STATS_PATH.parent.mkdir(parents=True, exist_ok=True)
+        write_json_atomic(ENCODE_STATS_PATH, stats)
+    except Exception as e:
+        logger.warning(f"保存编码吞吐量记录失败: {str(e)}")
+
+def encode_stats_key(encoder, info):
+    """吞吐量按编码器和分辨率（高度）分别记录"""
+    return f"{encoder}|{info.get('height', 0)}p"
+
+def estimate_job_cost(info, encoder, stats):
+    """估计任务的编码耗时（秒）= 时长 × 帧率 × 分辨率 / 历史吞吐量；信息不全时返回无穷大，优先调度"""
+    try:
+        pixels = info["duration"] * info["frame_rate"] * info["width"] * info["height"]
+    except (KeyError, TypeError):
+        return float('inf')
+    pixel_rate = stats.get(encode_stats_key(encoder, info), {}).get("pixel_rate") or DEFAULT_PIXEL_RATES[encoder]
+    return pixels / pixel_rate
+
+def record_encode_speed(stats, encoder, info, fps):
+    """用实际观测到的编码帧率修正吞吐量估计（指数滑动平均）"""
+    key = encode_stats_key(encoder, info)
+    pixel_rate = fps * info["width"] * info["height"]
+    entry = stats.get(key)
+    if entry and entry.get("pixel_rate"):
+        pixel_rate = entry["pixel_rate"] * (1 - ENCODE_STATS_WEIGHT) + pixel_rate * ENCODE_STATS_WEIGHT
+    stats[key] = {"pixel_rate": pixel_rate, "samples": (entry or {}).get("samples", 0) + 1}
+
+async def probe_job(video_path):
+    """探测调度所需的时长、帧率和分辨率，失败时返回空字典
+
+    同时缓存 probe_media 的结果，供编码后的校验直接对比；stream 为完整的视频流信息，供编码（智能渲染）复用
+    """
+    try:
+        stream_info = await asyncio.to_thread(get_video_stream_info, video_path)
+        duration = (await asyncio.to_thread(probe_media, video_path))["duration"]
+        if not duration:
+            return {}
+        return {
+            "duration": duration,
+            "frame_rate": parse_frame_rate(stream_info.get("r_frame_rate")),
+            "width": int(stream_info["width"]),
+            "height": int(stream_info["height"]),
+            "stream": stream_info,
+        }
+    except Exception:
+        return {}
@@ -0,0 +1,334 @@
+"""serve 子命令：常驻本地服务，通过 HTTP 接口提交任务、查询状态并订阅进度
+
+服务启动时只检测一次编码器能力，之后所有任务共用同一个调度器（JobRunner）：
+编码协程、校验并发池、探测缓存、吞吐量统计和扫描索引都保持常驻，避免每批任务重复冷启动。
+接口默认只监听 127.0.0.1，也可以改为监听 Unix 套接字（权限 0600）。
+任务完成后会删除原文件，因此接口拒绝浏览器能发起的请求：带 Origin 头的请求一律拒绝，POST 必须是
+application/json；监听 TCP 时 Host 必须是本机地址，且除 GET /health 外都要带上令牌文件（权限 0600）中的
+访问令牌（Authorization: Bearer <令牌>），网页既无法读取令牌，也无法借 DNS 重绑定读取任务状态。
+
+    POST /jobs          提交任务：{"video": 路径, "subtitles": [路径, ...]}（省略字幕时查找同目录的同名字幕）
+                        或 {"directory": 路径}（扫描目录树中的全部文件对）
+    GET  /jobs          所有任务的状态
+    GET  /jobs/<id>     单个任务的状态
+    GET  /events        进度事件流（每行一个 JSON，任务状态变化时推送）
+    GET  /health        服务状态
+"""
+import os
+import hmac
+import json
+import time
+import secrets
+import signal
+import asyncio
+import logging
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from .cache import evict_cache
+from .media import detect_nvenc_support
+from .merger import JobRunner, MergeOptions, find_matching_files, setup_logging
+from .scan import scan_directory, scan_tree
+from .supervisor import format_seconds
+
+logger = logging.getLogger("vsm")
+
+# 服务日志目录
+SERVICE_DIR = Path.home() / ".video_subtitle_merger"
+# 默认的访问令牌文件
+TOKEN_FILE = SERVICE_DIR / "token"
+# 监听 TCP 时接受的 Host（另加 --host 指定的地址）
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
+# 监听所有地址时无法确定客户端使用的 Host，只依靠令牌
+WILDCARD_HOSTS = ("", "0.0.0.0", "::")
+# 进度事件的推送间隔（秒）
+EVENT_INTERVAL = 1.0
+# 定期清理缓存的间隔（秒）
+CACHE_EVICT_INTERVAL = 3600
+# 请求体大小上限（字节）
+MAX_REQUEST_BODY = 1 << 20
+# 保留在 /jobs 中的已完成任务数，更早完成的任务被移除
+JOB_HISTORY = 1000
+
+# 接口中的任务状态
+JOB_STATES = {"等待": "pending", "编码中": "encoding", "校验中": "verifying", "暂停": "paused",
+              "完成": "done", "失败": "failed"}
+
+HTTP_REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden",
+                404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+                415: "Unsupported Media Type", 500: "Internal Server Error"}
+
+class RequestError(Exception):
+    """请求无法处理，status 为返回的 HTTP 状态码"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def load_token(path):
+    """读取访问令牌；令牌文件不存在时生成一个并以 0600 权限写入，权限过宽时拒绝使用"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        if os.name != 'nt' and path.stat().st_mode & 0o077:
+            raise ValueError(f"令牌文件 {path} 的权限过宽，请改为 0600")
+        token = path.read_text(encoding='utf-8').strip()
+        if not token:
+            raise ValueError(f"令牌文件 {path} 为空")
+        return token
+    token = secrets.token_urlsafe(32)
+    with os.fdopen(fd, "w", encoding='utf-8') as f:
+        f.write(token + "\n")
+    return token
+
+def allowed_hosts(host, port):
+    """监听 TCP 时接受的 Host 头；监听所有地址时返回 None（不检查 Host）"""
+    if host in WILDCARD_HOSTS:
+        return None
+    return {f"[{name}]:{port}" if ":" in name else f"{name}:{port}" for name in (*LOOPBACK_HOSTS, host)}
+
+def job_status(job):
+    """任务状态的 JSON 表示"""
+    progress = job.progress
+    return {
+        "id": job.id,
+        "video": str(job.video_path),
+        "subtitles": [str(path) for path in job.subtitle_paths],
+        "state": JOB_STATES.get(progress.state, progress.state),
+        "progress": round(progress.fraction, 4),
+        "encoder": progress.encoder_desc,
+        "fps": progress.fps,
+        "speed": progress.speed,
+        "eta": progress.eta,
+        "duration": progress.duration,
+        "success": job.success,
+    }
+
+def resolve_submission(body, rescan=False):
+    """把提交的 JSON 解析为 (视频, [字幕, ...]) 列表；在线程中运行"""
+    if not isinstance(body, dict):
+        raise RequestError(400, "请求体必须是 JSON 对象")
+    if "directory" in body:
+        directory = Path(str(body["directory"])).resolve()
+        if not directory.is_dir():
+            raise RequestError(400, f"目录 {directory} 不存在")
+        return find_matching_files(directory, scan_tree(directory, rescan=rescan))
+
+    if "video" not in body:
+        raise RequestError(400, "需要 video 或 directory 字段")
+    video_path = Path(str(body["video"])).resolve()
+    if not video_path.is_file():
+        raise RequestError(400, f"视频 {video_path} 不存在")
+    subtitles = body.get("subtitles")
+    if subtitles is None:
+        pairs = dict(find_matching_files(video_path.parent, scan_directory(video_path.parent)))
+        subtitle_paths = pairs.get(video_path)
+        if not subtitle_paths:
+            raise RequestError(400, f"未找到与 {video_path.name} 匹配的字幕")
+    else:
+        if not isinstance(subtitles, list) or not subtitles:
+            raise RequestError(400, "subtitles 必须是非空列表")
+        subtitle_paths = [Path(str(path)).resolve() for path in subtitles]
+        missing = [str(path) for path in subtitle_paths if not path.is_file()]
+        if missing:
+            raise RequestError(400, f"字幕不存在: {', '.join(missing)}")
+    return [(video_path, subtitle_paths)]
+
+class MergeService:
+    """HTTP 接口：解析请求并转交给常驻的 JobRunner
+
+    token 为访问令牌，hosts 为接受的 Host 头；监听 Unix 套接字时两者均为 None，由套接字权限限制访问
+    """
+
+    def __init__(self, runner, args, token=None, hosts=None):
+        self.runner = runner
+        self.args = args
+        self.token = token
+        self.hosts = hosts
+        self.started = time.monotonic()
+        self.closing = asyncio.Event()  # 调度器结束后置位，结束所有进度事件流
+
+    async def handle(self, reader, writer):
+        try:
+            method, target, headers, body = await self.read_request(reader)
+            path = urlsplit(target).path.rstrip("/") or "/"
+            self.check_request(method, path, headers)
+            await self.dispatch(method, path, body, writer)
+        except RequestError as e:
+            await self.send_json(writer, e.status, {"error": str(e)})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            logger.error(f"处理请求出错: {str(e)}")
+            try:
+                await self.send_json(writer, 500, {"error": str(e)})
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    async def read_request(self, reader):
+        """读取一个 HTTP/1.1 请求，返回 (方法, 目标, 头部, 请求体)"""
+        request_line = (await reader.readline()).decode("latin-1").strip()
+        parts = request_line.split()
+        if len(parts) != 3:
+            raise RequestError(400, "无效的请求行")
+        method, target, _ = parts
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise RequestError(400, "无效的 Content-Length")
+        if length > MAX_REQUEST_BODY:
+            raise RequestError(413, "请求体过大")
+        body = await reader.readexactly(length) if length > 0 else b""
+        return method.upper(), target, headers, body
+
+    def check_request(self, method, path, headers):
+        """拒绝浏览器可以发起的跨站请求，以及 Host 或令牌不符的请求"""
+        if "origin" in headers:
+            raise RequestError(403, "不接受带 Origin 头的请求")
+        if self.hosts is not None and headers.get("host", "").lower() not in self.hosts:
+            raise RequestError(403, f"不接受的 Host: {headers.get('host', '')}")
+        if self.token is not None and not (method == "GET" and path == "/health"):
+            expected = f"Bearer {self.token}".encode("utf-8")
+            if not hmac.compare_digest(headers.get("authorization", "").encode("utf-8"), expected):
+                raise RequestError(401, "缺少访问令牌或令牌错误")
+        if method == "POST" and headers.get("content-type", "").split(";")[0].strip().lower() != "application/json":
+            raise RequestError(415, "请求体必须是 application/json")
+
+    async def dispatch(self, method, path, body, writer):
+        if path == "/health" and method == "GET":
+            await self.send_json(writer, 200, self.health())
+        elif path == "/jobs" and method == "POST":
+            await self.submit(body, writer)
+        elif path == "/jobs" and method == "GET":
+            await self.send_json(writer, 200, {"jobs": [job_status(job) for job in self.runner.jobs]})
+        elif path.startswith("/jobs/") and method == "GET":
+            job_id = path[len("/jobs/"):]
+            job = next((job for job in self.runner.jobs if job.id == job_id), None)
+            if job is None:
+                raise RequestError(404, f"任务 {job_id} 不存在")
+            await self.send_json(writer, 200, job_status(job))
+        elif path == "/events" and method == "GET":
+            await self.stream_events(writer)
+        elif path in ("/health", "/jobs", "/events") or path.startswith("/jobs/"):
+            raise RequestError(405, f"不支持 {method} {path}")
+        else:
+            raise RequestError(404, f"未知路径 {path}")
+
+    def health(self):
+        states = [JOB_STATES.get(job.progress.state, job.progress.state) for job in self.runner.jobs]
+        return {
+            "encoder": self.runner.encoder,
+            "jobs": {state: states.count(state) for state in JOB_STATES.values()},
+            "workers": self.runner.options.jobs,
+            "limit": self.runner.limit,
+            "uptime": format_seconds(time.monotonic() - self.started),
+        }
+
+    async def submit(self, body, writer):
+        try:
+            data = json.loads(body.decode("utf-8")) if body else None
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            raise RequestError(400, "请求体不是有效的 JSON")
+        pairs = await asyncio.to_thread(resolve_submission, data, self.args.rescan)
+        jobs = await self.runner.submit(pairs)
+        for job in jobs:
+            logger.info(f"接收任务 {job.id}: {job.video_path.name}（{len(job.subtitle_paths)} 条字幕）")
+        await self.send_json(writer, 202, {"jobs": [job_status(job) for job in jobs]})
+
+    async def stream_events(self, writer):
+        """推送进度事件：先推送所有任务的当前状态，之后每个间隔推送状态有变化的任务，直到客户端断开或服务停止"""
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                     b"Cache-Control: no-cache\r\nConnection: close\r\n\r\n")
+        last = {}
+        while True:
+            closing = self.closing.is_set()
+            for job in list(self.runner.jobs):
+                status = job_status(job)
+                if last.get(job.id) != status:
+                    last[job.id] = status
+                    writer.write(json.dumps(status, ensure_ascii=False).encode("utf-8") + b"\n")
+            await writer.drain()
+            if closing:
+                return
+            try:
+                await asyncio.wait_for(self.closing.wait(), EVENT_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def send_json(self, writer, status, data):
+        payload = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode("latin-1") + payload
+        )
+        await writer.drain()
+
+async def evict_periodically(args):
+    while True:
+        await asyncio.sleep(CACHE_EVICT_INTERVAL)
+        await asyncio.to_thread(evict_cache, args.cache_dir, logger, args.cache_max_size, args.cache_max_age)
+
+async def serve(args, options):
+    runner = JobRunner(logger, options, history=JOB_HISTORY)
+    if args.socket:
+        service = MergeService(runner, args)
+        socket_path = Path(args.socket)
+        if socket_path.exists():
+            socket_path.unlink()
+        server = await asyncio.start_unix_server(service.handle, path=str(socket_path))
+        os.chmod(socket_path, 0o600)
+        logger.info(f"服务已启动: unix:{socket_path}")
+    else:
+        token_path = Path(args.token_file) if args.token_file else TOKEN_FILE
+        service = MergeService(runner, args, load_token(token_path), allowed_hosts(args.host, args.port))
+        server = await asyncio.start_server(service.handle, args.host, args.port)
+        logger.info(f"服务已启动: http://{args.host}:{args.port}，访问令牌: {token_path}")
+
+    # 收到 SIGTERM 时不再领取新任务，处理中的任务完成后退出
+    if hasattr(signal, "SIGTERM") and os.name != 'nt':
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, runner.stop)
+    evict_task = asyncio.create_task(evict_periodically(args)) if args.cache_dir else None
+    try:
+        async with server:
+            await runner.run(until_idle=False)
+            # 关闭前结束进度事件流，否则 wait_closed() 会一直等待订阅中的连接
+            service.closing.set()
+    finally:
+        if evict_task:
+            evict_task.cancel()
+        logger.info("服务已停止")
+        if args.socket and Path(args.socket).exists():
+            Path(args.socket).unlink()
+
+def run(args):
+    """serve 子命令入口"""
+    if args.socket and not hasattr(asyncio, "start_unix_server"):
+        print("当前平台不支持 Unix 套接字，请改用 --port")
+        return 1
+    SERVICE_DIR.mkdir(parents=True, exist_ok=True)
+    setup_logging(SERVICE_DIR, "_service")
+    try:
+        options = MergeOptions.from_args(args, detect_nvenc_support(logger))
+        asyncio.run(serve(args, options))
+        return 0
+    except KeyboardInterrupt:
+        return 0
+    except Exception as e:
+        logger.error(f"服务运行出错: {str(e)}")
+        return 1
+    finally:
+        for handler in logger.handlers[:]:
+            handler.close()
+            logger.removeHandler(handler)
@@ -0,0 +1,172 @@
+"""智能渲染：只重编码有字幕出现的 GOP，其余 GOP 直接流复制
+
+只在 IDR 帧处切分，重编码片段沿用源视频的 profile、level、参考帧数和 B 帧设置，拼接后的码流对解码器是一致的；
+无法确定 IDR 帧或无法匹配编码参数时不做智能渲染，由调用方完整重编码。
+重编码片段带有自己的 SPS/PPS，拼接输出标记为 avc3（参数集随码流传输），不依赖文件头中第一段的 avcC
+"""
+import shutil
+import asyncio
+import tempfile
+from pathlib import Path
+
+from .media import get_video_duration, get_video_stream_info, get_idr_frame_times, matching_encoder_args, video_encoder_args
+from .subtitles import parse_srt_cues, merge_intervals, build_subtitle_filter, escape_concat_path, soft_subtitle_args
+from .supervisor import run_ffmpeg_async
+
+# 需要重编码的时长占比超过该值时，完整重编码反而更快
+SMART_RENDER_MAX_DIRTY_RATIO = 0.6
+# 字幕区间前后额外保留的余量（秒）
+SMART_RENDER_MARGIN = 0.5
+
+def plan_smart_render(keyframes, cues, duration):
+    """按关键帧（IDR 帧）把视频划分为 GOP，标记与字幕区间重叠的 GOP，并合并相邻同类 GOP
+
+    返回 [(开始秒, 结束秒, 是否需要重编码)]
+    """
+    bounds = [t for t in keyframes if t < duration]
+    if not bounds:
+        return []
+    bounds.append(duration)
+    intervals = merge_intervals(cues, SMART_RENDER_MARGIN)
+
+    plan = []
+    index = 0
+    for start, end in zip(bounds, bounds[1:]):
+        while index < len(intervals) and intervals[index][1] <= start:
+            index += 1
+        dirty = index < len(intervals) and intervals[index][0] < end
+        if plan and plan[-1][2] == dirty:
+            plan[-1] = (plan[-1][0], end, dirty)
+        else:
+            plan.append((start, end, dirty))
+    return plan
+
+async def smart_render_subtitles(video_path, subtitle_path, output_path, logger, use_nvenc, progress=None, soft_subtitles=(),
+                                 container_args=(), stream_info=None, duration=None, presets=None):
+    """智能渲染：只重编码有字幕出现的 GOP，其余 GOP 直接流复制，最后无缝拼接
+
+    subtitle_path 为烧录的字幕，soft_subtitles 中的字幕在拼接时作为软字幕轨一并封装，
+    container_args 为拼接输出的封装参数（如分片 MP4），
+    stream_info、duration 为调用方已探测的视频流信息与时长，省略时自行探测，
+    presets 为按校准结果选择的预设（编码器 -> 预设），与完整重编码一致
+
+    成功返回 True；不适用或失败时返回 False，由调用方回退到完整重编码
+    """
+    try:
+        if not stream_info:
+            stream_info = await asyncio.to_thread(get_video_stream_info, video_path)
+        if stream_info.get("codec_name") != "h264":
+            logger.info(f"{video_path.name} 视频编码为 {stream_info.get('codec_name')}，智能渲染仅支持 H.264")
+            return False
+        if matching_encoder_args(use_nvenc, stream_info) is None:
+            logger.info(f"{video_path.name} 的 profile/level（{stream_info.get('profile')} @ {stream_info.get('level')}）"
+                        f"无法用 {'h264_nvenc' if use_nvenc else 'libx264'} 匹配，跳过智能渲染")
+            return False
+
+        if not duration:
+            duration = await asyncio.to_thread(get_video_duration, video_path)
+        keyframes = await asyncio.to_thread(get_idr_frame_times, video_path)
+        if not duration or not keyframes:
+            logger.info(f"{video_path.name} 无法获取时长或 IDR 帧，跳过智能渲染")
+            return False
+
+        plan = plan_smart_render(keyframes, parse_srt_cues(subtitle_path), duration)
+        dirty_duration = sum(end - start for start, end, dirty in plan if dirty)
+        dirty_ratio = dirty_duration / duration
+        logger.info(f"{video_path.name} 共 {len(plan)} 段，需重编码 {dirty_duration:.1f}s ({dirty_ratio:.0%})")
+        if dirty_ratio > SMART_RENDER_MAX_DIRTY_RATIO:
+            logger.info(f"{video_path.name} 字幕覆盖率过高，智能渲染收益不足")
+            return False
+
+        if progress is not None:
+            progress.duration = duration
+            progress.start("智能渲染")
+        work_dir = Path(tempfile.mkdtemp(prefix=".smart_", dir=output_path.parent))
+        try:
+            # 1. 在计划边界（均为 IDR 帧）处将视频流无损切成 MPEG-TS 片段，
+            #    TS 片段内嵌 SPS/PPS，重编码片段与复制片段可以直接拼接
+            segment_list = work_dir / "segments.csv"
+            cmd = [
+                "ffmpeg", "-v", "error", "-i", str(video_path),
+                "-map", "0:v:0", "-c", "copy",
+                "-f", "segment", "-reset_timestamps", "1",
+                "-segment_list", str(segment_list), "-segment_list_type", "csv",
+            ]
+            split_times = ",".join(f"{start - 0.001:.6f}" for start, _, _ in plan[1:])
+            if split_times:
+                cmd += ["-segment_times", split_times]
+            cmd.append(str(work_dir / "seg_%05d.ts"))
+            if not await run_ffmpeg_async(cmd, logger, f" {video_path.name} 切分", progress, report=False):
+                return False
+
+            segments = []
+            for line in segment_list.read_text(encoding='utf-8').splitlines():
+                parts = line.rsplit(',', 2)
+                if len(parts) == 3:
+                    segments.append((work_dir / parts[0], float(parts[1])))
+            if len(segments) != len(plan):
+                logger.warning(f"{video_path.name} 切分结果 ({len(segments)} 段) 与计划 ({len(plan)} 段) 不一致")
+                return False
+
+            # 2. 只重编码与字幕重叠的片段，先恢复原始时间戳再烧录字幕
+            concat_paths = []
+            dirty_count = 0
+            for (segment_path, segment_start), (_, segment_end, dirty) in zip(segments, plan):
+                if dirty:
+                    rendered_path = segment_path.with_name(f"{segment_path.stem}_sub.ts")
+                    video_filter = (
+                        f"setpts=PTS-STARTPTS+{segment_start:.6f}/TB,"
+                        f"{build_subtitle_filter(subtitle_path)},"
+                        f"setpts=PTS-STARTPTS"
+                    )
+                    while True:
+                        matched_args = matching_encoder_args(use_nvenc, stream_info)
+                        if matched_args is None:
+                            logger.info(f"{video_path.name} 的编码参数无法用 libx264 匹配，放弃智能渲染")
+                            return False
+                        cmd = [
+                            "ffmpeg", "-v", "error", "-i", str(segment_path),
+                            "-vf", video_filter,
+                            *video_encoder_args(use_nvenc, (presets or {}).get("h264_nvenc" if use_nvenc else "libx264")),
+                            *matched_args,
+                            "-pix_fmt", stream_info.get("pix_fmt", "yuv420p"),
+                            "-fps_mode", "passthrough", "-an", "-y", str(rendered_path)
+                        ]
+                        if await run_ffmpeg_async(cmd, logger, f" {segment_path.name} 重编码", progress, report=False):
+                            break
+                        if not use_nvenc:
+                            return False
+                        logger.info(f"回退到 CPU 编码 (libx264) 处理 {video_path.name} 的剩余片段")
+                        use_nvenc = False
+                    concat_paths.append(rendered_path)
+                    dirty_count += 1
+                else:
+                    concat_paths.append(segment_path)
+                if progress is not None:
+                    progress.out_time = segment_end
+
+            # 3. 拼接视频片段，音频直接从原文件完整复制，避免片段边界处断音
+            concat_list = work_dir / "concat.txt"
+            concat_list.write_text(
+                "".join(f"file '{escape_concat_path(path)}'\n" for path in concat_paths),
+                encoding='utf-8'
+            )
+            soft_inputs, soft_outputs = soft_subtitle_args(video_path, soft_subtitles, 2)
+            cmd = [
+                "ffmpeg", "-v", "error",
+                "-f", "concat", "-safe", "0", "-i", str(concat_list),
+                "-i", str(video_path), *soft_inputs,
+                "-map", "0:v", "-map", "1:a?", "-c", "copy", *(["-tag:v", "avc3"] if dirty_count else []),
+                *soft_outputs, *container_args, "-y", str(output_path)
+            ]
+            if not await run_ffmpeg_async(cmd, logger, f" {video_path.name} 拼接", progress, report=False):
+                return False
+            logger.info(f"成功处理: {output_path} (智能渲染，重编码 {dirty_count}/{len(plan)} 段)")
+            return True
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.warning(f"{video_path.name} 智能渲染出错: {str(e)}")
+        return False
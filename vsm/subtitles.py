@@ -0,0 +1,117 @@
+"""SRT 字幕解析、语言识别与 subtitles 滤镜参数"""
+import re
+from pathlib import Path
+
+# 字幕烧录样式（所有编码方式共用）
+SUBTITLE_STYLE = "FontName=Arial,FontSize=16,PrimaryColour=&HFFFFFF,OutlineColour=&H000000,BorderStyle=1,Outline=1,Shadow=0,MarginV=40,BackColour=&H00000000"
+
+# 字幕文件名中的语言标签（name.ja.srt 中的 ja）-> ISO 639-2 代码，写入字幕轨的 language 元数据
+LANGUAGE_CODES = {
+    "ja": "jpn", "jp": "jpn", "jpn": "jpn",
+    "zh": "chi", "chs": "chi", "cht": "chi", "sc": "chi", "tc": "chi", "chi": "chi", "zho": "chi",
+    "en": "eng", "eng": "eng",
+    "ko": "kor", "kor": "kor",
+}
+# 未指定烧录语言时的选择顺序（没有语言标签的字幕始终最优先）
+BURN_LANGUAGE_PRIORITY = ("chi", "jpn", "eng")
+
+def parse_srt_cues(subtitle_path):
+    """解析 SRT 字幕，返回按开始时间排序的 (开始秒, 结束秒) 列表"""
+    time_pattern = re.compile(
+        r"(\d{1,2}):(\d{2}):(\d{2})[,.](\d{1,3})\s*-->\s*(\d{1,2}):(\d{2}):(\d{2})[,.](\d{1,3})"
+    )
+    text = Path(subtitle_path).read_text(encoding='utf-8-sig', errors='replace')
+    cues = []
+    for match in time_pattern.finditer(text):
+        h1, m1, s1, ms1, h2, m2, s2, ms2 = match.groups()
+        start = int(h1) * 3600 + int(m1) * 60 + int(s1) + int(ms1.ljust(3, '0')) / 1000
+        end = int(h2) * 3600 + int(m2) * 60 + int(s2) + int(ms2.ljust(3, '0')) / 1000
+        if end > start:
+            cues.append((start, end))
+    cues.sort()
+    return cues
+
+def merge_intervals(intervals, margin=0.0):
+    """将区间向两侧扩展 margin 秒后合并重叠部分，返回不相交的有序区间"""
+    merged = []
+    for start, end in sorted(intervals):
+        start, end = max(0.0, start - margin), end + margin
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+def normalize_language(tag):
+    """将 ja、ja_2、zh-Hans 等语言标签转换为 ISO 639-2 代码，无法识别时返回 None"""
+    return LANGUAGE_CODES.get(re.split(r"[._\-]", tag.lower(), maxsplit=1)[0])
+
+def subtitle_language(subtitle_path, video_path):
+    """识别字幕文件名（如 name.ja.srt）中的语言，没有语言标签时返回 None"""
+    stem, video_stem = Path(subtitle_path).stem, Path(video_path).stem
+    if not stem.startswith(video_stem + "."):
+        return None
+    return normalize_language(stem[len(video_stem) + 1:])
+
+def plan_subtitle_tracks(video_path, subtitle_paths, burn="auto"):
+    """决定烧录哪条字幕、封装哪些软字幕，返回 (烧录字幕或 None, 软字幕列表)
+
+    burn 为 'none' 时不烧录；为语言标签时烧录该语言；为 'auto' 时按无标签、BURN_LANGUAGE_PRIORITY 的顺序选择。
+    只有一条字幕且烧录时不封装软字幕，与单字幕时的输出保持一致；否则全部字幕都作为软字幕封装
+    """
+    burn_path = None
+    if burn == "auto":
+        ranking = (None, *BURN_LANGUAGE_PRIORITY)
+        ranked = sorted(
+            subtitle_paths,
+            key=lambda path: ranking.index(lang) if (lang := subtitle_language(path, video_path)) in ranking else len(ranking)
+        )
+        burn_path = ranked[0] if ranked else None
+    elif burn != "none":
+        wanted = normalize_language(burn)
+        burn_path = next((path for path in subtitle_paths if subtitle_language(path, video_path) == wanted), None)
+    if burn_path is not None and len(subtitle_paths) == 1:
+        return burn_path, []
+    return burn_path, list(subtitle_paths)
+
+def soft_subtitle_args(video_path, subtitle_paths, first_input, source=str):
+    """软字幕的输入参数与映射参数（mov_text，带语言标签），first_input 为第一条字幕的输入序号
+
+    source 把字幕路径转换为传给 FFmpeg 的地址（如内存中校正过时间轴的字幕对应的管道）
+    """
+    inputs, outputs = [], []
+    for i, path in enumerate(subtitle_paths):
+        inputs += ["-f", "srt", "-i", source(path)]
+        outputs += [
+            "-map", f"{first_input + i}:0",
+            f"-metadata:s:s:{i}", f"language={subtitle_language(path, video_path) or 'und'}",
+        ]
+    if subtitle_paths:
+        outputs += ["-c:s", "mov_text"]
+    return inputs, outputs
+
+def escape_filter_path(path):
+    """转义滤镜参数中的文件路径（用于直接传参调用 FFmpeg，不经过 shell）"""
+    return Path(path).as_posix().replace(':', '\\:').replace("'", "'\\''")
+
+def escape_concat_path(path):
+    """转义 concat 列表文件中的路径"""
+    return Path(path).as_posix().replace("'", "'\\''")
+
+def merge_style(overrides, base=SUBTITLE_STYLE):
+    """把 FontSize=20,MarginV=30 形式的覆盖项合并进 force_style 字符串（键不区分大小写）"""
+    style = dict(item.split("=", 1) for item in base.split(","))
+    keys = {key.lower(): key for key in style}
+    for item in (part.strip() for part in overrides.split(",")):
+        if not item:
+            continue
+        key, sep, value = item.partition("=")
+        key = key.strip()
+        if not sep or not key:
+            raise ValueError(f"无法解析样式 '{item}'，应为 Key=Value 的形式")
+        style[keys.get(key.lower(), key)] = value.strip()
+    return ",".join(f"{key}={value}" for key, value in style.items())
+
+def build_subtitle_filter(subtitle_path, style=SUBTITLE_STYLE):
+    """生成烧录字幕的 subtitles 滤镜"""
+    return f"subtitles='{escape_filter_path(subtitle_path)}':force_style='{style}'"
@@ -0,0 +1,254 @@
+"""asyncio 进程监管：驱动所有 FFmpeg 子进程，并汇总显示进度"""
+import os
+import sys
+import time
+import signal
+import asyncio
+import logging
+import subprocess
+from collections import deque
+
+# FFmpeg 超过该秒数没有输出进度时视为卡死并终止
+FFMPEG_STALL_TIMEOUT = 120
+# 失败时日志中保留的 FFmpeg 错误输出行数
+FFMPEG_STDERR_TAIL = 200
+
+class JobProgress:
+    """单个任务的进度状态，由 run_ffmpeg_async 更新，由 ProgressDashboard 汇总显示"""
+
+    def __init__(self, name, duration=0.0):
+        self.name = name
+        self.duration = duration
+        self.encoder_desc = ""
+        self.state = "等待"
+        self.out_time = 0.0
+        self.fps = 0.0
+        self.speed = 0.0
+        self.started = None
+        self.attempt_started = None
+        self.finished = None
+        self.process = None  # 当前的 FFmpeg 子进程，由 run_ffmpeg_async 设置
+        self.paused = False
+
+    def start(self, encoder_desc):
+        """开始（或回退后重新开始）一次编码"""
+        self.encoder_desc = encoder_desc
+        self.state = "暂停" if self.paused else "编码中"
+        self.out_time = 0.0
+        self.attempt_started = time.monotonic()
+        if self.started is None:
+            self.started = self.attempt_started
+
+    def update(self, key, value):
+        """处理一行 FFmpeg -progress 输出（key=value）"""
+        try:
+            if key in ("out_time_us", "out_time_ms"):  # 两者单位均为微秒
+                self.out_time = max(0.0, int(value) / 1_000_000)
+            elif key == "fps":
+                self.fps = float(value)
+            elif key == "speed" and value.endswith("x"):
+                self.speed = float(value[:-1])
+        except ValueError:
+            pass  # 开头几行可能是 N/A
+
+    def pause(self):
+        """暂停当前的 FFmpeg 进程（SIGSTOP）；平台不支持时返回 False"""
+        if not hasattr(signal, "SIGSTOP"):
+            return False
+        self.paused = True
+        self.state = "暂停"
+        if self.process is not None and self.process.returncode is None:
+            self.process.send_signal(signal.SIGSTOP)
+        return True
+
+    def resume(self):
+        """恢复暂停的 FFmpeg 进程（SIGCONT）"""
+        self.paused = False
+        self.state = "编码中"
+        if self.process is not None and self.process.returncode is None:
+            self.process.send_signal(signal.SIGCONT)
+
+    def finish(self, success):
+        self.state = "完成" if success else "失败"
+        self.finished = time.monotonic()
+        self.paused = False
+        self.fps = self.speed = 0.0
+        if success:
+            self.out_time = self.duration
+
+    @property
+    def fraction(self):
+        if self.state == "完成":
+            return 1.0
+        return min(self.out_time / self.duration, 1.0) if self.duration > 0 else 0.0
+
+    @property
+    def eta(self):
+        if self.speed <= 0 or self.duration <= 0:
+            return None
+        return max(self.duration - self.out_time, 0.0) / self.speed
+
+def format_seconds(seconds):
+    """将秒数格式化为 HH:MM:SS，未知时返回 --:--:--"""
+    if seconds is None:
+        return "--:--:--"
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+class ProgressDashboard:
+    """所有任务共用的进度面板：每个运行中的任务一行，最后一行是总进度、合计 fps 和 ETA"""
+
+    def __init__(self, stream=None, interval=0.5):
+        self.stream = stream or sys.stderr
+        self.interval = interval
+        self.jobs = []
+        self.interactive = self.stream.isatty()
+        self._drawn_lines = 0
+        self._stopped = asyncio.Event()
+        self._last_plain = 0.0
+        if self.interactive and os.name == 'nt':
+            os.system("")  # 启用 Windows 控制台的 ANSI 转义序列
+
+    def add(self, name, duration=0.0):
+        job = JobProgress(name, duration)
+        self.jobs.append(job)
+        return job
+
+    def render(self):
+        """生成面板文本行"""
+        lines = []
+        running = [job for job in self.jobs if job.state == "编码中"]
+        paused = sum(1 for job in self.jobs if job.state == "暂停")
+        for job in running:
+            lines.append(
+                f"[{job.fraction:4.0%}] {job.name}  {job.encoder_desc}  "
+                f"{job.fps:5.0f} fps  {job.speed:4.1f}x  ETA {format_seconds(job.eta)}"
+            )
+        total = sum(job.duration for job in self.jobs)
+        done = sum(job.fraction * job.duration for job in self.jobs)
+        combined_speed = sum(job.speed for job in running)
+        finished = sum(1 for job in self.jobs if job.state == "完成")
+        failed = sum(1 for job in self.jobs if job.state == "失败")
+        eta = (total - done) / combined_speed if combined_speed > 0 else None
+        lines.append(
+            f"总进度 {done / total if total > 0 else 0:4.0%} | 完成 {finished}/{len(self.jobs)}，失败 {failed} | "
+            f"运行中 {len(running)}" + (f"，暂停 {paused}" if paused else "") + f" | 合计 {sum(job.fps for job in running):.0f} fps | ETA {format_seconds(eta)}"
+        )
+        return lines
+
+    def clear(self):
+        """擦除上一次绘制的面板（输出日志前调用）"""
+        if self.interactive and self._drawn_lines:
+            self.stream.write(f"\x1b[{self._drawn_lines}F\x1b[J")
+            self._drawn_lines = 0
+
+    def draw(self):
+        lines = self.render()
+        if self.interactive:
+            self.clear()
+            self.stream.write("\n".join(lines) + "\n")
+            self._drawn_lines = len(lines)
+        elif time.monotonic() - self._last_plain >= 30:
+            # 非终端（如重定向到文件）时只定期输出总进度，避免刷屏
+            self.stream.write(lines[-1] + "\n")
+            self._last_plain = time.monotonic()
+        self.stream.flush()
+
+    async def run(self):
+        """周期性刷新面板，直到 stop() 被调用"""
+        while not self._stopped.is_set():
+            self.draw()
+            try:
+                await asyncio.wait_for(self._stopped.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+        self._last_plain = 0.0
+        self.draw()
+
+    def stop(self):
+        self._stopped.set()
+
+class DashboardLogHandler(logging.StreamHandler):
+    """控制台日志处理器：输出日志前先擦除进度面板，避免两者互相覆盖"""
+
+    dashboard = None
+
+    def emit(self, record):
+        if self.dashboard is not None:
+            self.dashboard.clear()
+        super().emit(record)
+
+async def run_ffmpeg_async(cmd, logger, desc, progress=None, timeout=None, stall_timeout=FFMPEG_STALL_TIMEOUT,
+                           feeds=None, report=True):
+    """异步运行 FFmpeg：非阻塞读取管道、更新进度，支持超时、卡死检测和取消
+
+    feeds 为 retime.SubtitleFeeds 时，把其中登记的内存字幕通过继承的管道交给 FFmpeg。
+    progress 被负载调节器暂停期间不做卡死检测（总超时 timeout 仍然计时）。
+    report 为 False 时 progress 只用于登记子进程（以便暂停），进度由调用方自行更新（如智能渲染的各分段）。
+    成功返回 True；失败、超时或卡死返回 False；任务被取消时终止 FFmpeg 后继续抛出 CancelledError
+    """
+    try:
+        return await _run_ffmpeg(cmd, logger, desc, progress, timeout, stall_timeout, feeds, report)
+    finally:
+        if progress is not None:
+            progress.process = None
+        if feeds is not None:
+            feeds.close()
+
+async def _run_ffmpeg(cmd, logger, desc, progress, timeout, stall_timeout, feeds, report):
+    cmd = [cmd[0], "-progress", "pipe:1", "-nostats", *cmd[1:]]
+    logger.debug(f"执行{desc}命令: {subprocess.list2cmdline(cmd)}")
+    process = await asyncio.create_subprocess_exec(
+        *cmd, stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+        pass_fds=feeds.pass_fds if feeds is not None else ()
+    )
+    if feeds is not None:
+        feeds.start()
+    if progress is not None:
+        progress.process = process
+        if progress.paused:
+            # 任务在两次 FFmpeg 调用之间被暂停（如智能渲染的分段）
+            process.send_signal(signal.SIGSTOP)
+    stderr_tail = deque(maxlen=FFMPEG_STDERR_TAIL)
+    stalled = False
+
+    async def read_stderr():
+        async for line in process.stderr:
+            stderr_tail.append(line.decode('utf-8', errors='replace'))
+
+    async def read_progress():
+        nonlocal stalled
+        while True:
+            try:
+                line = await asyncio.wait_for(process.stdout.readline(), stall_timeout)
+            except asyncio.TimeoutError:
+                if progress is not None and progress.paused:
+                    continue  # 被负载调节器暂停时没有输出是正常的
+                stalled = True
+                raise
+            if not line:
+                break
+            if progress is not None and report:
+                key, _, value = line.decode('utf-8', errors='replace').strip().partition('=')
+                progress.update(key, value)
+
+    readers = [asyncio.ensure_future(read_stderr()), asyncio.ensure_future(read_progress())]
+    try:
+        await asyncio.wait_for(asyncio.gather(*readers, process.wait()), timeout)
+    except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+        if process.returncode is None:
+            process.kill()
+        await process.wait()
+        for reader in readers:
+            reader.cancel()
+        if isinstance(e, asyncio.CancelledError):
+            logger.warning(f"{desc}已取消")
+            raise
+        reason = f"超过 {stall_timeout} 秒没有进度" if stalled else f"超过 {timeout} 秒未完成"
+        logger.error(f"{desc}{reason}，已终止\nFFmpeg 错误输出:\n{''.join(stderr_tail)}")
+        return False
+
+    if process.returncode != 0:
+        logger.warning(f"{desc}失败\nFFmpeg 返回码: {process.returncode}\nFFmpeg 错误输出:\n{''.join(stderr_tail)}")
+        return False
+    return True
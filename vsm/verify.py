@@ -0,0 +1,58 @@
+"""编码后的输出校验：通过后才允许删除原文件"""
+import asyncio
+
+from .media import probe_media
+from .supervisor import run_ffmpeg_async
+
+# 输出与原视频时长允许的误差（秒，另按时长的 1% 放宽）
+VERIFY_DURATION_TOLERANCE = 0.5
+# 输出与原视频帧数允许的误差（帧，另按帧数的 0.5% 放宽）
+VERIFY_FRAME_TOLERANCE = 2
+
+STREAM_NAMES = {"video": "视频", "audio": "音频", "subtitle": "字幕"}
+
+def expected_streams(source_streams, subtitle_tracks):
+    """输出应有的各类流数量：一路视频、原视频的全部音频（0:a? 原样复制）和封装的软字幕轨"""
+    return {"video": 1, "audio": source_streams.get("audio", 0), "subtitle": subtitle_tracks}
+
+async def verify_output(video_path, output_path, logger, sample_seconds=0, subtitle_tracks=0):
+    """对比输出与原视频的时长、流数量和帧数，可选抽样解码几秒；通过返回 True
+
+    subtitle_tracks 为任务封装的软字幕轨数，各类流的数量须与 expected_streams 完全一致
+    """
+    try:
+        source = await asyncio.to_thread(probe_media, video_path)
+        output = await asyncio.to_thread(probe_media, output_path)
+    except Exception as e:
+        logger.error(f"校验 {output_path.name} 时探测失败: {str(e)}")
+        return False
+
+    problems = []
+    duration_tolerance = max(VERIFY_DURATION_TOLERANCE, source["duration"] * 0.01)
+    if abs(output["duration"] - source["duration"]) > duration_tolerance:
+        problems.append(f"时长 {output['duration']:.2f}s 与原视频 {source['duration']:.2f}s 不符")
+    expected = expected_streams(source["streams"], subtitle_tracks)
+    for kind in sorted(set(expected) | set(output["streams"])):
+        if output["streams"].get(kind, 0) != expected.get(kind, 0):
+            problems.append(f"{STREAM_NAMES.get(kind, kind)}流数量为 {output['streams'].get(kind, 0)}，应为 {expected.get(kind, 0)}")
+    if source["video_frames"] and output["video_frames"] is not None:
+        frame_tolerance = max(VERIFY_FRAME_TOLERANCE, int(source["video_frames"] * 0.005))
+        if abs(output["video_frames"] - source["video_frames"]) > frame_tolerance:
+            problems.append(f"帧数 {output['video_frames']} 与原视频 {source['video_frames']} 不符")
+
+    if not problems and sample_seconds > 0:
+        # 从中间位置抽样解码，确认输出可以正常解码
+        start = max(output["duration"] / 2 - sample_seconds / 2, 0)
+        cmd = [
+            "ffmpeg", "-v", "error", "-xerror",
+            "-ss", f"{start:.3f}", "-i", str(output_path),
+            "-t", str(sample_seconds), "-f", "null", "-"
+        ]
+        if not await run_ffmpeg_async(cmd, logger, f" {output_path.name} 抽样解码"):
+            problems.append("抽样解码失败")
+
+    if problems:
+        logger.error(f"校验失败，保留原文件: {output_path}\n" + "\n".join(problems))
+        return False
+    logger.info(f"校验通过: {output_path}")
+    return True